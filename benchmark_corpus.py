@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark BilkentCorpus against reading a version's CSV with pandas.
+
+For each reader the benchmark measures, in a fresh process: opening the
+version, reading a random sample of rows, a full pass over every text, and
+the growth of the process's peak RSS. The pandas reader is the
+`pd.read_csv("versions/<version>/texts.csv")` the README used to suggest.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+from dataset_versioning import get_latest_version, materialize_version
+
+READERS = ("pandas", "bilkent_corpus")
+
+
+def peak_rss():
+    """Peak RSS of this process in bytes (0 where the resource module is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_reader(reader, version, sample_size=1000, seed=42):
+    """Time `reader` on `version` in this process and return the measurements."""
+    # Import before measuring, so that only the reading itself counts
+    import pandas as pd
+    import pyarrow  # noqa: F401
+    from bilkent_corpus import BilkentCorpus
+
+    rss_start = peak_rss()
+    start = time.perf_counter()
+    if reader == "pandas":
+        texts = pd.read_csv(f"./versions/{version}/texts.csv", escapechar="\\")["text"]
+
+        def get(i):
+            return texts.iloc[i]
+        rows = len(texts)
+    else:
+        corpus = BilkentCorpus(version)
+        column = corpus["text"]
+        get = column.__getitem__
+        texts = column
+        rows = len(corpus)
+    open_seconds = time.perf_counter() - start
+
+    indices = random.Random(seed).sample(range(rows), min(sample_size, rows))
+    start = time.perf_counter()
+    sampled_chars = sum(len(get(i)) for i in indices)
+    sample_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    total_chars = sum(len(text) for text in texts if isinstance(text, str))
+    scan_seconds = time.perf_counter() - start
+
+    return {
+        "reader": reader,
+        "rows": rows,
+        "open_seconds": open_seconds,
+        "sample_seconds": sample_seconds,
+        "sample_rows": len(indices),
+        "sampled_chars": sampled_chars,
+        "scan_seconds": scan_seconds,
+        "total_chars": total_chars,
+        "rss_growth": peak_rss() - rss_start,
+    }
+
+
+def benchmark(version, readers=READERS, sample_size=1000, seed=42):
+    """Run every reader in its own process, so that their memory use and caches do not mix."""
+    # Both files are written up front, outside of the measurements
+    for fmt in ("csv", "arrow"):
+        materialize_version(version, fmt)
+
+    results = []
+    for reader in readers:
+        output = subprocess.run(
+            [sys.executable, __file__, "--version", version, "--sample", str(sample_size),
+             "--seed", str(seed), "--worker", reader],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return results
+
+
+def print_report(results, version):
+    print(f"\nReader benchmark on {version} ({results[0]['rows']} rows)")
+    print(f"{'reader':<16} {'open s':>9} {'sample s':>9} {'scan s':>9} {'RSS MB':>9}")
+    for row in results:
+        print(f"{row['reader']:<16} {row['open_seconds']:>9.4f} {row['sample_seconds']:>9.4f} "
+              f"{row['scan_seconds']:>9.3f} {row['rss_growth'] / (1024 * 1024):>9.1f}")
+    print(f"(sample: {results[0]['sample_rows']} random rows)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark BilkentCorpus against pandas.read_csv")
+    parser.add_argument("--version", help="Version to read (default: the latest)")
+    parser.add_argument("--sample", type=int, default=1000, help="Random rows to read (default: 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="Sampling seed (default: 42)")
+    parser.add_argument("--readers", nargs="+", choices=READERS, default=list(READERS),
+                        help="Readers to compare (default: all)")
+    parser.add_argument("--worker", choices=READERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    version = args.version or get_latest_version()["version"]
+    if args.worker:
+        print(json.dumps(run_reader(args.worker, version, args.sample, args.seed)))
+    else:
+        print_report(benchmark(version, args.readers, args.sample, args.seed), version)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Benchmark the PDF text-extraction backends of convert_to_text.py head to head.
+
+Runs every backend over the same random sample of data/full/ and reports
+pages/sec, MB/sec and character-level agreement with a reference backend.
+"""
+import os
+import time
+import random
+import difflib
+import argparse
+
+from convert_to_text import PDF_DIR, EXTRACTORS, DEFAULT_BACKEND, get_extractor, extract_pages, assemble_text
+
+
+def sample_pdfs(path=PDF_DIR, sample_size=50, seed=42):
+    """Pick a reproducible random sample of PDFs from `path`."""
+    files = []
+    for entry in os.scandir(path):
+        if not entry.is_file():
+            continue
+        with open(entry.path, 'rb') as f:
+            if f.read(4) == b'%PDF':
+                files.append(entry.path)
+    files.sort()
+    random.Random(seed).shuffle(files)
+    return files[:sample_size]
+
+
+def agreement(a, b):
+    """Character-level similarity of two texts in [0, 1]."""
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def run_backend(backend, files):
+    """Extract `files` serially with `backend`; returns timings and the texts."""
+    extractor = get_extractor(backend)
+    texts = {}
+    pages = 0
+    failures = 0
+    start = time.perf_counter()
+    for f in files:
+        messages = []
+        result = extract_pages(f, messages, extractor)
+        if result is None:
+            failures += 1
+            texts[f] = u''
+            continue
+        pages += len(result)
+        texts[f] = assemble_text(result)
+    return {"seconds": time.perf_counter() - start, "pages": pages, "failures": failures, "texts": texts}
+
+
+def benchmark(files, backends, reference=DEFAULT_BACKEND):
+    """Run each backend over `files` and compare its output against `reference`."""
+    total_mb = sum(os.path.getsize(f) for f in files) / (1024 * 1024)
+    results = {backend: run_backend(backend, files) for backend in backends}
+    reference_texts = results[reference]["texts"]
+
+    rows = []
+    for backend, result in results.items():
+        seconds = result["seconds"] or 1e-9
+        scores = [agreement(reference_texts[f], result["texts"][f]) for f in files]
+        rows.append({
+            "backend": backend,
+            "seconds": result["seconds"],
+            "pages_per_sec": result["pages"] / seconds,
+            "mb_per_sec": total_mb / seconds,
+            "agreement": sum(scores) / len(scores) if scores else 1.0,
+            "min_agreement": min(scores) if scores else 1.0,
+            "failures": result["failures"],
+        })
+    return rows
+
+
+def print_report(rows, num_files, reference):
+    print(f"\nExtraction benchmark on {num_files} PDFs (agreement vs {reference})")
+    print(f"{'backend':<12} {'seconds':>9} {'pages/s':>9} {'MB/s':>8} {'agree':>7} {'min':>7} {'failed':>7}")
+    for row in rows:
+        print(f"{row['backend']:<12} {row['seconds']:>9.2f} {row['pages_per_sec']:>9.1f} "
+              f"{row['mb_per_sec']:>8.2f} {row['agreement']:>7.3f} {row['min_agreement']:>7.3f} "
+              f"{row['failures']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF text-extraction backends")
+    parser.add_argument("--path", default=PDF_DIR, help=f"Directory with PDFs (default: {PDF_DIR})")
+    parser.add_argument("--sample", type=int, default=50, help="Number of PDFs to sample (default: 50)")
+    parser.add_argument("--seed", type=int, default=42, help="Sampling seed (default: 42)")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=sorted(EXTRACTORS),
+        default=sorted(EXTRACTORS),
+        help="Backends to compare (default: all)"
+    )
+    parser.add_argument(
+        "--reference",
+        choices=sorted(EXTRACTORS),
+        default=DEFAULT_BACKEND,
+        help=f"Backend whose output counts as ground truth (default: {DEFAULT_BACKEND})"
+    )
+    args = parser.parse_args()
+
+    files = sample_pdfs(args.path, args.sample, args.seed)
+    if not files:
+        print(f"No PDFs found in {args.path}")
+    else:
+        backends = list(dict.fromkeys([args.reference] + args.backends))
+        print_report(benchmark(files, backends, args.reference), len(files), args.reference)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark how long each entry point of the repository takes to start.
+
+Every entry point is started in a fresh interpreter, both as a bare import
+and, where it has a command line, with `--help`, and the median wall time
+of several runs is reported. `--importtime` also lists the modules that
+take longest to import (python -X importtime), to find imports that
+should be deferred to the code that needs them.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (name, module, script run with --help or None)
+ENTRY_POINTS = [
+    ("convert_to_text", "convert_to_text", "convert_to_text.py"),
+    ("dataset_versioning", "dataset_versioning", "dataset_versioning.py"),
+    ("prepare_hf_dataset", "prepare_hf_dataset", None),
+    ("upload_to_hf", "upload_to_hf", "upload_to_hf.py"),
+    ("update_dataset", "update_dataset", "update_dataset.py"),
+    ("benchmark_extractors", "benchmark_extractors", "benchmark_extractors.py"),
+    ("scraper/crawl", None, "scraper/crawl.py"),
+]
+
+
+def time_command(command, runs=5):
+    """Median wall time in seconds of `runs` runs of `command`, or None if it fails."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None
+    return statistics.median(timings)
+
+
+def _import_log(code):
+    """[(cumulative seconds, module name)] of the imports `python -X importtime -c code` reports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return rows
+
+
+def import_times(module, top=10):
+    """The `top` slowest imports of `module` as (cumulative seconds, module name)."""
+    # Leave out what the interpreter imports at startup (site and its .pth files)
+    startup = {name for _, name in _import_log("pass")}
+    rows = [(seconds, name) for seconds, name in _import_log(f"import {module}") if name not in startup]
+    return sorted(rows, reverse=True)[:top]
+
+
+def benchmark(entry_points=ENTRY_POINTS, runs=5):
+    baseline = time_command([sys.executable, "-c", "pass"], runs)
+    rows = []
+    for name, module, script in entry_points:
+        rows.append({
+            "entry_point": name,
+            "import": time_command([sys.executable, "-c", f"import {module}"], runs) if module else None,
+            "help": time_command([sys.executable, script, "--help"], runs) if script else None,
+        })
+    return baseline, rows
+
+
+def print_report(baseline, rows, runs):
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+    print(f"\nStartup benchmark, median of {runs} runs (bare interpreter: {ms(baseline)} ms)")
+    print(f"{'entry point':<22} {'import ms':>10} {'--help ms':>10}")
+    for row in rows:
+        print(f"{row['entry_point']:<22} {ms(row['import']):>10} {ms(row['help']):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the start-up time of the entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+    parser.add_argument(
+        "--importtime",
+        action="store_true",
+        help="Also list the slowest imports of every entry point"
+    )
+    parser.add_argument("--top", type=int, default=10, help="Imports listed per entry point (default: 10)")
+    args = parser.parse_args()
+
+    baseline, rows = benchmark(ENTRY_POINTS, args.runs)
+    print_report(baseline, rows, args.runs)
+
+    if args.importtime:
+        for name, module, _ in ENTRY_POINTS:
+            if not module:
+                continue
+            print(f"\nSlowest imports of {name}:")
+            for seconds, imported in import_times(module, args.top):
+                print(f"  {seconds * 1000:>8.1f} ms  {imported}")
@@ -0,0 +1,165 @@
+"""
+Random access to a version of the Bilkent Turkish Writings Dataset.
+
+    from bilkent_corpus import BilkentCorpus
+
+    corpus = BilkentCorpus("v2")          # or BilkentCorpus() for the latest version
+    len(corpus)                           # number of writings
+    corpus[0]                             # {"source": ..., "text": ..., "writing_id": ..., ...}
+    corpus[100:200]                       # a BilkentCorpus over those rows, nothing copied
+    corpus["text"][5]                     # one value of one column
+    for batch in corpus.iter_batches(256, columns=["text"]):
+        ...                               # {"text": [...]} with at most 256 texts each
+
+A version is read from versions/<version>/texts.arrow, an uncompressed Arrow
+IPC file written from the version store the first time the version is
+opened (and again whenever its manifest changes). The file is memory-mapped:
+opening it reads only the file footer and record batch headers, rows are
+found through the offsets of the record batches, and a text is decoded only
+when it is accessed.
+"""
+import bisect
+import numbers
+
+from dataset_versioning import get_latest_version, materialize_version
+
+
+class Column:
+    """One column of a corpus; values are decoded only when they are accessed."""
+
+    def __init__(self, corpus, name):
+        self.corpus = corpus
+        self.name = name
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def __getitem__(self, key):
+        if isinstance(key, numbers.Integral):
+            return self.corpus._value(self.name, int(key))
+        return Column(self.corpus[key], self.name)
+
+    def __iter__(self):
+        for batch in self.corpus.iter_batches(columns=[self.name]):
+            yield from batch[self.name]
+
+    def to_arrow(self):
+        """The column as a pyarrow ChunkedArray backed by the memory map."""
+        return self.corpus.to_arrow().column(self.name)
+
+
+class BilkentCorpus:
+    """
+    A version of the corpus as a sequence of rows.
+
+    Supports len(), integer indexing (a dict per row; numpy integers too),
+    slicing and lists of indices (a new BilkentCorpus sharing the same memory
+    map), column access by name (a lazy Column), iteration and batched
+    iteration.
+    """
+
+    def __init__(self, version=None, path=None, columns=None, _table=None):
+        if _table is None:
+            import pyarrow as pa  # You may need to install this: pip install pyarrow
+
+            if path is None:
+                if version is None:
+                    version = get_latest_version()["version"]
+                path = materialize_version(version, "arrow")
+            self._source = pa.memory_map(path, 'r')
+            reader = pa.ipc.open_file(self._source)
+            # Zero-copy: the batches point into the memory map
+            _table = pa.Table.from_batches(
+                [reader.get_batch(i) for i in range(reader.num_record_batches)], schema=reader.schema)
+            if columns is not None:
+                _table = _table.select(list(columns))
+        self.version = version
+        self.path = path
+        self._table = _table
+        self._offsets = [0]
+        for chunk in (_table.column(0).chunks if _table.num_columns else []):
+            self._offsets.append(self._offsets[-1] + len(chunk))
+
+    def _view(self, table):
+        view = BilkentCorpus(self.version, self.path, _table=table)
+        view._source = getattr(self, "_source", None)
+        return view
+
+    @property
+    def columns(self):
+        return list(self._table.column_names)
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def _normalize(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Row {index} out of range for a corpus of {len(self)} rows")
+        return index
+
+    def _locate(self, index):
+        """(record batch, row within it) of row `index`, negative indices counting from the end."""
+        index = self._normalize(index)
+        chunk = bisect.bisect_right(self._offsets, index) - 1
+        return chunk, index - self._offsets[chunk]
+
+    def _value(self, name, index):
+        chunk, row = self._locate(index)
+        return self._table.column(name).chunk(chunk)[row].as_py()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._table.column_names:
+                raise KeyError(key)
+            return Column(self, key)
+        if isinstance(key, numbers.Integral):
+            chunk, row = self._locate(int(key))
+            return {name: self._table.column(name).chunk(chunk)[row].as_py()
+                    for name in self._table.column_names}
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self._view(self._table.slice(start, max(0, stop - start)))
+            key = range(start, stop, step)
+        # Any other selection of rows is gathered into a new (in-memory) table
+        return self._view(self._table.take([self._normalize(index) for index in key]))
+
+    def select(self, columns):
+        """The corpus restricted to `columns`; the other columns are never read."""
+        return self._view(self._table.select(list(columns)))
+
+    def iter_batches(self, batch_size=1000, columns=None):
+        """Yield {column: [values]} dicts of at most `batch_size` rows, decoding one batch at a time."""
+        table = self._table if columns is None else self._table.select(list(columns))
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield batch.to_pydict()
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            names = list(batch)
+            for values in zip(*batch.values()):
+                yield dict(zip(names, values))
+
+    def to_arrow(self):
+        """The rows as a pyarrow Table backed by the memory map."""
+        return self._table
+
+    def to_pandas(self):
+        return self._table.to_pandas()
+
+    def close(self):
+        """Unmap the file; the corpus and its views must not be used afterwards."""
+        source = getattr(self, "_source", None)
+        if source is not None:
+            source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"BilkentCorpus(version={self.version!r}, rows={len(self)}, columns={self.columns})"
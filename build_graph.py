@@ -0,0 +1,228 @@
+"""
+A small make-style stage graph for building the Bilkent Turkish Writings Dataset.
+
+Each stage names the stages it depends on and the files it reads and writes.
+After a stage succeeds, a fingerprint of its inputs and outputs (paths, sizes
+and modification times) is saved, and the next build skips the stage while
+both fingerprints still match. Stages whose dependencies are done run
+concurrently.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import concurrent.futures
+
+import telemetry
+
+
+BUILD_STATE_PATH = "./data/build_state.json"
+
+
+class Stage(object):
+    """
+    One step of the build.
+
+    `inputs` and `outputs` are lists of files or directories, or callables
+    returning them when they depend on earlier stages (such as the name of
+    the version just created). `run` returns a true value on success. Stages
+    with `always` set run whenever they are selected, for steps whose real
+    inputs cannot be fingerprinted locally, such as crawling the website.
+    Stages with `main_thread` set run in the main thread rather than in the
+    pool, for steps that install signal handlers (the crawl's reactor, the
+    conversion's SIGALRM timeouts).
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), always=False, main_thread=False):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.always = always
+        self.main_thread = main_thread
+
+    def paths(self, which):
+        paths = self.inputs if which == "inputs" else self.outputs
+        return list(paths() if callable(paths) else paths)
+
+
+def fingerprint(paths):
+    """Hash of the paths, sizes and modification times of `paths` and of every file below them."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    st = os.stat(file_path)
+                    digest.update(f"{file_path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+        elif os.path.exists(path):
+            st = os.stat(path)
+            digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+        else:
+            digest.update(f"{path}\0missing\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildState(object):
+    """The fingerprints recorded by earlier builds, persisted as JSON."""
+
+    def __init__(self, path=BUILD_STATE_PATH):
+        self.path = path
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.stages = json.load(f)
+
+    def is_up_to_date(self, stage):
+        recorded = self.stages.get(stage.name)
+        if stage.always or recorded is None:
+            return False
+        outputs = stage.paths("outputs")
+        if not all(os.path.exists(path) for path in outputs):
+            return False
+        return (recorded.get("inputs") == fingerprint(stage.paths("inputs"))
+                and recorded.get("outputs") == fingerprint(outputs))
+
+    def record(self, stage):
+        self.stages[stage.name] = {
+            "inputs": fingerprint(stage.paths("inputs")),
+            "outputs": fingerprint(stage.paths("outputs")),
+        }
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.stages, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def topological_order(stages):
+    """The stages ordered so that every stage comes after its dependencies."""
+    by_name = {stage.name: stage for stage in stages}
+    order, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Stage {name} depends on itself")
+        visiting.add(name)
+        # Dependencies left out of the graph (e.g. a disabled scrape stage) count as satisfied
+        for dep in by_name[name].deps:
+            if dep in by_name:
+                visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return order
+
+
+def select_stages(stages, start=None, until=None):
+    """
+    The stages of the slice `start`..`until`: those that depend (directly or
+    not) on `start` and that `until` depends on, each end included.
+    """
+    order = topological_order(stages)
+    names = {stage.name for stage in order}
+    for name in (start, until):
+        if name is not None and name not in names:
+            raise ValueError(f"Unknown stage {name!r}, expected one of {', '.join(sorted(names))}")
+
+    selected = names
+    if start is not None:
+        downstream = {start}
+        for stage in order:
+            if any(dep in downstream for dep in stage.deps):
+                downstream.add(stage.name)
+        selected = selected & downstream
+    if until is not None:
+        by_name = {stage.name: stage for stage in order}
+        upstream, pending = set(), [until]
+        while pending:
+            name = pending.pop()
+            if name not in upstream:
+                upstream.add(name)
+                pending.extend(dep for dep in by_name[name].deps if dep in by_name)
+        selected = selected & upstream
+    return [stage for stage in order if stage.name in selected]
+
+
+def timed_run(stage):
+    """Run `stage`, measured as a telemetry stage of the same name."""
+    with telemetry.stage(stage.name) as timer:
+        ok = stage.run()
+        timer.ok = bool(ok)
+    return ok
+
+
+def run_stage(executor, stage):
+    """A future for running `stage`, in the pool or, for `main_thread` stages, right away."""
+    if not stage.main_thread:
+        return executor.submit(timed_run, stage)
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(timed_run(stage))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run_stages(stages, start=None, until=None, force=False, jobs=2, state_path=BUILD_STATE_PATH):
+    """
+    Run the selected stages, skipping those that are up to date, and return True if none failed.
+
+    A stage starts as soon as its selected dependencies have finished; up to
+    `jobs` stages run at once. When a stage fails, the stages depending on
+    it are not run. `force` reruns every selected stage.
+    """
+    state = BuildState(state_path)
+    selected = select_stages(stages, start, until)
+    names = {stage.name for stage in selected}
+    pending = {stage.name: stage for stage in selected}
+    finished, failed = set(), set()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                deps = [dep for dep in stage.deps if dep in names]
+                if any(dep in failed for dep in deps):
+                    print(f"[{name}] not run: a dependency failed")
+                    failed.add(name)
+                    del pending[name]
+                elif all(dep in finished for dep in deps):
+                    del pending[name]
+                    if not force and state.is_up_to_date(stage):
+                        print(f"[{name}] up to date")
+                        finished.add(name)
+                    else:
+                        print(f"[{name}] running")
+                        running[run_stage(executor, stage)] = stage
+
+            if not running:
+                continue
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"[{stage.name}] failed: {e}")
+                    ok = False
+                if ok:
+                    state.record(stage)
+                    finished.add(stage.name)
+                    print(f"[{stage.name}] done")
+                else:
+                    failed.add(stage.name)
+
+    return not failed
@@ -1,4 +1,3 @@
-
 #!/usr/bin/env python
 # coding: utf-8
 
@@ -6,136 +5,825 @@
 Convert PDFs to text for the Bilkent Turkish Writings Dataset.
 """
 
-import pdfplumber  # You may need to install this: pip install pdfplumber
-import glob
-import pandas as pd  # You may need to install this: pip install pandas
-import pathlib
 import os
+import sys
+import signal
+import argparse
+import gzip
+import json
+import hashlib
+import tempfile
+import functools
+import time
+import multiprocessing
+
+from extraction_manifest import ExtractionManifest, MANIFEST_PATH, file_sha256
+from corpus_writer import CorpusWriter, DEFAULT_ROW_GROUP_SIZE
+from text_store import ShardStore, SHARDS_DIR
+from build_graph import fingerprint
+import telemetry
 
 
 # __Note:__ The parts below are seperated since the first step takes to much time and to be able to continue when terminated.
 # Simply, for continuos processing of PDFs.
 
-# In[3]:
+PDF_DIR = "./data/full/"
+TEXTS_DIR = "./data/texts/"
+CSV_PATH = "data/texts.csv"
+PARQUET_PATH = "data/texts.parquet"
+PARTITIONED_PATH = "data/texts_partitioned/"
+METADATA_PATH = "./data/metadata.jsonl"
+PAGES_DIR = "./data/pages/"
+# What the outputs were last built from (see build_outputs())
+OUTPUTS_STAMP_PATH = "data/texts.stamp.json"
 
+# Bump whenever assemble_text() changes, so that texts are rebuilt from the page cache
+ASSEMBLER_VERSION = "1"
 
-# Converting PDFs and append them to texts array
-path = "./data/full/"
-texts_path = "./data/texts/"
+# Bump whenever the layout of the outputs changes, so that they are rewritten
+OUTPUTS_FORMAT = 1
 
-print(f"Looking for files in: {path}")
-pathlib.Path(texts_path).mkdir(parents=True, exist_ok=True) 
-files = glob.glob(path + "*")
-print(f"Found {len(files)} files to process")
+# Seconds a single PDF may take before it is abandoned
+DEFAULT_TIMEOUT = 300
 
-if len(files) == 0:
-    print("No files found! Check if the data/full directory exists and contains files.")
-    exit(1)
+# Files a worker handles before it is replaced, to bound pdfminer's memory growth
+DEFAULT_MAX_TASKS_PER_CHILD = 50
 
-processed_count = 0
-skipped_count = 0
 
-for f in files:
-    f_name = os.path.basename(f)  # Use os.path.basename for cross-platform compatibility
-    txt_path = texts_path + f_name + ".txt"
-    
-    file_path = pathlib.Path(txt_path)
-    
-    if file_path.exists():
-        print(f"Skipping existing file: {f_name}")
-        skipped_count += 1
-        continue
+class ExtractionTimeout(Exception):
+    """Raised inside a worker when a PDF exceeds its wall-clock budget."""
 
-    # Check if file is readable and has some content
-    try:
-        with open(f, 'rb') as test_file:
-            header = test_file.read(8)
-            if not header.startswith(b'%PDF'):
-                print(f"Skipping non-PDF file: {f_name}")
-                skipped_count += 1
+
+# Set by the SIGALRM handler; pdfplumber wraps exceptions raised inside pdfminer,
+# so the flag, not the exception type, is what tells a timeout apart from a bad PDF
+_timer_fired = False
+# Whether a SIGALRM should still interrupt the extraction; cleared as soon as it is done
+_timer_armed = False
+
+
+def _raise_timeout(signum, frame):
+    global _timer_fired
+    if not _timer_armed:
+        # Fired after the extraction finished but before the timer was stopped
+        return
+    _timer_fired = True
+    raise ExtractionTimeout()
+
+
+def _start_timer(timeout):
+    """Arm a SIGALRM wall-clock timer; a no-op where SIGALRM is unavailable (Windows)."""
+    global _timer_fired, _timer_armed
+    _timer_fired = False
+    _timer_armed = True
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+
+def _disarm_timer():
+    """From here on a pending SIGALRM is ignored instead of raising ExtractionTimeout."""
+    global _timer_armed
+    _timer_armed = False
+
+
+def _stop_timer(timeout):
+    _disarm_timer()
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class Extractor:
+    """
+    A PDF text-extraction backend.
+
+    Backends only know how to open a document, walk its pages and read one
+    page into its text plus line boxes; extract_pages() adds the shared error
+    handling on top. Bump `version` whenever a change should invalidate pages
+    previously extracted with the backend.
+    """
+
+    name = None
+    version = None
+
+    @property
+    def version_tag(self):
+        return f"{self.name}/{self.version}"
+
+    def open(self, f):
+        raise NotImplementedError
+
+    def pages(self, doc):
+        raise NotImplementedError
+
+    def read_page(self, page):
+        """
+        Return (text, lines) for `page`; text is None for an empty page and
+        lines is a list of [x0, top, x1, bottom, text] in top-left origin
+        coordinates (empty if the backend cannot locate lines).
+        """
+        raise NotImplementedError
+
+    def close(self, doc):
+        doc.close()
+
+
+class PdfplumberExtractor(Extractor):
+    """The original extractor: pdfplumber's layout-aware extract_text()."""
+
+    name = "pdfplumber"
+    version = "1"
+
+    def open(self, f):
+        import pdfplumber  # You may need to install this: pip install pdfplumber
+        return pdfplumber.open(f)
+
+    def pages(self, doc):
+        return doc.pages
+
+    def read_page(self, page):
+        text = page.extract_text()
+        try:
+            # Same (default) settings as extract_text(), so the layout analysis it cached is reused
+            lines = [
+                [round(line["x0"], 1), round(line["top"], 1), round(line["x1"], 1),
+                 round(line["bottom"], 1), line["text"]]
+                for line in page.extract_text_lines(return_chars=False)
+            ]
+        except Exception:
+            # The text is what matters; a page without line boxes is still usable
+            lines = []
+        return text, lines
+
+
+class PdfminerExtractor(Extractor):
+    """pdfminer.six driven directly, skipping pdfplumber's per-character objects."""
+
+    name = "pdfminer"
+    version = "1"
+
+    def open(self, f):
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams
+
+        fp = open(f, 'rb')
+        try:
+            document = PDFDocument(PDFParser(fp))
+        except Exception:
+            fp.close()
+            raise
+        device = PDFPageAggregator(PDFResourceManager(), laparams=LAParams())
+        interpreter = PDFPageInterpreter(device.rsrcmgr, device)
+        return {"fp": fp, "document": document, "device": device, "interpreter": interpreter}
+
+    def pages(self, doc):
+        from pdfminer.pdfpage import PDFPage
+
+        for page in PDFPage.create_pages(doc["document"]):
+            yield doc, page
+
+    def read_page(self, page):
+        from pdfminer.layout import LTTextContainer, LTTextLine
+
+        doc, pdf_page = page
+        doc["interpreter"].process_page(pdf_page)
+        layout = doc["device"].get_result()
+
+        parts = []
+        lines = []
+        for obj in layout:
+            if not isinstance(obj, LTTextContainer):
                 continue
-    except Exception as e:
-        print(f"Error reading file {f_name}: {e}")
-        skipped_count += 1
-        continue
+            parts.append(obj.get_text())
+            for line in obj:
+                if isinstance(line, LTTextLine):
+                    # pdfminer measures from the bottom of the page, pdfplumber from the top
+                    lines.append([round(line.x0, 1), round(layout.height - line.y1, 1),
+                                  round(line.x1, 1), round(layout.height - line.y0, 1),
+                                  line.get_text().rstrip("\n")])
+        return "".join(parts).rstrip("\n") or None, lines
+
+    def close(self, doc):
+        doc["fp"].close()
+
+
+class PdfiumExtractor(Extractor):
+    """
+    PDFium through pypdfium2 (installed with pdfplumber), the fastest backend.
+
+    PDFium runs as native code, and Python only handles SIGALRM between
+    calls into it. So the per-file timeout is only enforced between pages:
+    a single page that hangs inside PDFium blocks its worker until PDFium
+    returns. The pure-Python backends can be interrupted anywhere.
+    """
+
+    name = "pdfium"
+    version = "1"
+
+    def open(self, f):
+        import pypdfium2 as pdfium
 
-    print(f"Processing: {f_name}")
+        return pdfium.PdfDocument(f)
+
+    def pages(self, doc):
+        for i in range(len(doc)):
+            yield doc[i]
+
+    def read_page(self, page):
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+        return text.replace("\r\n", "\n") or None, []
+
+
+EXTRACTORS = {
+    extractor.name: extractor
+    for extractor in (PdfplumberExtractor, PdfminerExtractor, PdfiumExtractor)
+}
+
+DEFAULT_BACKEND = PdfplumberExtractor.name
+
+
+def get_extractor(backend=DEFAULT_BACKEND):
+    """Instantiate the extraction backend registered under `backend`."""
     try:
-        pdf = pdfplumber.open(f)
+        return EXTRACTORS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown extraction backend {backend!r}, choose from: {', '.join(EXTRACTORS)}")
+
+
+def extract_pages(f, messages, extractor=None):
+    """
+    Extract each page of a PDF as {"text": ..., "lines": [...]}; None if the
+    file cannot be opened.
+    """
+    extractor = extractor or get_extractor()
+    f_name = os.path.basename(f)
+
+    try:
+        pdf = extractor.open(f)
     except Exception as e:
-        print(f"Error opening PDF file {f}: {e}")
-        print(f"Skipping corrupted file: {f_name}")
-        skipped_count += 1
-        continue
-        
-    text = u''
+        if _timer_fired:
+            raise
+        messages.append(f"Error opening PDF file {f}: {e}")
+        messages.append(f"Skipping corrupted file: {f_name}")
+        return None
+
+    pages = []
     try:
-        for page in pdf.pages:
+        for page in extractor.pages(pdf):
             try: # since pdfplumber tries to convert "P14" into decimal for some reason
-                et = page.extract_text()
+                et, lines = extractor.read_page(page)
             except Exception as e:
-                print(f"Error extracting text from page in {f_name}: {e}")
-                et = None
-            
-            if et is not None: # since pdfplumber returns None when an empty page occurs
-                text += et
-            else:
-                print("Extracted text is None in file " + f)
+                if _timer_fired:
+                    raise
+                messages.append(f"Error extracting text from page in {f_name}: {e}")
+                et, lines = None, []
+
+            if et is None: # since pdfplumber returns None when an empty page occurs
+                messages.append("Extracted text is None in file " + f)
+            pages.append({"text": et or u'', "lines": lines})
     finally:
-        pdf.close()  # Close the PDF file properly
+        extractor.close(pdf)  # Close the PDF file properly
+
+    return pages
+
+
+def assemble_text(pages):
+    """
+    Build the final text of a writing from its cached pages.
+
+    All post-processing of extracted text belongs here, so that changing it
+    only needs `--assemble-only` instead of re-parsing every PDF. Bump
+    ASSEMBLER_VERSION together with any change.
+    """
+    text = u''
+    for page in pages:
+        text += page["text"]
+    return text
+
+
+def extract_text(f, messages, extractor=None):
+    """Extract the text of a single PDF, page by page."""
+    pages = extract_pages(f, messages, extractor)
+    if pages is None:
+        return None
+    return assemble_text(pages)
+
+
+def page_cache_path(sha256, backend=DEFAULT_BACKEND, pages_path=PAGES_DIR):
+    """Location of the cached pages of the PDF with content hash `sha256`."""
+    return os.path.join(pages_path, backend, sha256[:2], sha256 + ".json.gz")
+
+
+def load_pages(sha256, backend=DEFAULT_BACKEND, pages_path=PAGES_DIR):
+    """Return the cached pages of a PDF, or None if it was not extracted with `backend` yet."""
+    path = page_cache_path(sha256, backend, pages_path)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            cached = json.load(file)
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+    if cached.get("extractor") != get_extractor(backend).version_tag:
+        return None
+    return cached["pages"]
 
-    file = open(txt_path, "wb")
-    file.write(text.encode("utf-8", "ignore"))
-    file.close()
-    processed_count += 1
-    
-    if processed_count % 100 == 0:
-        print(f"Processed {processed_count} files so far...")
 
-print(f"PDF processing complete! Processed: {processed_count}, Skipped: {skipped_count}")
-print(f"Total text files created: {len(glob.glob(texts_path + '*'))}")
+def save_pages(sha256, pages, backend=DEFAULT_BACKEND, pages_path=PAGES_DIR):
+    path = page_cache_path(sha256, backend, pages_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cached = {"extractor": get_extractor(backend).version_tag, "pages": pages}
+    data = json.dumps(cached, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    write_atomic(path, gzip.compress(data, compresslevel=6))
 
 
-# In[15]:
+def write_atomic(path, data):
+    """Write `data` to `path` via a temp file and rename, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    # The leading dot keeps stray temp files from a killed run out of glob("*")
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def conversion_version(backend=DEFAULT_BACKEND):
+    """Manifest tag covering both the extraction backend and the assembly rules."""
+    return f"{get_extractor(backend).version_tag}+assemble/{ASSEMBLER_VERSION}"
+
+
+def finish_text(pages, result):
+    """Assemble `pages` into the encoded text handed back in `result`."""
+    data = assemble_text(pages).encode("utf-8", "ignore")
 
+    result["status"] = "processed"
+    result["data"] = data
+    result["output_sha256"] = hashlib.sha256(data).hexdigest()
+    result["output_size"] = len(data)
+    return result
 
-# read texts
-print("Reading extracted text files...")
-texts_path = "./data/texts/"
-text_files = glob.glob(texts_path + "*")
-print(f"Found {len(text_files)} text files to read")
 
-texts = []
-for i, f in enumerate(text_files):
+def process_file(f, timeout=DEFAULT_TIMEOUT, backend=DEFAULT_BACKEND, pages_path=PAGES_DIR):
+    """
+    Convert one PDF into its text.
+
+    Pages already in the page cache for this PDF's content hash are
+    re-assembled without parsing the PDF again. Runs either in the main
+    process or in a pool worker. Returns a result dict whose "status" is one
+    of "processed", "skipped", "unreadable" or "timeout", along with the
+    input and output checksums for the manifest and the encoded text in
+    "data"; storing it is left to the caller, the single writer of the shard
+    store. Log lines are handed back in "messages" instead of printed so that output
+    from parallel workers is not interleaved mid-file, and the time the file
+    took in "seconds".
+    """
+    start = time.perf_counter()
+    result = _convert_file(f, timeout, backend, pages_path)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _convert_file(f, timeout, backend, pages_path):
+    f_name = os.path.basename(f)  # Use os.path.basename for cross-platform compatibility
+    result = {"name": f_name, "status": "skipped", "messages": [], "sha256": None,
+              "data": None, "output_sha256": None, "output_size": None}
+    messages = result["messages"]
+
+    # Check if file is readable and has some content
     try:
-        with open(f, 'rb') as file:
-            texts.append(file.read().decode("utf-8"))
+        with open(f, 'rb') as test_file:
+            header = test_file.read(8)
+        result["sha256"] = file_sha256(f)
     except Exception as e:
-        print(f"Error reading text file {f}: {e}")
-        texts.append("")  # Add empty string to maintain index consistency
-    
-    if (i + 1) % 1000 == 0:
-        print(f"Read {i + 1} text files...")
-        
-# Create pandas dataframe for texts
-print("Creating DataFrame...")
-df = pd.DataFrame({ "text": pd.Series(texts) })
-print(f"DataFrame created with {len(df)} entries")
-df.head()
+        messages.append(f"Error reading file {f_name}: {e}")
+        result["status"] = "unreadable"
+        return result
+
+    if not header.startswith(b'%PDF'):
+        messages.append(f"Skipping non-PDF file: {f_name}")
+        return result
+
+    pages = load_pages(result["sha256"], backend, pages_path)
+    if pages is not None:
+        messages.append(f"Assembling from cached pages: {f_name}")
+        return finish_text(pages, result)
+
+    messages.append(f"Processing: {f_name}")
+    _start_timer(timeout)
+    try:
+        pages = extract_pages(f, messages, get_extractor(backend))
+        # Still inside the try: a timeout that fires up to here is handled below, one after it is ignored
+        _disarm_timer()
+    except Exception:
+        _disarm_timer()
+        if not _timer_fired:
+            raise
+    finally:
+        _stop_timer(timeout)
+
+    if _timer_fired:
+        messages.append(f"Timed out after {timeout}s, skipping: {f_name}")
+        result["status"] = "timeout"
+        return result
+
+    if pages is None:
+        return result
+
+    save_pages(result["sha256"], pages, backend, pages_path)
+    return finish_text(pages, result)
+
+
+def is_up_to_date(f, st, record, store, stored, extractor_version, verify=False):
+    """
+    Decide from the manifest whether `f` can be skipped.
+
+    Matching size and mtime are trusted without opening the PDF; only when
+    the mtime moved (or `verify` is set) is the file re-hashed to tell a
+    touched file from a changed one. `stored` is the shard store's index
+    entry for the file's text (None if it has none).
+    """
+    if record is None or record["extractor_version"] != extractor_version:
+        return False
+    if record["size"] != st.st_size:
+        return False
+    if (record["mtime_ns"] != st.st_mtime_ns or verify) and file_sha256(f) != record["sha256"]:
+        return False
+
+    if record["status"] == "processed":
+        if stored is None:
+            return False
+        _, _, length, checksum = stored
+        if length != record["output_size"] or checksum != record["output_sha256"]:
+            return False
+        if verify and hashlib.sha256(store.get(record["name"])).hexdigest() != checksum:
+            return False
+
+    return True
+
+
+def store_result(result, st, store, manifest, extractor_version):
+    """
+    Put a process_file() result into the shard store and the manifest.
+
+    `st` is the stat of the PDF taken before it was handed to the worker.
+    Nothing is committed; callers commit the store before the manifest so
+    the manifest never points at an unpublished text. Returns the status.
+    """
+    status = result["status"]
+    if status == "processed":
+        result["output_sha256"] = store.put(result["name"], result["data"])
+        result["output_size"] = len(result["data"])
+
+    if status in ("processed", "skipped"):
+        # Only deterministic outcomes are recorded; unreadable and
+        # timed-out files are retried on the next run
+        manifest.record(
+            result["name"], st.st_size, st.st_mtime_ns, result["sha256"],
+            extractor_version, status, result["output_sha256"], result["output_size"]
+        )
+    return status
+
+
+def convert_pdfs(path=PDF_DIR, shards_path=SHARDS_DIR, workers=1, timeout=DEFAULT_TIMEOUT,
+                 max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, manifest_path=MANIFEST_PATH,
+                 verify=False, backend=DEFAULT_BACKEND, pages_path=PAGES_DIR):
+    """
+    Convert every new or changed PDF under `path` into the shard store at `shards_path`.
+
+    The extraction manifest decides what is up to date, so a re-run only
+    touches PDFs that were added, changed upstream or extracted by an older
+    extractor version. With workers > 1 the files are spread over a process
+    pool whose workers are recycled after `max_tasks_per_child` files. Each
+    file gets `timeout` seconds of wall-clock time before it is abandoned.
+    Output is identical to the serial path; only the order of the log lines
+    differs.
+    """
+    print(f"Looking for files in: {path}")
+    try:
+        entries = [e for e in os.scandir(path) if e.is_file()]
+    except FileNotFoundError:
+        entries = []
+    print(f"Found {len(entries)} files to process")
+
+    if len(entries) == 0:
+        print("No files found! Check if the data/full directory exists and contains files.")
+        return False
+
+    processed_count = 0
+    skipped_count = 0
+    timed_out = []
+
+    extractor_version = conversion_version(backend)
+    manifest = ExtractionManifest(manifest_path)
+    store = ShardStore(shards_path)
+    stored = store.entries()
+    pending = []
+    stats = {}
+    for entry in entries:
+        st = entry.stat()
+        record = manifest.get(entry.name)
+        if is_up_to_date(entry.path, st, record, store, stored.get(entry.name),
+                         extractor_version, verify):
+            if record["mtime_ns"] != st.st_mtime_ns:
+                manifest.touch(entry.name, st.st_mtime_ns)
+            skipped_count += 1
+            continue
+        pending.append(entry.path)
+        stats[entry.name] = st
+
+    if skipped_count:
+        print(f"Skipping {skipped_count} up-to-date files")
+
+    work = functools.partial(process_file, timeout=timeout, backend=backend, pages_path=pages_path)
+
+    if workers > 1 and len(pending) > 1:
+        print(f"Extracting {len(pending)} files with {workers} workers")
+        # Spawned, not forked: forking copies this process's threads, locks and open files into every worker
+        pool = multiprocessing.get_context("spawn").Pool(processes=workers, maxtasksperchild=max_tasks_per_child)
+        results = pool.imap_unordered(work, pending)
+    else:
+        pool = None
+        results = map(work, pending)
+
+    finished = False
+    try:
+        with telemetry.stage("convert.extract") as timer:
+            for result in results:
+                for message in result["messages"]:
+                    print(message)
+                timer.add(1, stats[result["name"]].st_size)
+                timer.item(result["name"], result["seconds"])
+
+                status = store_result(result, stats[result["name"]], store, manifest, extractor_version)
+                if status == "processed":
+                    processed_count += 1
+                    if processed_count % 100 == 0:
+                        # Publish the texts before the manifest entries that point at them
+                        store.commit()
+                        manifest.commit()
+                        print(f"Processed {processed_count} files so far...")
+                else:
+                    skipped_count += 1
+                    if status == "timeout":
+                        timed_out.append(result["name"])
+        finished = True
+    finally:
+        # Publish the texts before the manifest entries that point at them
+        total_stored = len(store)
+        store.close()
+        manifest.close()
+        if pool is not None:
+            if finished:
+                pool.close()
+            else:
+                # Interrupted or failed: do not wait for the PDFs still queued
+                pool.terminate()
+            pool.join()
+
+    print(f"PDF processing complete! Processed: {processed_count}, Skipped: {skipped_count}")
+    if timed_out:
+        print(f"Timed out ({len(timed_out)}): {', '.join(sorted(timed_out))}")
+    print(f"Total texts stored: {total_stored}")
+    return True
+
+
+def assemble_texts(shards_path=SHARDS_DIR, pages_path=PAGES_DIR, manifest_path=MANIFEST_PATH,
+                   backend=DEFAULT_BACKEND):
+    """
+    Rebuild every text from the page cache alone, without opening any PDF.
+
+    Only PDFs the manifest knows were extracted with `backend` are
+    considered; texts whose bytes did not change are left untouched.
+    """
+    print(f"Assembling texts from cached pages in: {pages_path}")
+    prefix = get_extractor(backend).version_tag + "+"
+    extractor_version = conversion_version(backend)
+
+    assembled_count = 0
+    unchanged_count = 0
+    missing = []
+
+    with ExtractionManifest(manifest_path) as manifest, ShardStore(shards_path) as store, \
+            telemetry.stage("convert.assemble") as timer:
+        for record in list(manifest.records.values()):
+            if record["status"] != "processed" or not record["extractor_version"].startswith(prefix):
+                continue
+
+            pages = load_pages(record["sha256"], backend, pages_path)
+            if pages is None:
+                missing.append(record["name"])
+                continue
+
+            data = assemble_text(pages).encode("utf-8", "ignore")
+            timer.add(1, len(data))
+            output_sha256 = hashlib.sha256(data).hexdigest()
+            stored = store.entry(record["name"])
+            if stored is not None and stored[3] == output_sha256:
+                unchanged_count += 1
+            else:
+                store.put(record["name"], data)
+                assembled_count += 1
+
+            manifest.record(
+                record["name"], record["size"], record["mtime_ns"], record["sha256"],
+                extractor_version, "processed", output_sha256, len(data)
+            )
+        store.commit()
+
+    print(f"Assembly complete! Rewritten: {assembled_count}, Unchanged: {unchanged_count}")
+    if missing:
+        print(f"No cached pages for {len(missing)} files; run without --assemble-only to extract them")
+    return True
+
+
+def load_metadata(path=METADATA_PATH):
+    """
+    Read the scraper's metadata.jsonl into {pdf name: fields}.
+
+    The scraper appends a line per download, so a later line for the same
+    file replaces an earlier one. A missing file gives no metadata at all.
+    """
+    metadata = {}
+    if not os.path.exists(path):
+        return metadata
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"Skipping malformed metadata line {line_number}: {e}")
+                continue
+            metadata[record.pop("id")] = record
+    return metadata
+
+
+def outputs_key(store, metadata_path, options):
+    """Hash of everything the outputs are built from: the stored texts, the scraper's metadata and `options`."""
+    digest = hashlib.sha256(json.dumps({"format": OUTPUTS_FORMAT, **options}, sort_keys=True).encode("utf-8"))
+    for id, (_, _, _, checksum) in sorted(store.entries().items()):
+        digest.update(f"{id}\0{checksum}\n".encode("utf-8"))
+    digest.update((file_sha256(metadata_path) if os.path.exists(metadata_path) else "-").encode("ascii"))
+    return digest.hexdigest()
+
+
+def build_outputs(shards_path=SHARDS_DIR, parquet_path=PARQUET_PATH, csv_path=CSV_PATH,
+                  jsonl_path=None, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                  partitioned_path=PARTITIONED_PATH, metadata_path=METADATA_PATH,
+                  stamp_path=OUTPUTS_STAMP_PATH):
+    """
+    Stream the stored texts into Parquet and, optionally, CSV/JSONL and a
+    Parquet dataset partitioned by year and course.
+
+    Texts are decoded one at a time in source-file order, so the output is
+    deterministic and only one row group is ever held in memory. Each text is
+    joined with the metadata the scraper recorded for its PDF; texts without
+    any keep null metadata columns.
+
+    A build records what it was made from in `stamp_path`; when neither the
+    stored texts nor the metadata nor the options changed since, and the
+    outputs are still the files it wrote, they are left as they are, so the
+    stages reading them see no change either.
+    """
+    outputs = [path for path in (parquet_path, csv_path, jsonl_path, partitioned_path) if path]
+    options = {"outputs": outputs, "row_group_size": row_group_size}
+    with ShardStore(shards_path) as store:
+        key = outputs_key(store, metadata_path, options)
+    if os.path.exists(stamp_path) and all(os.path.exists(path) for path in outputs):
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+            if stamp.get("key") == key and stamp.get("outputs") == fingerprint(outputs):
+                print(f"Outputs are up to date with the stored texts: {', '.join(outputs)}")
+                return
+
+    metadata = load_metadata(metadata_path)
+    print(f"Loaded metadata for {len(metadata)} files from: {metadata_path}")
+    print(f"Reading stored texts from: {shards_path}")
+    with ShardStore(shards_path) as store, \
+            CorpusWriter(parquet_path, csv_path, jsonl_path, row_group_size,
+                         partitioned_path=partitioned_path) as writer, \
+            telemetry.stage("convert.outputs") as timer:
+        print(f"Found {len(store)} texts to read")
+        for i, (id, view) in enumerate(store):
+            try:
+                text = str(view, "utf-8")
+            except Exception as e:
+                print(f"Error decoding text {id}: {e}")
+                text = ""  # Add empty string to maintain index consistency
+
+            writer.write(id, text, metadata.get(id))
+            timer.add(1, len(view))
+
+            if (i + 1) % 1000 == 0:
+                print(f"Read {i + 1} texts...")
+
+    for output in outputs:
+        print(f"Successfully saved {writer.num_rows} texts to {output}")
 
+    # Written last and atomically: the stamp always describes complete outputs
+    with open(f"{stamp_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({"key": key, "outputs": fingerprint(outputs), "num_rows": writer.num_rows}, f, indent=2)
+    os.replace(f"{stamp_path}.tmp", stamp_path)
 
-# In[16]:
 
+def export_texts(shards_path=SHARDS_DIR, texts_path=TEXTS_DIR):
+    """Write the stored texts back out as one <pdf name>.txt file each, as data/texts/ used to hold."""
+    with ShardStore(shards_path) as store:
+        count = store.export(texts_path)
+    print(f"Exported {count} text files to {texts_path}")
 
-# Number of writings
-df.shape
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the scraped PDFs to text")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of extraction processes (default: number of CPUs, 1 = serial)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Per-file wall-clock timeout in seconds, 0 to disable (default: {DEFAULT_TIMEOUT}); "
+             "with --backend pdfium it is only checked between pages"
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        default=DEFAULT_MAX_TASKS_PER_CHILD,
+        help=f"Recycle a worker after this many files (default: {DEFAULT_MAX_TASKS_PER_CHILD})"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=sorted(EXTRACTORS),
+        default=DEFAULT_BACKEND,
+        help=f"PDF text-extraction backend (default: {DEFAULT_BACKEND})"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Re-hash every PDF and text file instead of trusting size and mtime"
+    )
+    parser.add_argument(
+        "--assemble-only",
+        action="store_true",
+        help="Rebuild the texts from the page cache without parsing any PDF"
+    )
+    parser.add_argument(
+        "--export-texts",
+        action="store_true",
+        help=f"Also write every text as a loose file under {TEXTS_DIR}"
+    )
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help=f"Texts per Parquet row group (default: {DEFAULT_ROW_GROUP_SIZE})"
+    )
+    parser.add_argument(
+        "--no-csv",
+        action="store_true",
+        help=f"Only write {PARQUET_PATH}, not {CSV_PATH}"
+    )
+    parser.add_argument(
+        "--jsonl",
+        help="Also write the texts as JSON lines to this path"
+    )
+    parser.add_argument(
+        "--no-partitioned",
+        action="store_true",
+        help=f"Do not write the year/course-partitioned dataset under {PARTITIONED_PATH}"
+    )
+    args = parser.parse_args(argv)
 
-# In[17]:
+    with telemetry.run("convert_to_text") as run:
+        if args.assemble_only:
+            assemble_texts(SHARDS_DIR, PAGES_DIR, MANIFEST_PATH, args.backend)
+        elif not convert_pdfs(PDF_DIR, SHARDS_DIR, args.workers, args.timeout, args.max_tasks_per_child,
+                              MANIFEST_PATH, args.verify, args.backend, PAGES_DIR):
+            run.ok = False
+            return 1
 
+        build_outputs(SHARDS_DIR, PARQUET_PATH, None if args.no_csv else CSV_PATH,
+                      args.jsonl, args.row_group_size, None if args.no_partitioned else PARTITIONED_PATH,
+                      METADATA_PATH)
+        if args.export_texts:
+            export_texts(SHARDS_DIR, TEXTS_DIR)
+    return 0
 
-# Convert dataframe to csv
-print(f"Converting {len(df)} texts to CSV...")
-df.to_csv("data/texts.csv", index=False, encoding='utf-8', escapechar='\\', quoting=1)
-print("Successfully saved to data/texts.csv")
 
+if __name__ == "__main__":
+    sys.exit(main())
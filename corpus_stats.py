@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+Descriptive statistics of a version of the Bilkent Turkish Writings Dataset.
+
+For every version this computes the distributions of characters, words and
+sentences per writing and of words per sentence, the vocabulary size,
+type-token ratio and most frequent words, the number of empty and
+near-empty writings, and the same counts per year.
+
+The version is read through its memory-mapped Arrow file (see
+bilkent_corpus.py) one record batch at a time, and each batch is processed
+with pyarrow.compute kernels: lengths, regex counts and the word lists are
+computed over whole columns, never text by text in Python. Words are runs
+of letters and digits, folded the Turkish way (I/ı, İ/i) like text_index.py
+does.
+
+The results are cached in the version's metadata.json under "corpus_stats",
+keyed by the version's content hash, so they are computed once per version
+and read back by the dataset card (upload_to_hf.py). Versions whose texts
+are not available (only their metadata.json is committed) have no
+statistics; the card falls back to the num_entries and years recorded in
+their metadata.json.
+"""
+import sys
+import json
+import argparse
+
+from dataset_versioning import (get_latest_version, list_versions, read_metadata, write_metadata, version_stats,
+                                has_texts)
+import telemetry
+
+
+# Bump when the statistics change, so that cached results are recomputed
+STATS_FORMAT = 1
+# Writings with fewer words than this (but at least one) are near-empty
+NEAR_EMPTY_WORDS = 20
+TOP_WORDS = 50
+BATCH_SIZE = 1000
+
+_NOT_WORD = r'[^\p{L}\p{N}_]+'
+# A sentence runs from its first letter or digit to the next ., !, ? or …
+_SENTENCE = r'[\p{L}\p{N}][^.!?…]*'
+QUANTILES = {"p5": 0.05, "p25": 0.25, "median": 0.5, "p75": 0.75, "p95": 0.95}
+
+
+def distribution(values):
+    """Mean, standard deviation, min, max and quantiles of a numpy array."""
+    import numpy as np
+
+    if not len(values):
+        return None
+    summary = {"mean": round(float(values.mean()), 2), "std": round(float(values.std()), 2),
+               "min": float(values.min()), "max": float(values.max())}
+    for name, value in zip(QUANTILES, np.quantile(values, list(QUANTILES.values()))):
+        summary[name] = round(float(value), 2)
+    return summary
+
+
+def fold_words(texts):
+    """The Turkish-folded words of each text, as a pyarrow list array."""
+    import pyarrow.compute as pc
+
+    folded = pc.utf8_normalize(texts, form="NFC")
+    folded = pc.utf8_lower(pc.replace_substring(pc.replace_substring(folded, "I", "ı"), "İ", "i"))
+    return pc.split_pattern_regex(folded, _NOT_WORD)
+
+
+def batch_stats(batch):
+    """Per-text counts and the word frequencies of one record batch."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    texts = pc.fill_null(batch.column("text"), "")
+    words = fold_words(texts)
+    flat = pc.list_flatten(words)
+    # Splitting leaves an empty string where a text starts or ends with a separator
+    nonempty = pc.not_equal(flat, "")
+    rows = pc.list_parent_indices(words).to_numpy()[nonempty.to_numpy(zero_copy_only=False)]
+    counts = pc.value_counts(pc.filter(flat, nonempty)).flatten()
+
+    years = batch.column("year") if "year" in batch.schema.names else pa.nulls(len(batch), pa.int32())
+    return {
+        "chars": pc.utf8_length(texts).to_numpy(zero_copy_only=False),
+        "bytes": pc.binary_length(texts).to_numpy(zero_copy_only=False),
+        "words": np.bincount(rows, minlength=len(texts)),
+        "sentences": pc.count_substring_regex(texts, _SENTENCE).to_numpy(zero_copy_only=False),
+        "blank": pc.equal(pc.utf8_length(pc.utf8_trim_whitespace(texts)), 0).to_numpy(zero_copy_only=False),
+        "years": np.asarray(pc.fill_null(pc.cast(years, pa.int32()), -1).to_numpy(zero_copy_only=False)),
+        "vocabulary": pa.table({"word": counts[0], "count": counts[1]}),
+    }
+
+
+def compute_stats(batches):
+    """Statistics of the texts in `batches` (pyarrow record batches with a "text" column)."""
+    import numpy as np
+    import pyarrow as pa
+
+    columns = {"chars": [], "bytes": [], "words": [], "sentences": [], "blank": [], "years": []}
+    vocabulary = []
+    with telemetry.stage("stats.compute") as timer:
+        for batch in batches:
+            result = batch_stats(batch)
+            for name in columns:
+                columns[name].append(result[name])
+            # Merge the per-batch frequencies every few batches, so memory grows with the vocabulary only
+            vocabulary.append(result["vocabulary"])
+            if len(vocabulary) >= 8:
+                vocabulary = [_merge(vocabulary)]
+            timer.add(len(batch), int(result["bytes"].sum()))
+        columns = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in columns.items()}
+        vocabulary = _merge(vocabulary) if vocabulary else pa.table({"word": pa.array([], pa.string()),
+                                                                    "count": pa.array([], pa.int64())})
+
+    words, sentences = columns["words"], columns["sentences"]
+    total_words = int(words.sum())
+    frequencies = vocabulary.column("count").to_numpy()
+    top = vocabulary.sort_by([("count", "descending"), ("word", "ascending")]).slice(0, TOP_WORDS)
+
+    stats = {
+        "format": STATS_FORMAT,
+        "num_entries": int(len(words)),
+        "total_chars": int(columns["chars"].sum()),
+        "total_bytes": int(columns["bytes"].sum()),
+        "total_words": total_words,
+        "total_sentences": int(sentences.sum()),
+        "empty_texts": int(columns["blank"].sum()),
+        "near_empty_texts": int(((words > 0) & (words < NEAR_EMPTY_WORDS)).sum()),
+        "near_empty_words": NEAR_EMPTY_WORDS,
+        "vocabulary_size": int(len(frequencies)),
+        "type_token_ratio": round(len(frequencies) / total_words, 4) if total_words else None,
+        "hapax_legomena": int((frequencies == 1).sum()),
+        "chars": distribution(columns["chars"]),
+        "words": distribution(words),
+        "sentences": distribution(sentences),
+        "words_per_sentence": distribution(words[sentences > 0] / sentences[sentences > 0]),
+        "top_words": [[word, count] for word, count in zip(top.column("word").to_pylist(),
+                                                           top.column("count").to_pylist())],
+        "years": year_breakdown(columns),
+    }
+    return stats
+
+
+def _merge(tables):
+    import pyarrow as pa
+
+    merged = pa.concat_tables(tables).group_by("word").aggregate([("count", "sum")])
+    return pa.table({"word": merged.column("word"), "count": merged.column("count_sum")})
+
+
+def year_breakdown(columns):
+    """{year: counts} of the rows of each year; rows without a year are under "unknown"."""
+    import numpy as np
+
+    breakdown = {}
+    for year in np.unique(columns["years"]):
+        rows = columns["years"] == year
+        words = columns["words"][rows]
+        breakdown["unknown" if year < 0 else str(int(year))] = {
+            "num_entries": int(rows.sum()),
+            "total_words": int(words.sum()),
+            "mean_words": round(float(words.mean()), 2),
+            "median_words": float(np.median(words)),
+            "empty_texts": int(columns["blank"][rows].sum()),
+            "near_empty_texts": int(((words > 0) & (words < NEAR_EMPTY_WORDS)).sum()),
+        }
+    return breakdown
+
+
+def year_span(stats):
+    """The years covered by `stats` as e.g. "2014-2025", or None when no row has a year."""
+    years = sorted(int(year) for year in (stats or {}).get("years", {}) if year != "unknown")
+    if not years:
+        return None
+    return str(years[0]) if years[0] == years[-1] else f"{years[0]}-{years[-1]}"
+
+
+def corpus_stats(version=None, refresh=False):
+    """
+    Statistics of `version` (default: the latest), cached in its metadata.json.
+
+    The cache is keyed by the version's content hash, so the texts are only
+    read again when the version's contents change or `refresh` is set.
+    Returns None, computing and caching nothing, for a version whose texts
+    are not available.
+    """
+    from bilkent_corpus import BilkentCorpus
+
+    if version is None:
+        version = get_latest_version()["version"]
+    if not has_texts(version):
+        return None
+    content_hash = (version_stats(version) or {}).get("content_hash")
+
+    metadata = read_metadata(version) or {"version": version}
+    cached = metadata.get("corpus_stats")
+    if (not refresh and cached and cached.get("format") == STATS_FORMAT
+            and cached.get("content_hash") == content_hash):
+        return cached
+
+    with BilkentCorpus(version) as corpus:
+        columns = [name for name in ("text", "year") if name in corpus.columns]
+        stats = compute_stats(corpus.to_arrow().select(columns).to_batches(max_chunksize=BATCH_SIZE))
+    stats["content_hash"] = content_hash
+
+    # Reread: version_stats() may have updated the metadata
+    metadata = read_metadata(version) or {"version": version}
+    metadata["corpus_stats"] = stats
+    write_metadata(version, metadata)
+    print(f"Computed statistics of {version}: {stats['num_entries']} entries, {stats['total_words']} words, "
+          f"vocabulary of {stats['vocabulary_size']}")
+    return stats
+
+
+def version_summary(version):
+    """
+    (number of entries, years such as "2014-2025") of `version`, from its
+    statistics or, for versions without texts, from its metadata.json.
+    """
+    stats = corpus_stats(version)
+    metadata = read_metadata(version) or {}
+    num_entries = stats["num_entries"] if stats else metadata.get("num_entries")
+    return num_entries, year_span(stats) or metadata.get("years")
+
+
+def print_stats(version, stats):
+    print(f"\n{version}: {stats['num_entries']} writings, {stats['total_words']} words, "
+          f"{stats['total_sentences']} sentences, {stats['total_bytes'] / (1024 * 1024):.1f} MB")
+    print(f"Vocabulary: {stats['vocabulary_size']} words (type-token ratio {stats['type_token_ratio']}, "
+          f"{stats['hapax_legomena']} occurring once)")
+    print(f"Empty: {stats['empty_texts']}, near-empty (< {stats['near_empty_words']} words): "
+          f"{stats['near_empty_texts']}")
+    print(f"\n{'per writing':<20} {'mean':>9} {'min':>7} {'p5':>7} {'median':>8} {'p95':>8} {'max':>9}")
+    for name in ("chars", "words", "sentences", "words_per_sentence"):
+        d = stats[name]
+        if d:
+            print(f"{name:<20} {d['mean']:>9.1f} {d['min']:>7.0f} {d['p5']:>7.0f} {d['median']:>8.0f} "
+                  f"{d['p95']:>8.0f} {d['max']:>9.0f}")
+    print(f"\n{'year':<8} {'writings':>9} {'words':>10} {'mean words':>11} {'empty':>6} {'near-empty':>11}")
+    for year, row in stats["years"].items():
+        print(f"{year:<8} {row['num_entries']:>9} {row['total_words']:>10} {row['mean_words']:>11.1f} "
+              f"{row['empty_texts']:>6} {row['near_empty_texts']:>11}")
+    print("\nMost frequent words: " + ", ".join(f"{word} ({count})" for word, count in stats["top_words"][:15]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute descriptive statistics of a dataset version")
+    parser.add_argument("--version", help="Version to describe (default: the latest)")
+    parser.add_argument("--all", action="store_true", help="Describe every version")
+    parser.add_argument("--refresh", action="store_true", help="Recompute even if cached statistics are current")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    args = parser.parse_args(argv)
+
+    with telemetry.run("corpus_stats"):
+        for version in (list_versions() if args.all else [args.version or get_latest_version()["version"]]):
+            stats = corpus_stats(version, args.refresh)
+            if stats is None:
+                print(f"{version} has no texts to compute statistics from (only its metadata.json)")
+                continue
+            if args.json:
+                print(json.dumps({"version": version, **stats}, ensure_ascii=False, indent=2))
+            else:
+                print_stats(version, stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Streaming writers for the Bilkent Turkish Writings Dataset outputs.
+
+Texts are appended one at a time and flushed in bounded batches, so peak
+memory depends on the row-group size rather than on the size of the corpus.
+"""
+import os
+import csv
+import json
+import shutil
+import tempfile
+from urllib.parse import quote
+
+
+DEFAULT_ROW_GROUP_SIZE = 1000
+# Rows buffered across all partitions of the partitioned dataset, in row groups
+DEFAULT_MAX_BUFFERED_GROUPS = 16
+
+# Columns of the Parquet/JSONL outputs besides "text"; all but "source" come
+# from the scraper's metadata and may be missing
+METADATA_COLUMNS = ("writing_id", "course", "term", "year", "source_url")
+
+PARTITION_COLUMNS = ("year", "course")
+
+# What pyarrow's hive partitioning reads back as null
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _schema():
+    import pyarrow as pa  # You may need to install this: pip install pyarrow
+
+    return pa.schema([
+        ("source", pa.string()),
+        ("text", pa.string()),
+        ("writing_id", pa.string()),
+        ("course", pa.string()),
+        ("term", pa.string()),
+        ("year", pa.int32()),
+        ("source_url", pa.string()),
+    ])
+
+
+def _temp_path(path):
+    """
+    A new, empty file next to `path` to write it to before moving it into
+    place. Its name is unique, so concurrent writers of `path` do not share it.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    return tmp_path
+
+
+def open_csv_writer(path):
+    """Open a CSV writer that matches pandas' to_csv(quoting=1, escapechar='\\\\')."""
+    file = open(path, 'w', encoding='utf-8', newline='')
+    writer = csv.writer(file, quoting=csv.QUOTE_ALL, escapechar='\\', lineterminator='\n')
+    return file, writer
+
+
+class _ParquetSink:
+    """
+    One Parquet file filled from buffered rows, one row group per flush.
+
+    The file is written next to its path and moved into place on close, so
+    readers never see a partly written file, and a write that fails can be
+    discarded without touching the existing one.
+    """
+
+    def __init__(self, path, schema, compression, row_group_size):
+        self.path = path
+        self.schema = schema
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.rows = {name: [] for name in schema.names}
+        self.writer = None
+        self.tmp_path = None
+
+    def __len__(self):
+        return len(self.rows["text"])
+
+    def append(self, row):
+        for name in self.schema.names:
+            self.rows[name].append(row.get(name))
+
+    def _open(self):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self.tmp_path, self.schema, compression=self.compression)
+
+    def _write(self, rows):
+        import pyarrow as pa
+
+        self.writer.write_table(pa.table(rows, schema=self.schema), row_group_size=self.row_group_size)
+
+    def flush(self):
+        if self.writer is None:
+            self.tmp_path = _temp_path(self.path)
+            self.writer = self._open()
+        if len(self):
+            self._write(self.rows)
+            self.rows = {name: [] for name in self.schema.names}
+
+    def close(self):
+        # Always flush once so that an empty corpus still yields a valid file
+        self.flush()
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        """Drop the partly written file, leaving any existing one untouched."""
+        if self.writer is not None:
+            self.writer.close()
+        if self.tmp_path is not None and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class _ArrowSink(_ParquetSink):
+    """
+    One uncompressed Arrow IPC file, one record batch per flush, so that
+    readers can memory-map it and use the columns without copying them.
+
+    Being moved into place matters all the more here: an existing file may
+    be memory-mapped by a reader, which would crash if it were truncated
+    under it. Stages running side by side may materialize the same file,
+    so each writer has a temporary file of its own.
+    """
+
+    def _open(self):
+        import pyarrow as pa
+
+        return pa.ipc.new_file(self.tmp_path, self.schema)
+
+    def _write(self, rows):
+        import pyarrow as pa
+
+        self.writer.write_batch(pa.record_batch(rows, schema=self.schema))
+
+
+class CorpusWriter:
+    """
+    Write rows of source, text and metadata to Parquet and, optionally, CSV,
+    JSONL, an Arrow IPC file and a Parquet dataset partitioned by year and
+    course, in a single pass.
+
+    The Parquet files are zstd-compressed and get one row group per
+    `row_group_size` rows. The partitioned dataset uses hive-style
+    year=.../course=... directories, so pyarrow.dataset and similar readers
+    can prune partitions from a filter. Each partition gets a row group once
+    it has `row_group_size` rows of its own; when the partitions together
+    buffer `max_buffered_groups` row groups' worth of rows, the largest one
+    is flushed early, which bounds memory without writing every partition in
+    tiny row groups. The CSV keeps the historical single "text" column so
+    existing consumers of data/texts.csv keep working.
+
+    Every output is written to a temporary file (or, for the partitioned
+    dataset, directory) and only replaces the existing one on close(). Used
+    as a context manager, an exception discards the partial outputs
+    instead, so readers keep the previous complete ones.
+    """
+
+    def __init__(self, parquet_path=None, csv_path=None, jsonl_path=None,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="zstd", partitioned_path=None,
+                 arrow_path=None, max_buffered_groups=DEFAULT_MAX_BUFFERED_GROUPS):
+        self.parquet_path = parquet_path
+        self.partitioned_path = partitioned_path
+        self.row_group_size = row_group_size
+        self.max_buffered_rows = max_buffered_groups * row_group_size
+        self.compression = compression
+        self.num_rows = 0
+        self._parquet = None
+        self._arrow = None
+        self._partitions = {}
+        self._buffered = 0
+        self._csv = None
+        self._jsonl = None
+        # (file, temporary path, path) of the CSV and JSONL outputs
+        self._files = []
+
+        for path in (parquet_path, csv_path, jsonl_path, arrow_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if parquet_path or partitioned_path or arrow_path:
+            self._schema = _schema()
+        if parquet_path:
+            self._parquet = _ParquetSink(parquet_path, self._schema, compression, row_group_size)
+        if arrow_path:
+            self._arrow = _ArrowSink(arrow_path, self._schema, None, row_group_size)
+        if partitioned_path:
+            parent = os.path.dirname(os.path.normpath(partitioned_path)) or "."
+            os.makedirs(parent, exist_ok=True)
+            self._partitioned_tmp = tempfile.mkdtemp(
+                prefix=f".{os.path.basename(os.path.normpath(partitioned_path))}.", suffix=".tmp", dir=parent)
+            self._partition_schema = self._schema.remove(self._schema.get_field_index("year"))
+            self._partition_schema = self._partition_schema.remove(
+                self._partition_schema.get_field_index("course"))
+        if csv_path:
+            tmp_path = _temp_path(csv_path)
+            csv_file, self._csv = open_csv_writer(tmp_path)
+            self._files.append((csv_file, tmp_path, csv_path))
+            self._csv.writerow(["text"])
+        if jsonl_path:
+            tmp_path = _temp_path(jsonl_path)
+            self._jsonl = open(tmp_path, 'w', encoding='utf-8')
+            self._files.append((self._jsonl, tmp_path, jsonl_path))
+
+    def write(self, source, text, metadata=None):
+        """Append a single text with its (optional) metadata."""
+        row = {"source": source, "text": text}
+        for column in METADATA_COLUMNS:
+            row[column] = (metadata or {}).get(column)
+
+        if self._csv is not None:
+            self._csv.writerow([text])
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(row, ensure_ascii=False) + "\n")
+        if self._parquet is not None:
+            self._parquet.append(row)
+            if len(self._parquet) >= self.row_group_size:
+                self._parquet.flush()
+        if self._arrow is not None:
+            self._arrow.append(row)
+            if len(self._arrow) >= self.row_group_size:
+                self._arrow.flush()
+        if self.partitioned_path:
+            sink = self._partition(row)
+            sink.append(row)
+            self._buffered += 1
+            if len(sink) >= self.row_group_size:
+                self._flush_partition(sink)
+            elif self._buffered >= self.max_buffered_rows:
+                # Bound the memory held across all partitions
+                self._flush_partition(max(self._partitions.values(), key=len))
+        self.num_rows += 1
+
+    def _partition(self, row):
+        key = tuple(row[column] for column in PARTITION_COLUMNS)
+        sink = self._partitions.get(key)
+        if sink is None:
+            parts = [
+                f"{column}={NULL_PARTITION if value is None else quote(str(value), safe='')}"
+                for column, value in zip(PARTITION_COLUMNS, key)
+            ]
+            path = os.path.join(self._partitioned_tmp, *parts, "part-0.parquet")
+            sink = _ParquetSink(path, self._partition_schema, self.compression, self.row_group_size)
+            self._partitions[key] = sink
+        return sink
+
+    def _flush_partition(self, sink):
+        self._buffered -= len(sink)
+        sink.flush()
+
+    def _sinks(self):
+        return [sink for sink in (self._parquet, self._arrow) if sink is not None] + list(self._partitions.values())
+
+    def close(self):
+        """Finish every output and move it into place."""
+        for sink in self._sinks():
+            sink.close()
+        for file, tmp_path, path in self._files:
+            file.close()
+            os.replace(tmp_path, path)
+        if self.partitioned_path:
+            # Replaced as a whole, so partitions that vanished do not linger
+            shutil.rmtree(self.partitioned_path, ignore_errors=True)
+            os.replace(self._partitioned_tmp, self.partitioned_path)
+
+    def discard(self):
+        """Drop every partly written output, leaving the existing ones untouched."""
+        for sink in self._sinks():
+            sink.discard()
+        for file, tmp_path, _ in self._files:
+            file.close()
+            os.remove(tmp_path)
+        if self.partitioned_path:
+            shutil.rmtree(self._partitioned_tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            # Do not publish partial outputs over complete ones
+            self.discard()
+        else:
+            self.close()
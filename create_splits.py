@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+Create train/validation/test splits of the Bilkent Turkish Writings Dataset.
+
+Each row goes to a split chosen by a hash of its group: the writing's
+ogrenciNo (writing_id) when known, else its source file, else the hash of
+its text. All rows of a group land in the same split, so a student's
+writings never leak between train and test. Because the split depends only
+on the group and the salt, a row keeps its split in every version.
+Assignments are also carried over from the previous version's splits.json,
+so only groups that are new to a version are hashed, and changing the
+ratios later does not move writings that already have a split. A row whose
+group changes kind, e.g. from its source file to its writing id once the
+scraper's metadata is available, keeps the split of its old group; the old
+keys are recorded as aliases of the new group in splits.json.
+
+The splits of versions/vN/ are written to versions/vN/splits/:
+<split>.npy holds the row indices of each split in version order, and
+splits.json holds the settings, counts and group assignments. The version is
+read in one streaming pass over its manifest; no text is loaded.
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+
+from dataset_versioning import (get_latest_version, list_versions, manifest_path, iter_version_rows,
+                                text_hash, version_dir, previous_version)
+
+
+SPLITS = ("train", "validation", "test")
+DEFAULT_RATIOS = (0.8, 0.1, 0.1)
+DEFAULT_SALT = "bilkent-turkish-writings"
+
+
+def splits_dir(version):
+    return f"{version_dir(version)}/splits"
+
+
+def iter_manifest_rows(version):
+    """The rows of `version` without their texts, as dicts with a "hash" key."""
+    path = manifest_path(version)
+    if not os.path.exists(path):
+        for row in iter_version_rows(version):
+            row["hash"] = text_hash(row.pop("text"))
+            yield row
+        return
+    with open(path, 'r', encoding='utf-8') as manifest:
+        for line in manifest:
+            yield json.loads(line)
+
+
+def group_key(row):
+    """What a row is grouped by: its writing id, else its source file, else its text."""
+    if row.get("writing_id"):
+        return f"id:{row['writing_id']}"
+    if row.get("source"):
+        return f"source:{row['source']}"
+    return f"hash:{row['hash']}"
+
+
+def legacy_keys(row):
+    """The keys a row was grouped by before its writing id was known: its source file, then its text."""
+    keys = []
+    if row.get("source"):
+        keys.append(f"source:{row['source']}")
+    keys.append(f"hash:{row['hash']}")
+    return keys
+
+
+def carried_split(row, group, known):
+    """
+    (split, key) of `row` in the previous version's `known` assignments, or
+    (None, None). A group that is new to this version, such as the writing id
+    of a row that used to be grouped by its source file or text, is looked up
+    by the row's legacy keys too, so the row does not move to another split.
+    """
+    for key in [group] + [key for key in legacy_keys(row) if key != group]:
+        if key in known:
+            return known[key], key
+    return None, None
+
+
+def assign_split(group, ratios=DEFAULT_RATIOS, salt=DEFAULT_SALT):
+    """The split of `group`: a stable hash of the group mapped onto the cumulative ratios."""
+    digest = hashlib.sha256(f"{salt}\0{group}".encode("utf-8")).digest()
+    position = int.from_bytes(digest[:8], "big") / 2 ** 64
+    total = sum(ratios)
+    cumulative = 0.0
+    for split, ratio in zip(SPLITS, ratios):
+        cumulative += ratio / total
+        if position < cumulative:
+            return split
+    return SPLITS[-1]
+
+
+def read_splits(version):
+    """The splits.json of `version`, or None if its splits were never created."""
+    path = f"{splits_dir(version)}/splits.json"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_split(version, split):
+    """The row indices of `split` in `version`, as a numpy array."""
+    import numpy as np
+
+    return np.load(f"{splits_dir(version)}/{split}.npy")
+
+
+def create_splits(version=None, ratios=DEFAULT_RATIOS, salt=DEFAULT_SALT, carry_over=True):
+    """
+    Assign every row of `version` to a split and write the split files.
+
+    Returns the contents of splits.json. With `carry_over`, groups that the
+    previous version assigned with the same salt keep their split.
+    """
+    import numpy as np
+
+    if version is None:
+        version = get_latest_version()["version"]
+    if len(ratios) != len(SPLITS) or min(ratios) < 0 or sum(ratios) <= 0:
+        raise ValueError(f"Expected {len(SPLITS)} non-negative ratios, got {ratios}")
+
+    known = {}
+    previous = previous_version(version) if carry_over else None
+    previous_splits = read_splits(previous) if previous else None
+    if previous_splits and previous_splits["salt"] == salt:
+        known = previous_splits["assignments"]
+
+    assignments = {}
+    aliases = {}
+    indices = {split: [] for split in SPLITS}
+    carried = 0
+    for index, row in enumerate(iter_manifest_rows(version)):
+        group = group_key(row)
+        split = assignments.get(group)
+        if split is None:
+            split, key = carried_split(row, group, known)
+            if split is not None:
+                carried += 1
+                if key != group:
+                    aliases[key] = group
+            else:
+                split = assign_split(group, ratios, salt)
+            assignments[group] = split
+        indices[split].append(index)
+
+    directory = splits_dir(version)
+    os.makedirs(directory, exist_ok=True)
+    for split, rows in indices.items():
+        np.save(f"{directory}/{split}.npy", np.asarray(rows, dtype=np.uint32))
+
+    info = {
+        "version": version,
+        "ratios": dict(zip(SPLITS, ratios)),
+        "salt": salt,
+        "carried_over_from": previous if known else None,
+        "num_rows": {split: len(rows) for split, rows in indices.items()},
+        "num_groups": {split: sum(1 for s in assignments.values() if s == split) for split in SPLITS},
+        "carried_over_groups": carried,
+        "assignments": assignments,
+        "aliases": aliases,
+    }
+    fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, f"{directory}/splits.json")
+
+    counts = ", ".join(f"{split}: {len(rows)}" for split, rows in indices.items())
+    print(f"Created splits for {version} ({counts}; {len(assignments)} groups, "
+          f"{carried} carried over from {previous or 'no earlier version'})")
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create train/validation/test splits of a dataset version")
+    parser.add_argument(
+        "--version",
+        help="Version to split (default: the latest); with --all, every version in order"
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Split every version, oldest first, so that each carries over the previous one's splits"
+    )
+    parser.add_argument(
+        "--ratios",
+        nargs=3,
+        type=float,
+        default=DEFAULT_RATIOS,
+        metavar=("TRAIN", "VALIDATION", "TEST"),
+        help="Share of groups in each split (default: 0.8 0.1 0.1)"
+    )
+    parser.add_argument(
+        "--salt",
+        default=DEFAULT_SALT,
+        help="Hash salt; a different salt gives a different, equally stable split"
+    )
+    parser.add_argument(
+        "--no-carry-over",
+        action="store_true",
+        help="Hash every group afresh instead of reusing the previous version's assignments"
+    )
+    args = parser.parse_args(argv)
+
+    versions = list_versions() if args.all else [args.version]
+    for version in versions:
+        create_splits(version, tuple(args.ratios), args.salt, not args.no_carry_over)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
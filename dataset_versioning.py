@@ -1,112 +1,755 @@
 """
 Dataset versioning utilities for Bilkent Turkish Writings Dataset.
+
+Texts are stored once, in a content-addressed store under versions/store/
+keyed by the SHA-256 of their UTF-8 bytes. A version is only a manifest,
+versions/vN/rows.jsonl, listing the hash (plus source and metadata) of each
+of its rows in order, so a new release only adds the texts that changed.
+CSV, Parquet, JSONL or Arrow copies of a version are materialized on demand.
 """
 import os
-import shutil
+import re
+import sys
+import csv
 import json
-import pandas as pd
+import zlib
+import hashlib
+import argparse
+import tempfile
 from datetime import datetime
 
+from text_store import ShardStore
+from corpus_writer import CorpusWriter, METADATA_COLUMNS
+import telemetry
+
+
+VERSIONS_DIR = "./versions"
+STORE_DIR = "./versions/store/"
+CSV_PATH = "./data/texts.csv"
+PARQUET_PATH = "./data/texts.parquet"
+
+MANIFEST_NAME = "rows.jsonl"
+FORMATS = ("csv", "parquet", "jsonl", "arrow")
+
+# Texts whose word-shingle Jaccard similarity reaches this are treated as one
+# writing re-extracted differently rather than as a removal plus an addition
+FUZZY_THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+# MinHash signature length, split into bands for locality-sensitive hashing
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+
+# {(num_permutations, seed): (a, b)}, the MinHash permutations, drawn once per process
+_permutations = {}
+
+
+def text_hash(text):
+    """The key a text is stored under; matches the checksum ShardStore records for it."""
+    return hashlib.sha256(text.encode("utf-8", "ignore")).hexdigest()
+
+
+def iter_csv_texts(csv_path):
+    """Stream the "text" column of a CSV written by convert_to_text.py."""
+    csv.field_size_limit(sys.maxsize)
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, escapechar='\\')
+        header = next(reader, None)
+        if header is None:
+            return
+        column = header.index("text")
+        for row in reader:
+            yield row[column]
+
+
+def iter_source_rows(parquet_path=PARQUET_PATH, csv_path=CSV_PATH):
+    """
+    Stream the rows of the current build as dicts of source, text and metadata.
+
+    The Parquet output is used whenever it exists, since it carries the
+    source file and the metadata; the CSV, which only has the text, is used
+    when it is the only output (builds from before Parquet was written).
+    """
+    if os.path.exists(parquet_path):
+        import pyarrow.parquet as pq  # You may need to install this: pip install pyarrow
+
+        parquet_file = pq.ParquetFile(parquet_path)
+        for batch in parquet_file.iter_batches():
+            for row in batch.to_pylist():
+                yield {"text": row.get("text") or "", "source": row.get("source"),
+                       **{column: row.get(column) for column in METADATA_COLUMNS}}
+    elif os.path.exists(csv_path):
+        for text in iter_csv_texts(csv_path):
+            yield {"text": text, "source": None}
+
+
+def version_dir(version):
+    return f"{VERSIONS_DIR}/{version}"
+
+
+def manifest_path(version):
+    return f"{version_dir(version)}/{MANIFEST_NAME}"
+
+
+class TextStats(object):
+    """
+    Running statistics over the texts of a version, filled in one row at a time.
+
+    The content hash covers the ordered row hashes, so it identifies a
+    version's contents independently of how they are stored; the checksum is
+    that of the file the statistics were computed from.
+    """
+
+    def __init__(self):
+        self.num_entries = 0
+        self.total_bytes = 0
+        self.total_chars = 0
+        self.total_tokens = 0
+        self.empty_texts = 0
+        self._content_hash = hashlib.sha256()
+
+    def add(self, text, digest=None):
+        self.num_entries += 1
+        self.total_bytes += len(text.encode("utf-8", "ignore"))
+        self.total_chars += len(text)
+        self.total_tokens += len(text.split())
+        if not text.strip():
+            self.empty_texts += 1
+        self._content_hash.update((digest or text_hash(text)).encode("ascii"))
+
+    def as_dict(self, checksum=None):
+        return {
+            "num_entries": self.num_entries,
+            "total_bytes": self.total_bytes,
+            "total_chars": self.total_chars,
+            "total_tokens": self.total_tokens,
+            "empty_texts": self.empty_texts,
+            "content_hash": self._content_hash.hexdigest(),
+            "checksum": checksum,
+        }
+
+
+def store_version(version, rows, store_path=STORE_DIR, unless_content_hash=None):
+    """
+    Store `rows` as `version`: add texts the store lacks, then write the manifest.
+
+    Returns the version's statistics (see TextStats), gathered in the same
+    pass, and the number of texts that were added to the store. When the
+    rows turn out to have `unless_content_hash`, no manifest is written and
+    the statistics are None.
+    """
+    directory = version_dir(version)
+    created = not os.path.isdir(directory)
+    os.makedirs(directory, exist_ok=True)
+    added = 0
+    stats = TextStats()
+    checksum = hashlib.sha256()
+
+    def discard():
+        # Leave no half-created version behind: list_versions() would take it for the latest
+        os.remove(tmp_path)
+        if created:
+            os.rmdir(directory)
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with ShardStore(store_path) as store, os.fdopen(fd, 'wb') as manifest, \
+                telemetry.stage("version.store") as timer:
+            known = set(store.ids())
+            for row in rows:
+                text = row.pop("text")
+                digest = text_hash(text)
+                if digest not in known:
+                    store.put_text(digest, text)
+                    known.add(digest)
+                    added += 1
+                stats.add(text, digest)
+                line = (json.dumps({"hash": digest, **row}, ensure_ascii=False) + "\n").encode("utf-8")
+                checksum.update(line)
+                manifest.write(line)
+            # Publish the texts before the manifest that points at them
+            store.commit()
+            timer.add(stats.num_entries, stats.total_bytes)
+    except BaseException:
+        discard()
+        raise
+    stats = stats.as_dict(checksum.hexdigest())
+    if unless_content_hash is not None and stats["content_hash"] == unless_content_hash:
+        discard()
+        return None, added
+    os.replace(tmp_path, manifest_path(version))
+
+    return stats, added
+
+
+def iter_version_rows(version, store_path=STORE_DIR):
+    """
+    Yield the rows of `version` in order as dicts with the text filled in.
+
+    Versions created before the content-addressed store fall back to their
+    texts.csv copy.
+    """
+    path = manifest_path(version)
+    if not os.path.exists(path):
+        legacy_csv = f"{version_dir(version)}/texts.csv"
+        if os.path.exists(legacy_csv):
+            for text in iter_csv_texts(legacy_csv):
+                yield {"text": text, "source": None}
+        return
+
+    with ShardStore(store_path) as store, open(path, 'r', encoding='utf-8') as manifest:
+        for line in manifest:
+            row = json.loads(line)
+            text = store.get_text(row["hash"])
+            if text is None:
+                raise KeyError(f"Text {row['hash']} of {version} is missing from {store_path}")
+            row["text"] = text
+            yield row
+
+
+def iter_version_texts(version, store_path=STORE_DIR):
+    for row in iter_version_rows(version, store_path):
+        yield row["text"]
+
+
+def has_texts(version):
+    """Whether the texts of `version` are available: it has a manifest, or a texts.csv from before the store."""
+    return os.path.exists(manifest_path(version)) or os.path.exists(f"{version_dir(version)}/texts.csv")
+
+
+def materialize_version(version, fmt="csv", path=None, store_path=STORE_DIR):
+    """
+    Write `version` out as a CSV, Parquet, JSONL or Arrow IPC file and return its path.
+
+    The CSV is byte-identical to the data/texts.csv the version was created
+    from. By default the file is written next to the manifest, and an
+    existing, newer file is reused. Raises FileNotFoundError for a version
+    whose texts are not available (only its metadata.json), rather than
+    writing an empty file.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if not has_texts(version):
+        raise FileNotFoundError(f"{version} has neither a manifest nor a texts.csv to materialize")
+    if path is None:
+        path = f"{version_dir(version)}/texts.{fmt}"
+        manifest = manifest_path(version)
+        if os.path.exists(path) and (not os.path.exists(manifest)
+                                     or os.path.getmtime(path) >= os.path.getmtime(manifest)):
+            return path
+
+    outputs = {"parquet_path": None, "csv_path": None, "jsonl_path": None, "arrow_path": None}
+    outputs[f"{fmt}_path"] = path
+    with telemetry.stage("version.materialize") as timer:
+        with CorpusWriter(**outputs) as writer:
+            for row in iter_version_rows(version, store_path):
+                writer.write(row.get("source"), row["text"], row)
+        timer.add(writer.num_rows, os.path.getsize(path))
+
+    print(f"Materialized {version} with {writer.num_rows} entries to {path}")
+    return path
+
+
+def write_metadata(version, metadata):
+    # Replaced rather than rewritten in place, so readers never see a partly written file
+    fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=version_dir(version))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, f"{version_dir(version)}/metadata.json")
+
+
+def read_metadata(version):
+    metadata_path = f"{version_dir(version)}/metadata.json"
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
 
 def initialize_version_control():
     """Initialize the version control system."""
-    version_info_dir = "./versions"
+    version_info_dir = VERSIONS_DIR
     os.makedirs(version_info_dir, exist_ok=True)
-    
+
     # Check if we need to create a v1 from existing data
     if not os.path.exists(f"{version_info_dir}/v1"):
         print("Creating initial version (v1) from existing dataset...")
-        
-        # Create version directory
-        os.makedirs(f"{version_info_dir}/v1", exist_ok=True)
-        
-        # Copy current data to v1
-        if os.path.exists("./data/texts.csv"):
-            shutil.copy("./data/texts.csv", f"{version_info_dir}/v1/texts.csv")
-        
+
+        stats, added = store_version("v1", iter_source_rows())
+
         # Create version metadata
         metadata = {
             "version": "v1",
             "date_created": datetime.now().strftime("%Y-%m-%d"),
-            "num_entries": count_entries(f"{version_info_dir}/v1/texts.csv"),
-            "description": "Initial version of Bilkent Turkish Writings Dataset"
+            "num_entries": stats["num_entries"],
+            "content_hash": stats["content_hash"],
+            "description": "Initial version of Bilkent Turkish Writings Dataset",
+            "stats": stats
         }
-        
-        with open(f"{version_info_dir}/v1/metadata.json", 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
-        
+        write_metadata("v1", metadata)
+
         print(f"Version v1 created with {metadata['num_entries']} entries")
-    
+
     return get_latest_version()
 
 
-def create_new_version(version_num):
-    """Create a new version of the dataset."""
-    version_info_dir = "./versions"
+def create_new_version(version_num, parquet_path=PARQUET_PATH, csv_path=CSV_PATH, unless_same_as=None):
+    """
+    Create a new version of the dataset from the current build.
+
+    Only texts not already in the store are written, so the cost in disk
+    space is proportional to the new rows rather than to the whole dataset.
+    With `unless_same_as` (the metadata of a version), nothing is created and
+    None is returned when the build has that version's texts; this is found
+    out in the same pass that stores the texts.
+    """
     version_name = f"v{version_num}"
-    
-    # Ensure versions directory exists
-    os.makedirs(version_info_dir, exist_ok=True)
-    
-    # Create version directory
-    os.makedirs(f"{version_info_dir}/{version_name}", exist_ok=True)
-    
-    # Copy current data to new version
-    if os.path.exists("./data/texts.csv"):
-        shutil.copy("./data/texts.csv", f"{version_info_dir}/{version_name}/texts.csv")
-    
+
+    content_hash = (unless_same_as or {}).get("content_hash")
+    stats, added = store_version(version_name, iter_source_rows(parquet_path, csv_path),
+                                 unless_content_hash=content_hash)
+    if stats is None:
+        return None
+
     # Create version metadata
     metadata = {
         "version": version_name,
         "date_created": datetime.now().strftime("%Y-%m-%d"),
-        "num_entries": count_entries(f"{version_info_dir}/{version_name}/texts.csv"),
-        "description": f"Version {version_name} of Bilkent Turkish Writings Dataset"
+        "num_entries": stats["num_entries"],
+        "content_hash": stats["content_hash"],
+        "description": f"Version {version_name} of Bilkent Turkish Writings Dataset",
+        "stats": stats
     }
-    
-    with open(f"{version_info_dir}/{version_name}/metadata.json", 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    
-    print(f"Version {version_name} created with {metadata['num_entries']} entries")
+    write_metadata(version_name, metadata)
+
+    print(f"Version {version_name} created with {metadata['num_entries']} entries ({added} new texts stored)")
+
+    previous = previous_version(version_name)
+    if previous is not None and not has_texts(previous):
+        # Only its metadata.json is available: everything would look added
+        print(f"{previous} has no texts to compare with; {version_name} gets no changelog")
+    elif previous is not None:
+        changelog = diff_versions(previous, version_name)
+        write_changelog(version_name, changelog)
+        metadata["changelog"] = changelog
+        print(summarize_diff(changelog))
     return metadata
 
 
+def migrate_legacy_versions(store_path=STORE_DIR):
+    """
+    Move versions that still hold a full texts.csv copy into the store.
+
+    The CSV is only deleted once the version materializes back to exactly
+    the same bytes.
+    """
+    for version in list_versions():
+        legacy_csv = f"{version_dir(version)}/texts.csv"
+        if os.path.exists(manifest_path(version)) or not os.path.exists(legacy_csv):
+            continue
+
+        print(f"Migrating {version} into {store_path}...")
+        rows = ({"text": text, "source": None} for text in iter_csv_texts(legacy_csv))
+        stats, added = store_version(version, rows, store_path)
+
+        fd, check_path = tempfile.mkstemp(suffix='.csv', dir=version_dir(version))
+        os.close(fd)
+        try:
+            materialize_version(version, "csv", check_path, store_path)
+            if file_digest(check_path) != file_digest(legacy_csv):
+                print(f"Warning: {version} does not round-trip; keeping {legacy_csv}")
+                continue
+        finally:
+            os.remove(check_path)
+
+        os.remove(legacy_csv)
+        metadata = read_metadata(version) or {"version": version}
+        metadata.update(num_entries=stats["num_entries"], content_hash=stats["content_hash"], stats=stats)
+        write_metadata(version, metadata)
+        print(f"Migrated {version}: {stats['num_entries']} entries, {added} new texts stored")
+
+
+def csv_stats(csv_path):
+    """Statistics of a texts CSV, and its checksum, from a single read of the file."""
+    checksum = hashlib.sha256()
+
+    def lines():
+        with open(csv_path, 'rb') as f:
+            for line in f:
+                checksum.update(line)
+                yield line.decode('utf-8')
+
+    csv.field_size_limit(sys.maxsize)
+    stats = TextStats()
+    reader = csv.reader(lines(), escapechar='\\')
+    header = next(reader, None)
+    if header is not None:
+        column = header.index("text")
+        for row in reader:
+            stats.add(row[column])
+    return stats.as_dict(checksum.hexdigest())
+
+
+def version_stats(version, refresh=False, store_path=STORE_DIR, update_cache=True):
+    """
+    Statistics of `version`, cached in its metadata.json.
+
+    The cache is keyed by the checksum of the version's manifest (or, for
+    versions predating the store, its texts.csv), so the texts are only
+    re-read when that file changed or `refresh` is set. Callers that may run
+    alongside other stages pass `update_cache=False` to compute stale
+    statistics without rewriting metadata.json under them.
+    """
+    path = manifest_path(version)
+    if not os.path.exists(path):
+        path = f"{version_dir(version)}/texts.csv"
+        if not os.path.exists(path):
+            return None
+
+    metadata = read_metadata(version) or {"version": version}
+    cached = metadata.get("stats")
+    if not refresh and cached and cached.get("checksum") == file_digest(path):
+        return cached
+
+    if path.endswith(".csv"):
+        stats = csv_stats(path)
+    else:
+        checksum = file_digest(path)
+        accumulator = TextStats()
+        for row in iter_version_rows(version, store_path):
+            accumulator.add(row["text"], row["hash"])
+        stats = accumulator.as_dict(checksum)
+
+    if update_cache:
+        metadata.update(num_entries=stats["num_entries"], content_hash=stats["content_hash"], stats=stats)
+        write_metadata(version, metadata)
+    return stats
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_versions():
+    """Names of all versions, oldest first."""
+    version_info_dir = VERSIONS_DIR
+    if not os.path.exists(version_info_dir):
+        return []
+
+    versions = [d for d in os.listdir(version_info_dir)
+                if d.startswith('v') and d[1:].isdigit() and os.path.isdir(os.path.join(version_info_dir, d))]
+    versions.sort(key=lambda x: int(x[1:]))
+    return versions
+
+
 def get_latest_version():
     """Get information about the latest version."""
-    version_info_dir = "./versions"
-    
-    if not os.path.exists(version_info_dir):
-        return None
-    
-    versions = [d for d in os.listdir(version_info_dir) if d.startswith('v') and os.path.isdir(os.path.join(version_info_dir, d))]
-    
+    versions = list_versions()
     if not versions:
         return None
-    
-    # Sort versions and get the latest one
-    versions.sort(key=lambda x: int(x[1:]))
+
     latest = versions[-1]
-    
-    metadata_path = os.path.join(version_info_dir, latest, "metadata.json")
-    if os.path.exists(metadata_path):
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
+    metadata = read_metadata(latest)
+    if metadata is not None:
+        return metadata
+
     return {"version": latest, "date_created": "unknown", "num_entries": "unknown"}
 
 
+def version_index(version):
+    """
+    The rows of `version` as (hash, identity) pairs, without reading any text
+    from the store. The identity is the writing id or the source file, when known.
+    """
+    path = manifest_path(version)
+    if not os.path.exists(path):
+        return [(row.pop("hash", None) or text_hash(row["text"]), None)
+                for row in iter_version_rows(version)]
+
+    index = []
+    with open(path, 'r', encoding='utf-8') as manifest:
+        for line in manifest:
+            row = json.loads(line)
+            index.append((row["hash"], row.get("writing_id") or row.get("source")))
+    return index
+
+
+def version_texts(version, hashes, store_path=STORE_DIR):
+    """{hash: text} for the given hashes of `version`."""
+    if os.path.exists(manifest_path(version)):
+        with ShardStore(store_path) as store:
+            return {digest: store.get_text(digest) for digest in hashes}
+    return {digest: text for digest, text in
+            ((text_hash(text), text) for text in iter_version_texts(version)) if digest in hashes}
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashes of the overlapping word n-grams of `text`, ignoring case and whitespace."""
+    words = re.findall(r'\w+', text.casefold())
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set, num_permutations=NUM_PERMUTATIONS, seed=0):
+    """MinHash signature of a set of 32-bit shingle hashes, as a tuple of ints."""
+    import numpy as np
+
+    prime = (1 << 61) - 1
+    permutations = _permutations.get((num_permutations, seed))
+    if permutations is None:
+        rng = np.random.RandomState(seed)
+        permutations = (rng.randint(1, 1 << 31, size=num_permutations, dtype=np.uint64),
+                        rng.randint(0, 1 << 31, size=num_permutations, dtype=np.uint64))
+        _permutations[(num_permutations, seed)] = permutations
+    a, b = permutations
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    # a, b < 2^31 and values < 2^32, so a * values + b stays below 2^64
+    hashed = (values[:, None] * a[None, :] + b[None, :]) % prime
+    return tuple(int(x) for x in hashed.min(axis=0))
+
+
+def fuzzy_matches(removed, added, threshold=FUZZY_THRESHOLD, num_bands=NUM_BANDS):
+    """
+    Pair texts of `removed` ({hash: text}) with near-duplicates in `added`.
+
+    Candidates come from MinHash LSH buckets, so the cost grows with the
+    number of texts rather than with every possible pair; each candidate is
+    confirmed with the exact Jaccard similarity of its shingles. Returns
+    [(removed hash, added hash, similarity)], best matches first, each hash
+    used at most once.
+    """
+    if not removed or not added:
+        return []
+
+    shingle_sets = {}
+    buckets = {}
+    rows_per_band = NUM_PERMUTATIONS // num_bands
+    for side, texts in (("removed", removed), ("added", added)):
+        for digest, text in texts.items():
+            shingle_sets[side, digest] = shingles(text)
+            signature = minhash_signature(shingle_sets[side, digest])
+            for band in range(num_bands):
+                key = (band, signature[band * rows_per_band:(band + 1) * rows_per_band])
+                buckets.setdefault(key, ([], []))[side == "added"].append(digest)
+
+    candidates = set()
+    for old, new in buckets.values():
+        candidates.update((o, n) for o in old for n in new)
+
+    scored = []
+    for old, new in candidates:
+        similarity = jaccard(shingle_sets["removed", old], shingle_sets["added", new])
+        if similarity >= threshold:
+            scored.append((similarity, old, new))
+    scored.sort(key=lambda match: (-match[0], match[1], match[2]))
+
+    matches, used_old, used_new = [], set(), set()
+    for similarity, old, new in scored:
+        if old not in used_old and new not in used_new:
+            used_old.add(old)
+            used_new.add(new)
+            matches.append((old, new, round(similarity, 4)))
+    return matches
+
+
+def diff_versions(a, b, threshold=FUZZY_THRESHOLD, store_path=STORE_DIR):
+    """
+    Compare version `a` with version `b`.
+
+    Rows are matched by text hash first; of the rows left over, those with
+    the same writing id (or source file) on both sides are reported as
+    modified, and the rest are paired by fuzzy text similarity, which catches
+    writings that were only re-extracted. Everything still unmatched is
+    added or removed. Returns a JSON-serializable changelog. Raises
+    FileNotFoundError when either version's texts are not available, rather
+    than reporting all of the other version's rows as added or removed.
+    """
+    for version in (a, b):
+        if not has_texts(version):
+            raise FileNotFoundError(f"{version} has neither a manifest nor a texts.csv to compare")
+    with telemetry.stage("version.diff") as timer:
+        changelog = _diff_versions(a, b, threshold, store_path)
+        timer.add(changelog["unchanged"] + len(changelog["added"]) + len(changelog["modified"]))
+    return changelog
+
+
+def _diff_versions(a, b, threshold, store_path):
+    index_a, index_b = version_index(a), version_index(b)
+
+    counts_a, counts_b = {}, {}
+    for digest, _ in index_a:
+        counts_a[digest] = counts_a.get(digest, 0) + 1
+    for digest, _ in index_b:
+        counts_b[digest] = counts_b.get(digest, 0) + 1
+
+    # Rows whose exact text survives; duplicates are matched count for count
+    unchanged = sum(min(count, counts_b.get(digest, 0)) for digest, count in counts_a.items())
+    removed, added = [], []
+    for index, counts, other, leftover in ((index_a, counts_a, counts_b, removed),
+                                           (index_b, counts_b, counts_a, added)):
+        surplus = {digest: count - other.get(digest, 0) for digest, count in counts.items()}
+        for digest, identity in reversed(index):
+            if surplus[digest] > 0:
+                surplus[digest] -= 1
+                leftover.append((digest, identity))
+        leftover.reverse()
+
+    modified = []
+    added_by_identity = {}
+    for digest, identity in added:
+        if identity is not None:
+            added_by_identity.setdefault(identity, []).append(digest)
+    still_removed = []
+    for digest, identity in removed:
+        candidates = added_by_identity.get(identity) if identity is not None else None
+        if candidates:
+            modified.append({"from": digest, "to": candidates.pop(0), "id": identity, "match": "id"})
+        else:
+            still_removed.append((digest, identity))
+    matched_new = {change["to"] for change in modified}
+    still_added = [(digest, identity) for digest, identity in added if digest not in matched_new]
+
+    wanted_a = {digest for digest, _ in still_removed} | {change["from"] for change in modified}
+    wanted_b = {digest for digest, _ in still_added} | matched_new
+    texts_a = version_texts(a, wanted_a, store_path)
+    texts_b = version_texts(b, wanted_b, store_path)
+
+    for change in modified:
+        change["similarity"] = round(jaccard(shingles(texts_a[change["from"]]),
+                                             shingles(texts_b[change["to"]])), 4)
+
+    fuzzy = fuzzy_matches({digest: texts_a[digest] for digest, _ in still_removed},
+                          {digest: texts_b[digest] for digest, _ in still_added}, threshold)
+    identities = dict(still_removed)
+    for old, new, similarity in fuzzy:
+        modified.append({"from": old, "to": new, "id": identities.get(old), "match": "fuzzy",
+                         "similarity": similarity})
+    fuzzy_old = {old for old, _, _ in fuzzy}
+    fuzzy_new = {new for _, new, _ in fuzzy}
+
+    return {
+        "from": a,
+        "to": b,
+        "unchanged": unchanged,
+        "added": [{"hash": digest, "id": identity} for digest, identity in still_added
+                  if digest not in fuzzy_new],
+        "removed": [{"hash": digest, "id": identity} for digest, identity in still_removed
+                    if digest not in fuzzy_old],
+        "modified": modified,
+    }
+
+
+def summarize_diff(changelog):
+    return (f"{changelog['from']} -> {changelog['to']}: {len(changelog['added'])} added, "
+            f"{len(changelog['removed'])} removed, {len(changelog['modified'])} modified, "
+            f"{changelog['unchanged']} unchanged")
+
+
+def write_changelog(version, changelog):
+    """Record `changelog` (from diff_versions) in the metadata.json of `version`."""
+    metadata = read_metadata(version) or {"version": version}
+    metadata["changelog"] = changelog
+    write_metadata(version, metadata)
+
+
+def previous_version(version):
+    versions = list_versions()
+    if version in versions and versions.index(version) > 0:
+        return versions[versions.index(version) - 1]
+    return None
+
+
 def count_entries(csv_path):
-    """Count the number of entries in a CSV file."""
+    """Count the number of entries in a CSV file; parse errors propagate rather than count as 0."""
     if not os.path.exists(csv_path):
         return 0
-    
-    try:
-        df = pd.read_csv(csv_path)
-        return len(df)
-    except:
+    return csv_stats(csv_path)["num_entries"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versions of the Bilkent Turkish Writings Dataset")
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Move versions that still hold a full texts.csv into the content-addressed store"
+    )
+    parser.add_argument(
+        "--materialize",
+        metavar="VERSION",
+        help="Write VERSION out as a file (next to its manifest unless --output is given)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="csv",
+        help="Format for --materialize (default: csv)"
+    )
+    parser.add_argument(
+        "--output",
+        help="Path for --materialize"
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="VERSION",
+        help="Print the statistics of VERSION, recomputing them if its files changed"
+    )
+    parser.add_argument(
+        "--diff",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        help="Report the writings added, removed and modified between two versions"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=FUZZY_THRESHOLD,
+        help=f"Similarity at which --diff pairs re-extracted texts (default: {FUZZY_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the full --diff changelog as JSON"
+    )
+    parser.add_argument(
+        "--write-changelog",
+        action="store_true",
+        help="Store the --diff changelog in the metadata.json of the TO version"
+    )
+    args = parser.parse_args(argv)
+
+    with telemetry.run("dataset_versioning"):
+        if args.migrate:
+            migrate_legacy_versions()
+        if args.materialize:
+            materialize_version(args.materialize, args.format, args.output)
+            return 0
+        if args.stats:
+            print(json.dumps(version_stats(args.stats), indent=2))
+            return 0
+        if args.diff:
+            try:
+                changelog = diff_versions(*args.diff, threshold=args.threshold)
+            except FileNotFoundError as e:
+                parser.error(str(e))
+            print(json.dumps(changelog, ensure_ascii=False, indent=2) if args.json else summarize_diff(changelog))
+            if args.write_changelog:
+                write_changelog(args.diff[1], changelog)
+            return 0
+
+        latest = initialize_version_control()
+        print(f"Latest version: {latest}")
         return 0
 
 
 if __name__ == "__main__":
-    # For testing purposes
-    latest = initialize_version_control()
-    print(f"Latest version: {latest}")
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""
+Find near-duplicate writings in the Bilkent Turkish Writings Dataset.
+
+The same essay can reach the corpus twice, e.g. under two URLs or extracted
+from two slightly different PDFs. Every distinct text gets a MinHash
+signature of its word shingles (the same signatures dataset_versioning.py
+uses to diff versions), computed in batches by a process pool. Signatures
+are kept in data/dedup/signatures.sqlite by text hash, so each text is only
+hashed once across builds and versions. Candidate pairs come from banded
+LSH buckets, so the cost grows with the number of texts rather than with
+the number of pairs. Each candidate is confirmed when the share of equal
+signature values, an estimate of its Jaccard similarity, reaches the
+threshold. Rows with identical texts are clusters as well. Texts without
+a single word (empty, whitespace or punctuation only) all have the same
+shingles, so they are left out of the clustering and listed separately in
+the report instead.
+
+The clusters are written to data/dedup/report.json; with --output, the
+rows are also written without duplicates, keeping the first row of each
+cluster.
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import multiprocessing
+
+from corpus_writer import CorpusWriter
+from dataset_versioning import (PARQUET_PATH, CSV_PATH, NUM_PERMUTATIONS, NUM_BANDS, SHINGLE_SIZE,
+                                iter_source_rows, iter_version_rows, shingles, minhash_signature, text_hash)
+import telemetry
+
+
+DEDUP_DIR = "./data/dedup/"
+SIGNATURES_PATH = "./data/dedup/signatures.sqlite"
+REPORT_PATH = "./data/dedup/report.json"
+# Deduplicated copy of the build, read by update_dataset.py --dedup
+DEDUP_PARQUET_PATH = "./data/dedup/texts.parquet"
+DEDUP_CSV_PATH = "./data/dedup/texts.csv"
+
+# Estimated Jaccard similarity at which two texts count as the same writing
+DEDUP_THRESHOLD = 0.8
+DEFAULT_BATCH_SIZE = 256
+
+# Signatures computed with other parameters are not comparable and are recomputed
+SIGNATURE_PARAMS = f"shingles={SHINGLE_SIZE},permutations={NUM_PERMUTATIONS},seed=0"
+
+_WORD = re.compile(r'\w')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    hash TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    signature BLOB NOT NULL
+)
+"""
+
+
+class SignatureStore:
+    """SQLite-backed MinHash signatures, keyed by the SHA-256 of the text."""
+
+    def __init__(self, path=SIGNATURES_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+
+    def get_many(self, hashes):
+        """{hash: signature} of the given hashes that have a current signature."""
+        import numpy as np
+
+        found = {}
+        hashes = list(hashes)
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, signature FROM signatures WHERE params = ? "
+                f"AND hash IN ({', '.join('?' for _ in chunk)})", [SIGNATURE_PARAMS] + chunk)
+            for digest, blob in rows:
+                found[digest] = tuple(int(x) for x in np.frombuffer(blob, dtype=np.uint64))
+        return found
+
+    def put_many(self, signatures):
+        """Store {hash: signature}; call commit() to persist."""
+        import numpy as np
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO signatures (hash, params, signature) VALUES (?, ?, ?)",
+            [(digest, SIGNATURE_PARAMS, np.asarray(signature, dtype=np.uint64).tobytes())
+             for digest, signature in signatures.items()])
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def signature_batch(batch):
+    """MinHash signatures of a batch of (hash, text) pairs; runs in a pool worker."""
+    return {digest: minhash_signature(shingles(text)) for digest, text in batch}
+
+
+def iter_rows(version=None, parquet_path=PARQUET_PATH, csv_path=CSV_PATH):
+    """The rows of `version`, or of the current build when no version is given."""
+    if version is not None:
+        return iter_version_rows(version)
+    return iter_source_rows(parquet_path, csv_path)
+
+
+def compute_signatures(rows, store, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read `rows` once and return ([(hash, source, writing_id)] in row order,
+    {hash: signature}), computing signatures only for texts the store lacks.
+    Texts without any word get no signature.
+    """
+    index = []
+    seen = set()
+    missing = []
+
+    def batches():
+        batch = []
+        for row in rows:
+            digest = text_hash(row["text"])
+            index.append((digest, row.get("source"), row.get("writing_id")))
+            if digest not in seen:
+                seen.add(digest)
+                if not _WORD.search(row["text"]):
+                    continue
+                batch.append((digest, row["text"]))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    signatures = {}
+    # Spawned like convert_to_text.py's workers, so they inherit none of this process's threads or locks
+    pool = multiprocessing.get_context("spawn").Pool(processes=workers) if workers > 1 else None
+    with telemetry.stage("dedup.signatures") as timer:
+        try:
+            for batch in batches():
+                known = store.get_many(digest for digest, _ in batch)
+                signatures.update(known)
+                todo = [(digest, text) for digest, text in batch if digest not in known]
+                missing.append(todo)
+                timer.add(len(batch), sum(len(text) for _, text in batch))
+                # Hash the missing texts of a few batches at a time, so memory stays bounded
+                if len(missing) >= 4 * max(1, workers):
+                    _sign(missing, store, signatures, pool)
+            _sign(missing, store, signatures, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    store.commit()
+    return index, signatures
+
+
+def _sign(pending, store, signatures, pool):
+    batches = [batch for batch in pending if batch]
+    pending.clear()
+    results = pool.imap_unordered(signature_batch, batches) if pool is not None else map(signature_batch, batches)
+    for computed in results:
+        store.put_many(computed)
+        signatures.update(computed)
+
+
+def similarity(a, b):
+    """Share of equal values of two MinHash signatures, an estimate of their Jaccard similarity."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def find_clusters(index, signatures, threshold=DEDUP_THRESHOLD, num_bands=NUM_BANDS):
+    """
+    Group the rows of `index` into clusters of near-duplicates.
+
+    Returns a list of clusters, each a list of row numbers in row order,
+    leaving out rows without any duplicate and rows whose text has no
+    signature because it has no words.
+    """
+    parent = list(range(len(index)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        i, j = find(i), find(j)
+        if i != j:
+            parent[max(i, j)] = min(i, j)
+
+    # Identical texts
+    first_row = {}
+    for row, (digest, _, _) in enumerate(index):
+        if digest not in signatures:
+            continue
+        if digest in first_row:
+            union(first_row[digest], row)
+        else:
+            first_row[digest] = row
+
+    # Near-duplicates among the distinct texts
+    rows_per_band = NUM_PERMUTATIONS // num_bands
+    buckets = {}
+    for digest in first_row:
+        signature = signatures[digest]
+        for band in range(num_bands):
+            buckets.setdefault((band, signature[band * rows_per_band:(band + 1) * rows_per_band]), []).append(digest)
+
+    checked = set()
+    for members in buckets.values():
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                pair = (members[i], members[j])
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if similarity(signatures[pair[0]], signatures[pair[1]]) >= threshold:
+                    union(first_row[pair[0]], first_row[pair[1]])
+
+    clusters = {}
+    for row in range(len(index)):
+        clusters.setdefault(find(row), []).append(row)
+    return [rows for rows in clusters.values() if len(rows) > 1]
+
+
+def cluster_report(index, signatures, clusters, threshold):
+    """JSON-serializable summary of `clusters`; the first row of each is the one kept."""
+    report = []
+    for rows in clusters:
+        kept = index[rows[0]][0]
+        report.append({
+            "kept": rows[0],
+            "rows": [{"row": row, "hash": index[row][0], "source": index[row][1], "writing_id": index[row][2],
+                      "similarity": round(similarity(signatures[kept], signatures[index[row][0]]), 4)}
+                     for row in rows],
+        })
+    duplicates = sum(len(rows) - 1 for rows in clusters)
+    wordless = [{"row": row, "hash": digest, "source": source, "writing_id": writing_id}
+                for row, (digest, source, writing_id) in enumerate(index) if digest not in signatures]
+    return {
+        "threshold": threshold,
+        "num_rows": len(index),
+        "num_distinct_texts": len({digest for digest, _, _ in index}),
+        "num_clusters": len(clusters),
+        "num_duplicates": duplicates,
+        "clusters": report,
+        "num_wordless": len(wordless),
+        "wordless": wordless,
+    }
+
+
+def write_deduplicated(rows, dropped, parquet_path=None, csv_path=None, jsonl_path=None):
+    """Write `rows` without the row numbers in `dropped`; returns the number of rows written."""
+    with CorpusWriter(parquet_path, csv_path, jsonl_path) as writer:
+        for row_number, row in enumerate(rows):
+            if row_number not in dropped:
+                writer.write(row.get("source"), row["text"], row)
+    return writer.num_rows
+
+
+def deduplicate(version=None, threshold=DEDUP_THRESHOLD, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                report_path=REPORT_PATH, parquet_path=None, csv_path=None, jsonl_path=None,
+                signatures_path=SIGNATURES_PATH):
+    """
+    Cluster the near-duplicates of the current build (or of `version`), write
+    the report and, when output paths are given, the deduplicated rows.
+    Returns the report.
+    """
+    with SignatureStore(signatures_path) as store:
+        index, signatures = compute_signatures(iter_rows(version), store, workers, batch_size)
+
+    with telemetry.stage("dedup.clusters") as timer:
+        clusters = find_clusters(index, signatures, threshold)
+        timer.add(len(index))
+    report = cluster_report(index, signatures, clusters, threshold)
+    report["source"] = version or "build"
+
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Found {report['num_duplicates']} duplicates in {report['num_clusters']} clusters "
+          f"among {report['num_rows']} rows; report written to {report_path}")
+    if report["num_wordless"]:
+        print(f"Left out {report['num_wordless']} rows without any word (empty or punctuation only)")
+
+    if parquet_path or csv_path or jsonl_path:
+        dropped = {row for rows in clusters for row in rows[1:]}
+        written = write_deduplicated(iter_rows(version), dropped, parquet_path, csv_path, jsonl_path)
+        for path in (parquet_path, csv_path, jsonl_path):
+            if path:
+                print(f"Wrote {written} deduplicated rows to {path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate writings with MinHash LSH")
+    parser.add_argument(
+        "--version",
+        help="Deduplicate this version instead of the current build (data/texts.parquet)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEDUP_THRESHOLD,
+        help=f"Estimated Jaccard similarity at which texts are duplicates (default: {DEDUP_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes computing signatures (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Texts per signature batch (default: {DEFAULT_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--report",
+        default=REPORT_PATH,
+        help=f"Where to write the cluster report (default: {REPORT_PATH})"
+    )
+    parser.add_argument(
+        "--output",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Also write the rows without duplicates to PATH (.parquet, .csv or .jsonl); may be repeated"
+    )
+    args = parser.parse_args(argv)
+
+    outputs = {"parquet_path": None, "csv_path": None, "jsonl_path": None}
+    for path in args.output:
+        fmt = os.path.splitext(path)[1].lstrip(".")
+        if f"{fmt}_path" not in outputs:
+            parser.error(f"Unsupported output format: {path}")
+        outputs[f"{fmt}_path"] = path
+
+    with telemetry.run("dedup"):
+        deduplicate(args.version, args.threshold, args.workers, args.batch_size, args.report, **outputs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""
+Export a version of the Bilkent Turkish Writings Dataset as pre-tokenized,
+memory-mappable token files for language model training.
+
+    python export_tokens.py                                   # latest version, UTF-8 bytes
+    python export_tokens.py --tokenizer tokenizers:./tokenizer.json
+    python export_tokens.py --tokenizer transformers:./my-model --workers 8
+
+    from export_tokens import load_tokens
+    tokens, offsets, manifest = load_tokens("v2")
+    document = tokens[offsets[i]:offsets[i + 1]]              # token ids of row i, nothing parsed
+
+A version is tokenized once per tokenizer into
+versions/<version>/tokens/<tokenizer>/, by a process pool (byte-level
+encoding runs in this process, where it is cheaper than sending the texts
+to workers):
+
+- tokens.bin: the token ids of every row, in row order and back to back, as
+  a flat uint16 array (uint32 for vocabularies over 65536 ids);
+- offsets.npy: int64 start of every row in tokens.bin, plus the end, so row i
+  is tokens[offsets[i]:offsets[i + 1]];
+- manifest.json: the tokenizer, a hash of its files, the dtype, vocabulary
+  size and counts, and the content hash of the version, so stale exports
+  (new texts, or a tokenizer changed on disk) are detected and rebuilt.
+
+The default tokenizer is byte-level: the ids are the UTF-8 bytes of the text
+(vocabulary of 256). `tokenizers:<path>` loads a tokenizer.json with the
+tokenizers library, and `transformers:<name or path>` an AutoTokenizer from
+the local cache or disk; neither downloads anything.
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import fnmatch
+import hashlib
+import argparse
+import multiprocessing
+
+from dataset_versioning import get_latest_version, version_dir, version_stats, iter_version_rows, STORE_DIR
+import telemetry
+
+
+TOKENS_DIR = "tokens"
+EXPORT_FORMAT = 1
+DEFAULT_TOKENIZER = "bytes"
+DEFAULT_BATCH_SIZE = 256
+# What a transformers tokenizer is loaded from, as opposed to the model's weights and config
+TOKENIZER_FILES = ("tokenizer*", "vocab*", "merges.txt", "special_tokens_map.json", "added_tokens.json",
+                   "*.model", "*.tiktoken")
+
+# Set in each pool worker (and in this process when running without a pool)
+_tokenizer = None
+
+
+class ByteTokenizer(object):
+    """Token ids are the UTF-8 bytes of the text."""
+
+    vocab_size = 256
+
+    def encode_batch(self, texts):
+        import numpy as np
+
+        return [np.frombuffer(text.encode("utf-8"), dtype=np.uint8) for text in texts]
+
+
+class TokenizersTokenizer(object):
+    """A tokenizer.json loaded with the tokenizers library."""
+
+    def __init__(self, path):
+        from tokenizers import Tokenizer  # You may need to install this: pip install tokenizers
+
+        self.tokenizer = Tokenizer.from_file(path)
+        self.vocab_size = self.tokenizer.get_vocab_size(with_added_tokens=True)
+
+    def encode_batch(self, texts):
+        return [encoding.ids for encoding in self.tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+class TransformersTokenizer(object):
+    """An AutoTokenizer from a local directory or the local Hugging Face cache."""
+
+    def __init__(self, name):
+        from transformers import AutoTokenizer  # You may need to install this: pip install transformers
+
+        self.tokenizer = AutoTokenizer.from_pretrained(name, local_files_only=True)
+        self.vocab_size = len(self.tokenizer)
+
+    def encode_batch(self, texts):
+        return self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+
+def load_tokenizer(spec):
+    """The tokenizer described by `spec`: "bytes", "tokenizers:<path>" or "transformers:<name or path>"."""
+    kind, _, name = spec.partition(":")
+    if kind == "bytes" and not name:
+        return ByteTokenizer()
+    if kind == "tokenizers" and name:
+        return TokenizersTokenizer(name)
+    if kind == "transformers" and name:
+        return TransformersTokenizer(name)
+    raise ValueError(f"Unknown tokenizer {spec!r}, expected bytes, tokenizers:<path> or transformers:<name>")
+
+
+def tokenizer_dir_name(spec):
+    """
+    A directory name for the tokenizer `spec`, e.g. "tokenizers-tokenizer.json-1f0c3a9e":
+    the last part of its path or name, and a hash of the whole spec so that
+    tokenizers of the same name in different places get different directories.
+    """
+    kind, _, name = spec.partition(":")
+    if not name:
+        return re.sub(r'[^\w.-]+', '_', kind)
+    digest = hashlib.sha256(spec.encode("utf-8")).hexdigest()[:8]
+    return re.sub(r'[^\w.-]+', '_', f"{kind}-{os.path.basename(os.path.normpath(name))}-{digest}")
+
+
+def tokenizer_files(spec):
+    """The local files the tokenizer `spec` is loaded from, or [] for the byte-level tokenizer."""
+    kind, _, name = spec.partition(":")
+    if kind == "tokenizers":
+        return [name]
+    if kind != "transformers":
+        return []
+    directory = name
+    if not os.path.isdir(directory):
+        from huggingface_hub import snapshot_download  # You may need to install this: pip install huggingface_hub
+
+        directory = snapshot_download(name, local_files_only=True)
+    return sorted(os.path.join(directory, file) for file in os.listdir(directory)
+                  if any(fnmatch.fnmatch(file, pattern) for pattern in TOKENIZER_FILES))
+
+
+def tokenizer_hash(spec):
+    """sha256 over the names and contents of the tokenizer's files, or None for the byte-level tokenizer."""
+    files = tokenizer_files(spec)
+    if not files:
+        return None
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def tokens_dir(version, tokenizer=DEFAULT_TOKENIZER):
+    return f"{version_dir(version)}/{TOKENS_DIR}/{tokenizer_dir_name(tokenizer)}"
+
+
+def dtype_for(vocab_size):
+    return "uint16" if vocab_size <= 2 ** 16 else "uint32"
+
+
+def _init_worker(spec):
+    global _tokenizer
+    _tokenizer = load_tokenizer(spec)
+
+
+def encode_batch(texts):
+    """Token ids of a batch of texts as bytes of one uint32 array per text; runs in a pool worker."""
+    import numpy as np
+
+    return [np.asarray(ids, dtype=np.uint32).tobytes() for ids in _tokenizer.encode_batch(texts)]
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row["text"])
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_manifest(version, tokenizer=DEFAULT_TOKENIZER):
+    """The manifest.json of the export of `version` with `tokenizer`, or None if there is none."""
+    path = f"{tokens_dir(version, tokenizer)}/manifest.json"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def export_tokens(version=None, tokenizer=DEFAULT_TOKENIZER, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                  force=False, store_path=STORE_DIR):
+    """
+    Tokenize `version` (default: the latest) with `tokenizer` and write its token files.
+
+    Returns the manifest. An export whose manifest matches the version's
+    content hash, the tokenizer and the hash of the tokenizer's files is
+    reused unless `force` is set.
+    """
+    import numpy as np
+
+    if version is None:
+        version = get_latest_version()["version"]
+    # Only read: the tokens stage runs alongside others that read the version's metadata.json
+    content_hash = (version_stats(version, update_cache=False) or {}).get("content_hash")
+    files_hash = tokenizer_hash(tokenizer)
+
+    manifest = read_manifest(version, tokenizer)
+    if (not force and manifest and manifest.get("format") == EXPORT_FORMAT
+            and manifest.get("content_hash") == content_hash and manifest.get("tokenizer") == tokenizer
+            and manifest.get("tokenizer_hash") == files_hash):
+        print(f"The {tokenizer} tokens of {version} are up to date ({manifest['num_tokens']} tokens)")
+        return manifest
+
+    # Loaded here too, to fail early and to know the vocabulary size before writing
+    _init_worker(tokenizer)
+    vocab_size = _tokenizer.vocab_size
+    dtype = np.dtype(dtype_for(vocab_size))
+    if isinstance(_tokenizer, ByteTokenizer):
+        # Encoding to bytes is cheaper than sending the texts to a worker
+        workers = 1
+
+    directory = tokens_dir(version, tokenizer)
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    offsets = [0]
+    pool = multiprocessing.get_context("spawn").Pool(workers, _init_worker, (tokenizer,)) if workers > 1 else None
+    with telemetry.stage("tokens.export") as timer, open(f"{tmp_dir}/tokens.bin", 'wb') as out:
+        try:
+            batches = _batches(iter_version_rows(version, store_path), batch_size)
+            # imap keeps the batches in row order
+            results = (pool.imap(encode_batch, batches, chunksize=1) if pool is not None
+                       else map(encode_batch, batches))
+            for encoded in results:
+                for data in encoded:
+                    ids = np.frombuffer(data, dtype=np.uint32)
+                    if len(ids) and int(ids.max()) >= vocab_size:
+                        raise ValueError(f"Token id {int(ids.max())} is outside the vocabulary of {vocab_size}")
+                    out.write(ids.astype(dtype).tobytes())
+                    offsets.append(offsets[-1] + len(ids))
+                timer.add(len(encoded), sum(len(data) for data in encoded) // 4 * dtype.itemsize)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    np.save(f"{tmp_dir}/offsets.npy", np.asarray(offsets, dtype=np.int64))
+    manifest = {
+        "format": EXPORT_FORMAT,
+        "version": version,
+        "content_hash": content_hash,
+        "tokenizer": tokenizer,
+        "tokenizer_hash": files_hash,
+        "vocab_size": vocab_size,
+        "dtype": dtype.name,
+        "num_documents": len(offsets) - 1,
+        "num_tokens": offsets[-1],
+        "files": {"tokens": "tokens.bin", "offsets": "offsets.npy"},
+    }
+    with open(f"{tmp_dir}/manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+    print(f"Exported {version} with {tokenizer}: {manifest['num_documents']} documents, "
+          f"{manifest['num_tokens']} {dtype.name} tokens to {directory}")
+    return manifest
+
+
+def load_tokens(version=None, tokenizer=DEFAULT_TOKENIZER):
+    """
+    (tokens, offsets, manifest) of an export: `tokens` is a read-only
+    np.memmap of every token id, and row i is tokens[offsets[i]:offsets[i + 1]].
+    """
+    import numpy as np
+
+    if version is None:
+        version = get_latest_version()["version"]
+    manifest = read_manifest(version, tokenizer)
+    if manifest is None:
+        raise FileNotFoundError(f"{version} has no {tokenizer} export; create it with: "
+                                f"python export_tokens.py --version {version} --tokenizer {tokenizer}")
+    directory = tokens_dir(version, tokenizer)
+    if manifest["num_tokens"]:
+        tokens = np.memmap(f"{directory}/{manifest['files']['tokens']}", dtype=manifest["dtype"], mode='r')
+    else:
+        tokens = np.empty(0, dtype=manifest["dtype"])
+    offsets = np.load(f"{directory}/{manifest['files']['offsets']}", mmap_mode='r')
+    return tokens, offsets, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a dataset version as memory-mappable token ids")
+    parser.add_argument("--version", help="Version to export (default: the latest)")
+    parser.add_argument(
+        "--tokenizer",
+        default=DEFAULT_TOKENIZER,
+        help="bytes (default), tokenizers:<tokenizer.json> or transformers:<local name or path>"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Tokenizing processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Texts per batch sent to a worker (default: {DEFAULT_BATCH_SIZE})"
+    )
+    parser.add_argument("--force", action="store_true", help="Export again even if the export is up to date")
+    args = parser.parse_args(argv)
+
+    with telemetry.run("export_tokens"):
+        try:
+            export_tokens(args.version, args.tokenizer, args.workers, args.batch_size, args.force)
+        except ValueError as e:
+            parser.error(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
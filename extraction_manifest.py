@@ -0,0 +1,99 @@
+"""
+Persistent manifest of PDF extractions for the Bilkent Turkish Writings Dataset.
+
+Each PDF is recorded by file name together with its size, mtime, SHA-256, the
+extractor version that processed it and a checksum of the text it produced,
+so unchanged inputs can be skipped without opening them.
+"""
+import os
+import sqlite3
+import hashlib
+from datetime import datetime
+
+
+MANIFEST_PATH = "./data/extraction_manifest.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_sha256 TEXT,
+    output_size INTEGER,
+    updated_at TEXT NOT NULL
+)
+"""
+
+_COLUMNS = ("name", "size", "mtime_ns", "sha256", "extractor_version",
+            "status", "output_sha256", "output_size", "updated_at")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Compute the SHA-256 of a file without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """SQLite-backed record of which PDFs have been extracted, and from what."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+        # The whole table is a few hundred KB even for the full corpus, so it is
+        # cheaper to read it once than to query per file
+        self.records = {
+            row[0]: dict(zip(_COLUMNS, row))
+            for row in self.conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM extractions")
+        }
+
+    def get(self, name):
+        return self.records.get(name)
+
+    def record(self, name, size, mtime_ns, sha256, extractor_version, status,
+               output_sha256=None, output_size=None):
+        """Insert or replace the entry for `name`; call commit() to persist."""
+        entry = {
+            "name": name,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "extractor_version": extractor_version,
+            "status": status,
+            "output_sha256": output_sha256,
+            "output_size": output_size,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO extractions ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+            [entry[c] for c in _COLUMNS]
+        )
+        self.records[name] = entry
+
+    def touch(self, name, mtime_ns):
+        """Record a new mtime for an entry whose content hash was found unchanged."""
+        self.conn.execute("UPDATE extractions SET mtime_ns = ? WHERE name = ?", (mtime_ns, name))
+        self.records[name]["mtime_ns"] = mtime_ns
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
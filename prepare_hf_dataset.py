@@ -2,23 +2,132 @@
 Convert the Bilkent Turkish Writings Dataset to a Hugging Face compatible dataset.
 """
 import os
+import glob
 import json
-from datasets import Dataset, Features, Value
-from dataset_versioning import initialize_version_control, get_latest_version
+import math
+import shutil
+import telemetry
+from dataset_versioning import initialize_version_control, get_latest_version, iter_version_rows, version_stats
+from corpus_writer import METADATA_COLUMNS
 
 
-def convert_to_hf_dataset(version=None):
-    """Convert the dataset to Hugging Face Dataset format."""
+HF_DATASETS_DIR = "./hf_datasets"
+# Parquet shards of each version, laid out as they are uploaded to the Hub
+PARQUET_SHARDS_DIR = "./hf_datasets/parquet"
+DEFAULT_MAX_SHARD_SIZE = "500MB"
+# Bump when the shards' columns change, so that shards built before are rebuilt
+SHARDS_FORMAT = 1
+
+
+def features():
+    """The dataset's features; `datasets` is only imported by the functions that build the dataset."""
+    from datasets import Features, Value
+
+    return Features({
+        'text': Value('string'),
+        'writing_id': Value('string'),
+        'course': Value('string'),
+        'term': Value('string'),
+        'year': Value('int32'),
+        'source_url': Value('string'),
+    })
+
+
+def generate_rows(version, content_hash=None):
+    """
+    Yield the rows of `version` one at a time for Dataset.from_generator,
+    with the metadata columns the local outputs have (null where unknown).
+
+    `content_hash` is unused here but part of the generator's arguments, so
+    the datasets cache is invalidated when a version's contents change.
+    """
+    for row in iter_version_rows(version):
+        yield {'text': row["text"], **{column: row.get(column) for column in METADATA_COLUMNS}}
+
+
+def parquet_shard_dir(version):
+    return f"{PARQUET_SHARDS_DIR}/{version}"
+
+
+def parquet_shards(version):
+    """The Parquet shards written for `version` by convert_to_hf_dataset, in order."""
+    return sorted(glob.glob(f"{parquet_shard_dir(version)}/train-*.parquet"))
+
+
+def build_stamp_path(version):
+    return f"{parquet_shard_dir(version)}/build.json"
+
+
+def ensure_parquet_shards(version, max_shard_size=DEFAULT_MAX_SHARD_SIZE):
+    """
+    The Parquet shards of `version`, built only if they are missing or stale.
+
+    Each build records the version's content hash and shard size next to
+    the shards, so a version is built once however many configurations or
+    uploads use it, and rebuilt only when its contents change. The content
+    hash is only read here: this runs alongside other stages that read the
+    version's metadata.json, so it is never rewritten from here.
+    """
+    stats = version_stats(version, update_cache=False)
+    content_hash = stats["content_hash"] if stats else None
+
+    stamp_path = build_stamp_path(version)
+    if os.path.exists(stamp_path):
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+        shards = parquet_shards(version)
+        if (content_hash is not None and stamp.get("content_hash") == content_hash
+                and stamp.get("format") == SHARDS_FORMAT and stamp.get("max_shard_size") == max_shard_size and stamp.get("files") == len(shards)):
+            return shards
+
+    print(f"Building Parquet shards for {version}...")
+    return convert_to_hf_dataset(version, max_shard_size)["parquet_files"]
+
+
+def write_parquet_shards(dataset, output_dir, max_shard_size=DEFAULT_MAX_SHARD_SIZE):
+    """
+    Write `dataset` as train-XXXXX-of-YYYYY.parquet shards of at most about
+    `max_shard_size` of Arrow data each, the layout push_to_hub would produce.
+
+    Shards are contiguous slices of the memory-mapped dataset and are written
+    batch by batch, so memory use does not depend on the size of the dataset.
+    """
+    from datasets.utils.py_utils import convert_file_size_to_int
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_shards = max(1, math.ceil(dataset.data.nbytes / convert_file_size_to_int(max_shard_size)))
+    paths = []
+    for index in range(num_shards):
+        path = f"{output_dir}/train-{index:05d}-of-{num_shards:05d}.parquet"
+        dataset.shard(num_shards=num_shards, index=index, contiguous=True).to_parquet(path)
+        paths.append(path)
+    return paths
+
+
+def convert_to_hf_dataset(version=None, max_shard_size=DEFAULT_MAX_SHARD_SIZE):
+    """
+    Convert a version to Hugging Face Dataset format.
+
+    Rows are streamed from the version store into Arrow by
+    Dataset.from_generator, which writes them to disk in batches, and the
+    dataset is saved with save_to_disk and as Parquet shards for the Hub,
+    both in pieces of at most `max_shard_size`. Memory use stays flat
+    however large the corpus is.
+    """
+    from datasets import Dataset
+
     # Initialize version control
     initialize_version_control()
-    
+
     # Determine which version to convert
     if version is None:
         latest_version = get_latest_version()
         version = latest_version["version"]
-    
+
     version_dir = f"./versions/{version}"
-    
+
     # Load metadata
     metadata_path = f"{version_dir}/metadata.json"
     if os.path.exists(metadata_path):
@@ -26,44 +135,56 @@ def convert_to_hf_dataset(version=None):
             metadata = json.load(f)
     else:
         metadata = {"version": version, "date_created": "unknown"}
-    
-    # Create empty dataset with proper features
-    features = Features({
-        'text': Value('string')
-    })
-    
-    # Create an empty dataset
-    dataset = Dataset.from_dict({'text': []}, features=features)
-    
-    # Save the dataset
-    output_dir = f"./hf_datasets/{version}"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Save the dataset
-    dataset.save_to_disk(output_dir)
-    
+
+    with telemetry.stage("hf.build") as timer:
+        # Build the dataset from the version's rows
+        stats = version_stats(version, update_cache=False)
+        content_hash = stats["content_hash"] if stats else None
+        dataset = Dataset.from_generator(
+            generate_rows,
+            features=features(),
+            gen_kwargs={"version": version, "content_hash": content_hash},
+            cache_dir=f"{HF_DATASETS_DIR}/cache"
+        )
+
+        # Save the dataset, replacing any earlier build so that no stale shards remain
+        output_dir = f"{HF_DATASETS_DIR}/{version}"
+        shutil.rmtree(output_dir, ignore_errors=True)
+        dataset.save_to_disk(output_dir, max_shard_size=max_shard_size)
+
+        # Parquet shards for uploading to the Hub
+        parquet_files = write_parquet_shards(dataset, parquet_shard_dir(version), max_shard_size)
+        # Written last and atomically: a build.json always describes complete shards
+        stamp_path = build_stamp_path(version)
+        with open(f"{stamp_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({"content_hash": content_hash, "format": SHARDS_FORMAT, "max_shard_size": max_shard_size,
+                       "files": len(parquet_files)}, f, indent=2)
+        os.replace(f"{stamp_path}.tmp", stamp_path)
+        timer.add(len(dataset), sum(os.path.getsize(path) for path in parquet_files))
+
     # Note: We don't save metadata.json in the dataset directory to avoid schema conflicts
     # The metadata is returned and can be used elsewhere
-    
-    print(f"Dataset {version} converted and saved to {output_dir}")
-    
+
+    print(f"Dataset {version} with {len(dataset)} entries converted and saved to {output_dir} "
+          f"and {len(parquet_files)} Parquet shards in {parquet_shard_dir(version)}")
+
     return {
         "dataset": dataset,
-        "metadata": metadata
+        "metadata": metadata,
+        "parquet_files": parquet_files
     }
 
 
 def push_to_hub(version=None, namespace="bilkent", dataset_name="turkish-writings"):
-    """Push the dataset to Hugging Face Hub."""
+    """Push the dataset's Parquet shards to Hugging Face Hub, under <version>/."""
     from huggingface_hub import HfApi
-    import os
-    
+
     if version is None:
         latest_version = get_latest_version()
         version = latest_version["version"]
-    
+
     repo_id = f"{namespace}/{dataset_name}"
-    
+
     # Check if HF_TOKEN is available in environment
     token = os.environ.get("HF_TOKEN")
     if not token:
@@ -71,31 +192,36 @@ def push_to_hub(version=None, namespace="bilkent", dataset_name="turkish-writing
         print("To push to Hugging Face Hub, please set the HF_TOKEN environment variable:")
         print("export HF_TOKEN=your_huggingface_token")
         return False
-    
+
     api = HfApi()
-    
-    # Upload dataset files
-    dataset_dir = f"./hf_datasets/{version}"
-    if not os.path.exists(dataset_dir):
-        convert_to_hf_dataset(version)
-    
+
+    # Reuse the shards on disk, building them only if they are missing or stale
+    ensure_parquet_shards(version)
+
     print(f"Pushing {version} to Hugging Face Hub at {repo_id}...")
-    
-    # Upload all files from the dataset directory
-    api.upload_folder(
-        folder_path=dataset_dir,
-        repo_id=repo_id,
-        repo_type="dataset",
-        token=token
-    )
-    
+
+    # Upload the shards, removing shards of an earlier upload that no longer exist
+    with telemetry.stage("hf.push") as timer:
+        api.upload_folder(
+            folder_path=parquet_shard_dir(version),
+            path_in_repo=version,
+            repo_id=repo_id,
+            repo_type="dataset",
+            token=token,
+            allow_patterns="*.parquet",
+            delete_patterns="*.parquet"
+        )
+        shards = parquet_shards(version)
+        timer.add(len(shards), sum(os.path.getsize(path) for path in shards))
+
     print(f"Dataset {version} successfully pushed to {repo_id}")
     return True
 
 
 if __name__ == "__main__":
-    # First initialize version control to ensure v1 exists
-    initialize_version_control()
-    
-    # Convert the dataset to Hugging Face format
-    convert_to_hf_dataset()
+    with telemetry.run("prepare_hf_dataset"):
+        # First initialize version control to ensure v1 exists
+        initialize_version_control()
+
+        # Convert the dataset to Hugging Face format
+        convert_to_hf_dataset()
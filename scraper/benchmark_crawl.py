@@ -0,0 +1,216 @@
+"""
+Measure the scraper's throughput against a local mock of the site.
+
+Runs the real BilkentTurkishWritingsSpider, with the project's settings and
+pipelines, against mock_site.py, once per requested concurrency level, and
+reports pages/sec, files/sec, bytes/sec and how deep the scheduler queue
+got. Every run starts from an empty files store and crawl state; pass
+--recrawl to also time the incremental re-crawl that follows.
+
+Run from the scraper directory:
+
+    python benchmark_crawl.py --writings 1000 --latency 0.05 --concurrency 5 10 20
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+
+import mock_site
+
+
+def scheduler_depth(engine):
+    """Requests waiting in the scheduler, across Scrapy versions."""
+    scheduler = getattr(engine, 'scheduler', None)
+    if scheduler is None and getattr(engine, 'slot', None) is not None:
+        scheduler = engine.slot.scheduler
+    return len(scheduler) if scheduler is not None else 0
+
+
+class CrawlStats(object):
+    """Counts responses and samples queue depths for one crawl via Scrapy signals."""
+
+    def __init__(self, crawler, interval=0.1):
+        self.crawler = crawler
+        self.interval = interval
+        self.pages = self.files = self.unchanged = self.bytes = 0
+        self.queue_samples = []
+        self.active_samples = []
+        self.started = self.finished = None
+
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self.response_received, signal=signals.response_received)
+
+    def spider_opened(self, spider):
+        from twisted.internet.task import LoopingCall
+
+        self.started = time.perf_counter()
+        self.sampler = LoopingCall(self.sample)
+        self.sampler.start(self.interval)
+
+    def spider_closed(self, spider):
+        self.finished = time.perf_counter()
+        if self.sampler.running:
+            self.sampler.stop()
+
+    def sample(self):
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        self.queue_samples.append(scheduler_depth(engine))
+        self.active_samples.append(len(engine.downloader.active))
+
+    def response_received(self, response, request, spider):
+        self.bytes += len(response.body)
+        if response.status == 304:
+            self.unchanged += 1
+        elif 'ogrenciNo' in response.url:
+            self.files += 1
+        else:
+            self.pages += 1
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            "elapsed": round(elapsed, 3),
+            "pages": self.pages,
+            "unchanged": self.unchanged,
+            "files": self.files,
+            "bytes": self.bytes,
+            "pages_per_sec": round(self.pages / elapsed, 2),
+            "files_per_sec": round(self.files / elapsed, 2),
+            "bytes_per_sec": round(self.bytes / elapsed),
+            "queue_max": max(self.queue_samples, default=0),
+            "queue_mean": round(sum(self.queue_samples) / max(1, len(self.queue_samples)), 1),
+            "active_mean": round(sum(self.active_samples) / max(1, len(self.active_samples)), 1),
+        }
+
+
+def crawl_settings(files_store, concurrency, concurrent_items, delay, extraction):
+    settings = get_project_settings()
+    # The spider's custom_settings outrank the project's, so override from the command-line level
+    overrides = {
+        "FILES_STORE": files_store,
+        "CONCURRENT_REQUESTS": concurrency,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": concurrency,
+        "CONCURRENT_ITEMS": concurrent_items,
+        "DOWNLOAD_DELAY": delay,
+        "EXTRACTION_ENABLED": extraction,
+        "ROBOTSTXT_OBEY": False,
+        "TELNETCONSOLE_ENABLED": False,
+        # Benchmark crawls are not pipeline runs
+        "TELEMETRY_ENABLED": False,
+    }
+    for name, value in overrides.items():
+        settings.set(name, value, priority='cmdline')
+    return settings
+
+
+def run_benchmarks(server, args):
+    """Crawl once per concurrency level (plus re-crawls) and return the reports."""
+    from twisted.internet import defer, reactor
+
+    from spiders.bilkent_turkish_writings import BilkentTurkishWritingsSpider
+
+    host = server.server_address[0]
+    results = []
+
+    @defer.inlineCallbacks
+    def run_all():
+        try:
+            for concurrency in args.concurrency:
+                work_dir = tempfile.mkdtemp(prefix='crawl-benchmark-')
+                settings = crawl_settings(os.path.join(work_dir, 'data'), concurrency,
+                                          args.concurrent_items, args.delay, args.extraction)
+                passes = ('full', 'recrawl') if args.recrawl else ('full',)
+                for name in passes:
+                    runner = CrawlerRunner(settings)
+                    crawler = runner.create_crawler(BilkentTurkishWritingsSpider)
+                    stats = CrawlStats(crawler)
+                    with quiet(args.verbose):
+                        yield runner.crawl(crawler, start_urls=[server.url], allowed_domains=[host],
+                                           state_path=os.path.join(work_dir, 'crawl_state.json'))
+                    report = dict(stats.report(), run=name, concurrency=concurrency)
+                    results.append(report)
+                    print_report(report, args.json)
+                shutil.rmtree(work_dir, ignore_errors=True)
+        finally:
+            reactor.stop()
+
+    reactor.callWhenRunning(run_all)
+    reactor.run()
+    return results
+
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Silence the spider's and pipelines' per-page prints unless --verbose."""
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def print_report(report, as_json=False):
+    if as_json:
+        print(json.dumps(report))
+        return
+    print(f"[{report['run']}, concurrency {report['concurrency']}] "
+          f"{report['elapsed']:.2f}s: {report['pages']} pages ({report['pages_per_sec']:.1f}/s), "
+          f"{report['unchanged']} unchanged, {report['files']} files ({report['files_per_sec']:.1f}/s), "
+          f"{report['bytes'] / 1024 / 1024:.1f} MiB ({report['bytes_per_sec'] / 1024 / 1024:.2f} MiB/s), "
+          f"queue max {report['queue_max']} / mean {report['queue_mean']}, "
+          f"in flight mean {report['active_mean']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the spider against a local mock site")
+    parser.add_argument("--writings", type=int, default=500, help="Writings on the mock site (default: 500)")
+    parser.add_argument("--per-page", type=int, default=50, help="Writings per listing page (default: 50)")
+    parser.add_argument("--pdf-size", type=int, default=100 * 1024, help="Approximate PDF size in bytes")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Seconds the mock server waits before every response (default: 0.02)")
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[5],
+                        help="CONCURRENT_REQUESTS values to run, one crawl each (default: 5)")
+    parser.add_argument("--concurrent-items", type=int, default=1,
+                        help="CONCURRENT_ITEMS (default: 1, as in settings.py)")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="DOWNLOAD_DELAY; the spider's 0.25 is politeness, not throughput (default: 0)")
+    parser.add_argument("--extraction", action="store_true",
+                        help="Keep TextExtractionPipeline enabled, to include PDF extraction in the timing")
+    parser.add_argument("--recrawl", action="store_true",
+                        help="After each crawl, time an incremental re-crawl with the saved state")
+    parser.add_argument("--json", action="store_true", help="Print one JSON report per crawl")
+    parser.add_argument("--verbose", action="store_true", help="Show the spider's output")
+    args = parser.parse_args(argv)
+
+    settings = get_project_settings()
+    install_reactor(settings.get("TWISTED_REACTOR")
+                    or "twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+
+    site = mock_site.MockSite(args.writings, args.per_page, args.pdf_size)
+    server = mock_site.serve(site, latency=args.latency)
+    if not args.json:
+        print(f"Mock site with {args.writings} writings at {server.url} "
+              f"({args.latency * 1000:.0f} ms latency, ~{args.pdf_size // 1024} KiB PDFs)")
+    try:
+        run_benchmarks(server, args)
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Run the Bilkent Turkish Writings crawl in the current process.
+
+The equivalent of `scrapy crawl bilkent_turkish_writings` from this folder,
+callable from anywhere (update_dataset.py runs it as its `scrape` stage).
+Twisted's reactor can only be started once, so a process runs one crawl.
+"""
+import os
+import sys
+import argparse
+
+SCRAPER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def crawl(full=False, state_path=None, settings_overrides=None, **spider_args):
+    """
+    Crawl the website and return True if the crawl finished on its own (not
+    cancelled or failed). `spider_args` are passed on like `-a` options.
+    """
+    # Make the Scrapy project importable as if `scrapy crawl` ran in this folder, without shadowing other modules
+    if SCRAPER_DIR not in sys.path:
+        sys.path.append(SCRAPER_DIR)
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'settings')
+
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from spiders.bilkent_turkish_writings import BilkentTurkishWritingsSpider
+
+    settings = get_project_settings()
+    for name, value in (settings_overrides or {}).items():
+        # The spider's custom_settings outrank the project's, so override from the command-line level
+        settings.set(name, value, priority='cmdline')
+
+    kwargs = dict(spider_args, full='1' if full else None)
+    if state_path:
+        kwargs['state_path'] = state_path
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(BilkentTurkishWritingsSpider)
+    process.crawl(crawler, **kwargs)
+    process.start()
+
+    return crawler.stats.get_value('finish_reason') == 'finished'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl the Bilkent Turkish Writings website")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the saved crawl state and re-request every page"
+    )
+    parser.add_argument(
+        "--state-path",
+        help="Where to keep the crawl state (default: data/crawl_state.json)"
+    )
+    args = parser.parse_args(argv)
+    return 0 if crawl(args.full, args.state_path) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import json
+import tempfile
+from datetime import datetime
+
+
+# The repository's data directory, wherever the crawl is started from
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+CRAWL_STATE_PATH = os.path.join(DATA_DIR, 'crawl_state.json')
+
+
+class CrawlState(object):
+    """
+    What previous crawls have seen, persisted between runs as JSON.
+
+    For every listing page it keeps the ETag/Last-Modified validators, the
+    listing pages it links to and its writing (ogrenciNo) links with their
+    metadata. Writing URLs that were downloaded successfully are kept in a
+    separate set.
+    """
+
+    def __init__(self, path=CRAWL_STATE_PATH):
+        self.path = path
+        self.pages = {}
+        self.files = set()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.pages = state.get("pages", {})
+            self.files = set(state.get("files", []))
+
+        for page in self.pages.values():
+            # Older states listed writing URLs without metadata
+            if isinstance(page.get("files"), list):
+                page["files"] = dict.fromkeys(page["files"])
+
+    def conditional_headers(self, url):
+        """Headers that let the server answer 304 if `url` has not changed since the last crawl."""
+        page = self.pages.get(url)
+        if page is None:
+            return {}
+
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def update_page(self, url, headers, links, writings):
+        """
+        Record a freshly fetched listing page, its validators, the listing links
+        found on it and its writings as {url: metadata}.
+        """
+        def header(name):
+            value = headers.get(name)
+            return value.decode('latin-1') if isinstance(value, bytes) else value
+
+        self.pages[url] = {
+            "etag": header('ETag'),
+            "last_modified": header('Last-Modified'),
+            "links": sorted(set(links)),
+            "files": dict(sorted(writings.items())),
+            "fetched_at": datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def page_links(self, url):
+        return self.pages.get(url, {}).get("links", [])
+
+    def page_files(self, url):
+        return self.pages.get(url, {}).get("files", {})
+
+    def is_known_file(self, url):
+        return url in self.files
+
+    def add_file(self, url):
+        self.files.add(url)
+
+    def save(self):
+        """Write the state atomically so an interrupted save never leaves a truncated file."""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        state = {"pages": self.pages, "files": sorted(self.files)}
+
+        fd, tmp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
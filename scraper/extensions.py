@@ -0,0 +1,53 @@
+import os
+import sys
+import contextlib
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from crawl_state import DATA_DIR
+
+# telemetry.py lives in the repository root, one level above the Scrapy project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetry  # noqa: E402
+
+
+class CrawlTelemetry(object):
+    """
+    Records each crawl as the `scrape.crawl` stage of a telemetry run.
+
+    The run is appended to TELEMETRY_PATH (data/telemetry.jsonl) when the
+    spider closes, unless the crawl is part of a larger run, such as
+    update_dataset.py's, which then records it. Items, downloaded bytes and
+    the crawl's wall time come from the crawler's stats. Disable with
+    TELEMETRY_ENABLED = False.
+    """
+
+    def __init__(self, stats, path):
+        self.stats = stats
+        self.path = path
+        self.stack = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('TELEMETRY_ENABLED', True):
+            raise NotConfigured
+        extension = cls(crawler.stats, crawler.settings.get('TELEMETRY_PATH',
+                                                             os.path.join(DATA_DIR, 'telemetry.jsonl')))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.stack = contextlib.ExitStack()
+        self.run = self.stack.enter_context(telemetry.run("scrapy crawl", self.path))
+        self.timer = self.stack.enter_context(telemetry.stage("scrape.crawl"))
+
+    def spider_closed(self, spider, reason):
+        self.timer.add(self.stats.get_value('item_scraped_count', 0),
+                       self.stats.get_value('downloader/response_bytes', 0))
+        if reason != 'finished':
+            self.timer.ok = False
+            self.run.ok = False
+        self.stack.close()
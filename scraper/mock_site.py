@@ -0,0 +1,198 @@
+"""
+A local stand-in for stars.bilkent.edu.tr/turkce/, for benchmarking the scraper offline.
+
+The synthetic site has the same shape as the real one: a root listing that
+links to one page per course and term, term listings paginated with
+`?sayfa=N` that link to the writings as `yazi?ogrenciNo=N`, and navigation
+links back up the tree. Writings are served as small but valid PDFs padded
+to the requested size. Listing pages carry an ETag and honour
+If-None-Match, so incremental crawls see 304s as they would in production.
+
+Run standalone with `python mock_site.py --port 8000` and point the spider at
+it with `-a start_urls=...`, or use benchmark_crawl.py, which does both.
+"""
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+COURSES = ('101', '102')
+TERMS = ('2015-2016-guz', '2015-2016-bahar', '2016-2017-guz', '2016-2017-bahar')
+
+WORDS = ('ben', 'sen', 'okul', 'kitap', 'yazmak', 'güzel', 'şehir', 'arkadaş', 'öğrenci',
+         'ders', 'çünkü', 'ama', 'ile', 'çok', 'bugün', 'İstanbul', 'Ankara', 'ılık', 'ağaç')
+
+
+def make_pdf(text, size=0):
+    """A one-page PDF showing `text`, padded with an unused stream to roughly `size` bytes."""
+    # Standard 14 fonts only cover Latin-1, which is enough for extraction to produce text
+    line = text.encode('latin-1', 'replace').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    content = b'BT /F1 12 Tf 72 720 Td (' + line + b') Tj ET'
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+        b'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content),
+    ]
+    padding = max(0, size - 700 - len(content))
+    if padding:
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (padding, b'0' * padding))
+
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return pdf
+
+
+class MockSite(object):
+    """
+    The synthetic site's content: which listings exist and which writings they link to.
+
+    `writings` writings are spread evenly over the course/term listings,
+    `per_page` to a listing page. Everything is derived from `seed`, so two
+    sites built with the same arguments serve identical bytes.
+    """
+
+    def __init__(self, writings=500, per_page=50, pdf_size=100 * 1024, seed=0):
+        self.per_page = per_page
+        self.pdf_size = pdf_size
+        self.seed = seed
+
+        self.sections = [(course, term) for course in COURSES for term in TERMS]
+        # {(course, term): [ogrenciNo, ...]}
+        self.listings = {section: [] for section in self.sections}
+        for number in range(writings):
+            self.listings[self.sections[number % len(self.sections)]].append(20000000 + number)
+
+    def page_count(self, section):
+        return max(1, -(-len(self.listings[section]) // self.per_page))
+
+    def root_page(self):
+        links = [f'<li><a href="/turkce/{course}/{term}/">Türkçe {course} - {term}</a></li>'
+                 for course, term in self.sections]
+        return self.html('Türkçe Yazıları', links)
+
+    def listing_page(self, section, page):
+        course, term = section
+        numbers = self.listings[section][(page - 1) * self.per_page:page * self.per_page]
+        links = ['<li><a href="/turkce/">Ana sayfa</a></li>']
+        links += [f'<li><a href="/turkce/yazi?ogrenciNo={number}">Yazı {number}</a></li>'
+                  for number in numbers]
+        links += [f'<li><a href="/turkce/{course}/{term}/?sayfa={other}">{other}</a></li>'
+                  for other in range(1, self.page_count(section) + 1) if other != page]
+        return self.html(f'Türkçe {course} - {term}', links)
+
+    def html(self, title, links):
+        return (f'<html><head><meta charset="utf-8"><title>{title}</title></head>'
+                f'<body><h1>{title}</h1><ul>{"".join(links)}</ul></body></html>').encode('utf-8')
+
+    def writing(self, number):
+        rng = random.Random(self.seed * 1000003 + number)
+        text = ' '.join(rng.choice(WORDS) for _ in range(60))
+        return make_pdf(text, self.pdf_size)
+
+    def resolve(self, url):
+        """Return (content type, body) for a request path, or None for a 404."""
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        parts = [part for part in parsed.path.split('/') if part]
+        if parts[:1] != ['turkce']:
+            return None
+        parts = parts[1:]
+
+        if not parts:
+            return 'text/html; charset=utf-8', self.root_page()
+        if parts == ['yazi'] and 'ogrenciNo' in query:
+            number = int(query['ogrenciNo'][0])
+            if any(number in numbers for numbers in self.listings.values()):
+                return 'application/pdf', self.writing(number)
+            return None
+        if len(parts) == 2 and tuple(parts) in self.listings:
+            page = int(query.get('sayfa', ['1'])[0])
+            if 1 <= page <= self.page_count(tuple(parts)):
+                return 'text/html; charset=utf-8', self.listing_page(tuple(parts), page)
+        return None
+
+
+def make_handler(site, latency=0.0):
+    """A request handler class serving `site`, waiting `latency` seconds per response."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            resolved = site.resolve(self.path)
+            if resolved is None:
+                self.send_error(404)
+                return
+            content_type, body = resolved
+
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if content_type.startswith('text/html') and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(site, host='127.0.0.1', port=0, latency=0.0):
+    """Serve `site` from a background thread; returns the server, whose `url` is the start URL."""
+    server = ThreadingHTTPServer((host, port), make_handler(site, latency))
+    server.daemon_threads = True
+    server.url = f'http://{host}:{server.server_address[1]}/turkce/'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic copy of the Turkish writings site")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--writings", type=int, default=500, help="Number of writings (default: 500)")
+    parser.add_argument("--per-page", type=int, default=50, help="Writings per listing page (default: 50)")
+    parser.add_argument("--pdf-size", type=int, default=100 * 1024, help="Approximate PDF size in bytes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    site = MockSite(args.writings, args.per_page, args.pdf_size, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(site, args.latency))
+    print(f"Serving {args.writings} writings at http://{args.host}:{server.server_address[1]}/turkce/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import collections
+import contextlib
+import concurrent.futures
+import multiprocessing
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, succeed
+from scrapy.exceptions import NotConfigured
+
+# convert_to_text.py lives in the repository root, one level above the Scrapy project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_text  # noqa: E402
+import telemetry  # noqa: E402
+from extraction_manifest import ExtractionManifest  # noqa: E402
+from text_store import ShardStore  # noqa: E402
+from writing_metadata import METADATA_FIELDS  # noqa: E402
+
+
+class WritingMetadataPipeline(object):
+    """
+    Appends the metadata of every downloaded writing to FILES_STORE/metadata.jsonl.
+
+    Lines are keyed by the downloaded file's name, which is also the id the
+    text gets in convert_to_text.py; a later line for the same id replaces
+    an earlier one.
+    """
+
+    def __init__(self, files_store):
+        self.path = os.path.join(files_store, 'metadata.jsonl')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('FILES_STORE'))
+
+    def open_spider(self, spider):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def process_item(self, item, spider):
+        for downloaded in item.get('files') or []:
+            record = {"id": os.path.basename(downloaded['path'])}
+            record.update((field, item.get(field)) for field in METADATA_FIELDS)
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        return item
+
+    def close_spider(self, spider):
+        self.file.close()
+
+
+class TextExtractionPipeline(object):
+    """
+    Extracts the text of every PDF as soon as FilesPipeline has downloaded it.
+
+    Extraction runs in a background process pool while the crawl continues,
+    writing into the same shard store, page cache and manifest that
+    convert_to_text.py uses, so a later convert_to_text.py run finds these
+    files up to date. When more than EXTRACTION_MAX_PENDING files are
+    waiting, items are held back until a worker frees up, which throttles the
+    crawl instead of letting the queue grow without bound.
+
+    Settings: EXTRACTION_ENABLED, EXTRACTION_WORKERS, EXTRACTION_MAX_PENDING,
+    EXTRACTION_TIMEOUT, EXTRACTION_BACKEND, EXTRACTION_MAX_TASKS_PER_CHILD.
+    """
+
+    def __init__(self, files_store, workers, max_pending, timeout, backend, max_tasks_per_child):
+        self.files_store = files_store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.backend = backend
+        self.max_tasks_per_child = max_tasks_per_child
+        self.extractor_version = convert_to_text.conversion_version(backend)
+
+        self.pending = 0
+        self.processed_count = 0
+        self.waiting = collections.deque()
+        self.drained = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('EXTRACTION_ENABLED', True):
+            raise NotConfigured
+        workers = settings.getint('EXTRACTION_WORKERS', os.cpu_count() or 1)
+        return cls(
+            files_store=settings.get('FILES_STORE'),
+            workers=workers,
+            max_pending=settings.getint('EXTRACTION_MAX_PENDING', 4 * workers),
+            timeout=settings.getfloat('EXTRACTION_TIMEOUT', convert_to_text.DEFAULT_TIMEOUT),
+            backend=settings.get('EXTRACTION_BACKEND', convert_to_text.DEFAULT_BACKEND),
+            max_tasks_per_child=settings.getint('EXTRACTION_MAX_TASKS_PER_CHILD',
+                                                convert_to_text.DEFAULT_MAX_TASKS_PER_CHILD),
+        )
+
+    def open_spider(self, spider):
+        # Recorded as the scrape.extract stage, with the slowest PDFs
+        self.telemetry = contextlib.ExitStack()
+        self.timer = self.telemetry.enter_context(telemetry.stage('scrape.extract'))
+        self.manifest = ExtractionManifest(os.path.join(self.files_store, 'extraction_manifest.sqlite'))
+        self.store = ShardStore(os.path.join(self.files_store, 'shards'))
+        self.pages_path = os.path.join(self.files_store, 'pages')
+        # spawn rather than fork: the reactor and its threads are already running
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def process_item(self, item, spider):
+        for downloaded in item.get('files') or []:
+            self.submit(os.path.join(self.files_store, downloaded['path']))
+
+        if self.pending < self.max_pending:
+            return item
+
+        # Backpressure: hand the item back only once the queue has room again
+        d = Deferred()
+        self.waiting.append((d, item))
+        return d
+
+    def submit(self, path):
+        name = os.path.basename(path)
+        st = os.stat(path)
+        if convert_to_text.is_up_to_date(path, st, self.manifest.get(name), self.store,
+                                         self.store.entry(name), self.extractor_version):
+            return
+
+        self.pending += 1
+        future = self.executor.submit(convert_to_text.process_file, path, self.timeout,
+                                      self.backend, self.pages_path)
+        # Done-callbacks run on an executor thread; move back to the reactor thread
+        future.add_done_callback(lambda f: reactor.callFromThread(self.finished, f, st))
+
+    def finished(self, future, st):
+        self.pending -= 1
+        try:
+            self.store_result(future, st)
+        finally:
+            # Held-back items and close_spider() must be released whatever happened to this file
+            while self.waiting and self.pending < self.max_pending:
+                d, item = self.waiting.popleft()
+                d.callback(item)
+
+            if self.pending == 0 and self.drained is not None:
+                self.drained.callback(None)
+
+    def store_result(self, future, st):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error extracting text: {e}")
+            return
+        for message in result["messages"]:
+            print(message)
+        self.timer.add(1, st.st_size)
+        self.timer.item(result["name"], result["seconds"])
+        try:
+            status = convert_to_text.store_result(result, st, self.store, self.manifest,
+                                                  self.extractor_version)
+            if status == "processed":
+                self.processed_count += 1
+                if self.processed_count % 100 == 0:
+                    self.store.commit()
+                    self.manifest.commit()
+                    print(f"Extracted {self.processed_count} files so far...")
+        except Exception as e:
+            # One file that cannot be stored must not stop the crawl; it is not recorded, so the next run retries it
+            print(f"Error storing the text of {result['name']}: {e}")
+
+    def close_spider(self, spider):
+        if self.pending == 0:
+            return succeed(self.shutdown())
+
+        print(f"Waiting for {self.pending} extractions to finish...")
+        self.drained = Deferred()
+        self.drained.addCallback(lambda _: self.shutdown())
+        return self.drained
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        # Publish the texts before the manifest entries that point at them
+        self.store.close()
+        self.manifest.close()
+        print(f"Extracted {self.processed_count} files during the crawl")
+        self.telemetry.close()
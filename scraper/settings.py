@@ -5,4 +5,7 @@ USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_5) AppleWebKit/537.36
 CONCURRENT_REQUESTS = 5
 CONCURRENT_ITEMS = 1
 LOG_LEVEL = 'INFO'
-LOG_ENABLED = False
\ No newline at end of file
+LOG_ENABLED = False
+EXTENSIONS = {
+    'extensions.CrawlTelemetry': 500,
+}
@@ -1,36 +1,121 @@
+import os
+
 import scrapy
-from scrapy import Request
+from scrapy import Request, signals
 from scrapy.linkextractors.lxmlhtml import LxmlLinkExtractor
 
 from writing_entry import WritingEntry
+from crawl_state import CrawlState, CRAWL_STATE_PATH, DATA_DIR
+from writing_metadata import page_context, writing_metadata
 
 
 class BilkentTurkishWritingsSpider(scrapy.Spider):
+    """
+    Crawls the Turkish department's listing pages and downloads every writing.
+
+    Each writing becomes one WritingEntry carrying its ogrenciNo, course,
+    term/year and URLs, parsed from the link and the listing page it is on.
+
+    Crawls are incremental by default: listing pages are requested with the
+    validators saved by the previous run, unchanged pages (HTTP 304) are not
+    re-parsed, and only writing URLs that have not been downloaded yet are
+    scheduled. Only the parsing is skipped: the listings an unchanged page
+    linked to are still requested, conditionally, because new writings
+    change the term listings they appear on but not the pages above them.
+    Pass `-a full=1` to ignore the saved state for one run and
+    `-a state_path=...` to keep it elsewhere.
+    """
 
     name = "bilkent_turkish_writings"
     custom_settings = {
         "ITEM_PIPELINES": {
-            'scrapy.pipelines.files.FilesPipeline': 100
+            'scrapy.pipelines.files.FilesPipeline': 100,
+            'pipelines.WritingMetadataPipeline': 150,
+            'pipelines.TextExtractionPipeline': 200
         },
         "DOWNLOAD_DELAY": 0.25,
-        "FILES_STORE": '../data/'
+        "FILES_STORE": DATA_DIR + os.sep
     }
 
     start_urls = ["https://stars.bilkent.edu.tr/turkce/"]
     allowed_domains = ['stars.bilkent.edu.tr']
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, full=None, state_path=CRAWL_STATE_PATH, *args, **kwargs):
         super(BilkentTurkishWritingsSpider, self).__init__(*args, **kwargs)
+        # `-a start_urls=... -a allowed_domains=...` (e.g. for mock_site.py) arrive as comma-separated strings
+        for name in ('start_urls', 'allowed_domains'):
+            if isinstance(getattr(self, name), str):
+                setattr(self, name, getattr(self, name).split(','))
+        self.full = full not in (None, '', '0', 'false', 'False')
+        self.state = CrawlState(state_path)
+        self.requested = set()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(BilkentTurkishWritingsSpider, cls).from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.item_scraped, signal=signals.item_scraped)
+        return spider
+
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() covers older versions
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for url in self.start_urls:
+            yield self.listing_request(url)
+
+    def listing_request(self, url):
+        headers = {} if self.full else self.state.conditional_headers(url)
+        return Request(url, self.parse, headers=headers, meta={"handle_httpstatus_list": [304]})
 
     def parse(self, response):
+        if response.status == 304:
+            # Unchanged since the last crawl: walk the links recorded then instead of re-parsing.
+            # The linked listings may have changed even though this page has not, so they are
+            # still revalidated, which costs one 304 each when they have not.
+            print('Unchanged ' + response.url)
+            for url in self.state.page_links(response.url):
+                yield self.listing_request(url)
+            for entry in self.writing_entries(self.state.page_files(response.url), response.url):
+                yield entry
+            return
+
         print('Parsing '+response.url)
 
-        file_urls = []
+        context = page_context(response)
+        links = []
+        writings = {}
 
         for link in LxmlLinkExtractor(allow=self.allowed_domains).extract_links(response):
             if "ogrenciNo" in link.url:
-                file_urls.append(link.url)
+                writings[link.url] = writing_metadata(link.url, link.text, context, response.url)
             else:
-                yield Request(link.url, self.parse)
+                links.append(link.url)
+                yield self.listing_request(link.url)
+
+        self.state.update_page(response.url, response.headers, links, writings)
+
+        for entry in self.writing_entries(writings, response.url):
+            yield entry
+
+    def writing_entries(self, writings, listing_url):
+        """
+        One WritingEntry per writing URL, skipping those already downloaded by
+        an earlier crawl (or scheduled by this one).
+        """
+        for url, metadata in writings.items():
+            if url in self.requested or (not self.full and self.state.is_known_file(url)):
+                continue
+            self.requested.add(url)
+            # States saved before metadata was tracked only have the URL
+            metadata = metadata or writing_metadata(url, '', {}, listing_url)
+            yield WritingEntry(file_urls=[url], **metadata)
+
+    def item_scraped(self, item, response, spider):
+        # FilesPipeline only lists the downloads that succeeded, so failed ones are retried next run
+        for downloaded in item.get('files') or []:
+            self.state.add_file(downloaded['url'])
 
-        yield WritingEntry(file_urls=file_urls)
+    def closed(self, reason):
+        self.state.save()
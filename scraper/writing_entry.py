@@ -3,4 +3,10 @@ from scrapy import Item, Field
 
 class WritingEntry(Item):
     file_urls = Field()
-    files = Field()
\ No newline at end of file
+    files = Field()
+    writing_id = Field()
+    course = Field()
+    term = Field()
+    year = Field()
+    source_url = Field()
+    listing_url = Field()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import re
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+COURSE_PATTERN = re.compile(r'(?:turk(?:ish|ce|çe)?|türk(?:çe)?|tr)[\s_\-]*(10[12])', re.IGNORECASE)
+ACADEMIC_YEAR_PATTERN = re.compile(r'(20\d\d)\s*[-–/_]\s*(20\d\d|\d\d)\b')
+YEAR_PATTERN = re.compile(r'(?<!\d)(20[1-3]\d)(?!\d)')
+
+SEASONS = (
+    ('Fall', re.compile(r'g[üu]z|fall|autumn', re.IGNORECASE)),
+    ('Spring', re.compile(r'bahar|spring', re.IGNORECASE)),
+    ('Summer', re.compile(r'yaz\b|yaz[ _-]?d[öo]nemi|summer', re.IGNORECASE)),
+)
+
+METADATA_FIELDS = ('writing_id', 'course', 'term', 'year', 'source_url', 'listing_url')
+
+
+def parse_course(*texts):
+    """Return "Turkish 101"/"Turkish 102" from the first text that names a course."""
+    for text in texts:
+        match = COURSE_PATTERN.search(unquote(text or ''))
+        if match:
+            return f"Turkish {match.group(1)}"
+    return None
+
+
+def parse_term(*texts):
+    """
+    Return (term, year) from the first text that names a semester.
+
+    "2016-2017 Güz" gives ("2016-2017 Fall", 2016): the year is the calendar
+    year the semester took place in, so spring and summer terms count towards
+    the second year of the academic year. A bare year gives (None, year).
+    """
+    for text in texts:
+        text = unquote(text or '')
+        match = ACADEMIC_YEAR_PATTERN.search(text)
+        if match:
+            first = int(match.group(1))
+            second = match.group(2)
+            second = int(second) if len(second) == 4 else first // 100 * 100 + int(second)
+            if second != first + 1:
+                continue
+            for season, pattern in SEASONS:
+                if pattern.search(text):
+                    return f"{first}-{second} {season}", first if season == 'Fall' else second
+            return f"{first}-{second}", None
+
+    for text in texts:
+        match = YEAR_PATTERN.search(unquote(text or ''))
+        if match:
+            return None, int(match.group(1))
+    return None, None
+
+
+def parse_writing_id(url):
+    """The ogrenciNo query parameter that identifies a writing."""
+    values = parse_qs(urlparse(url).query).get('ogrenciNo')
+    return values[0] if values else None
+
+
+def page_context(response):
+    """Course and semester of a listing page, from its URL, title and headings."""
+    texts = [response.url]
+    texts += response.css('title::text, h1::text, h2::text, h3::text, .breadcrumb ::text').getall()
+    course = parse_course(*texts)
+    term, year = parse_term(*texts)
+    return {"course": course, "term": term, "year": year}
+
+
+def writing_metadata(url, link_text, context, listing_url):
+    """Metadata of one writing link; the link itself wins over the page it sits on."""
+    term, year = parse_term(url, link_text)
+    return {
+        "writing_id": parse_writing_id(url),
+        "course": parse_course(url, link_text) or context.get("course"),
+        "term": term or context.get("term"),
+        "year": year or context.get("year"),
+        "source_url": url,
+        "listing_url": listing_url,
+    }
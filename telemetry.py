@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+"""
+Timings, throughput and memory use of the dataset pipeline.
+
+An entry point opens a run with `with run("convert_to_text"):`, and the code
+it calls measures its steps with `with stage("convert.extract") as t:`,
+counting what it handled with `t.add(items, nbytes)` and the time of single
+items with `t.item(name, seconds)`. For every stage the run records wall and
+CPU time (including child processes), items/sec, bytes, the peak RSS of the
+process while the stage ran, and its slowest items. The peak is sampled from
+/proc/self/statm every RSS_SAMPLE_INTERVAL seconds, so it is only recorded
+on Linux. The stage's max_rss and children_max_rss are the high-water marks
+of the process and of its worker processes since they started; they include
+earlier stages and are not compared between runs. When the outermost run
+ends it is appended as one JSON line to data/telemetry.jsonl; runs nested
+inside it (e.g. convert_to_text.main() called by update_dataset.py) add
+their stages to it instead.
+
+Stages measured outside of any run are timed but not recorded.
+
+`python telemetry.py` compares the latest run with the earlier runs of the
+same command and flags stages that got slower or used more memory.
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+import threading
+import contextlib
+import statistics
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+TELEMETRY_PATH = "./data/telemetry.jsonl"
+# Slowest items kept per stage
+SLOWEST_ITEMS = 10
+# A stage is reported as a regression when it is this much worse than the median of earlier runs
+REGRESSION_THRESHOLD = 0.2
+# Seconds between two samples of the RSS while stages are open
+RSS_SAMPLE_INTERVAL = 0.05
+
+_lock = threading.Lock()
+_current_run = None
+# Stages whose peak RSS is being sampled, and the thread sampling it while there are any
+_open_stages = set()
+_sampler = None
+
+
+def _usage():
+    """(CPU seconds of this process and its finished children, lifetime peak RSS in bytes of each)."""
+    if resource is None:
+        return time.process_time(), 0, 0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    return cpu, own.ru_maxrss * scale, children.ru_maxrss * scale
+
+
+def _current_rss():
+    """The resident set size of this process in bytes, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm", 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _sample_rss():
+    """Raise the peak RSS of every open stage to the current RSS."""
+    rss = _current_rss()
+    if rss is None:
+        return
+    with _lock:
+        for timer in _open_stages:
+            if timer.peak_rss is None or rss > timer.peak_rss:
+                timer.peak_rss = rss
+
+
+def _sample_while_open():
+    global _sampler
+    while True:
+        time.sleep(RSS_SAMPLE_INTERVAL)
+        _sample_rss()
+        with _lock:
+            if not _open_stages:
+                _sampler = None
+                return
+
+
+def _open_stage(timer):
+    global _sampler
+    with _lock:
+        _open_stages.add(timer)
+        if _sampler is None and _current_rss() is not None:
+            _sampler = threading.Thread(target=_sample_while_open, name="telemetry-rss", daemon=True)
+            _sampler.start()
+    _sample_rss()
+
+
+def _close_stage(timer):
+    _sample_rss()
+    with _lock:
+        _open_stages.discard(timer)
+
+
+class StageTimer(object):
+    """What one stage did; filled in by the `stage()` context manager."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.slowest = []  # min-heap of (seconds, item name)
+        self.ok = True  # set to False for a stage that failed without raising
+        self.peak_rss = None  # highest RSS sampled while the stage ran
+        self.record = None
+
+    def add(self, items=1, nbytes=0):
+        with _lock:
+            self.items += items
+            self.bytes += nbytes
+
+    def item(self, name, seconds):
+        """Note the time one item (e.g. a PDF) took, to keep the slowest ones."""
+        with _lock:
+            if len(self.slowest) < SLOWEST_ITEMS:
+                heapq.heappush(self.slowest, (seconds, name))
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, name))
+
+
+class Run(object):
+    def __init__(self, command):
+        self.command = command
+        self.started = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.ok = True
+
+    def as_dict(self):
+        _, peak_rss, children_peak_rss = _usage()
+        return {
+            "command": self.command,
+            "started": self.started,
+            "wall_seconds": round(time.perf_counter() - self.start, 3),
+            "ok": self.ok,
+            "peak_rss": peak_rss,
+            "children_peak_rss": children_peak_rss,
+            "stages": self.stages,
+        }
+
+
+@contextlib.contextmanager
+def run(command, path=TELEMETRY_PATH):
+    """Record the stages measured inside the block as one run of `command`."""
+    global _current_run
+    if _current_run is not None:
+        # Nested entry point: its stages belong to the enclosing run
+        yield _current_run
+        return
+
+    _current_run = current = Run(command)
+    try:
+        yield current
+    except BaseException:
+        current.ok = False
+        raise
+    finally:
+        _current_run = None
+        append_record(current.as_dict(), path)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Measure the block as the stage `name` of the current run."""
+    timer = StageTimer(name)
+    wall_start = time.perf_counter()
+    cpu_start, _, _ = _usage()
+    _open_stage(timer)
+    ok = False
+    try:
+        yield timer
+        ok = True
+    finally:
+        _close_stage(timer)
+        wall = time.perf_counter() - wall_start
+        cpu, max_rss, children_max_rss = _usage()
+        # CPU time is process-wide, so stages running concurrently share theirs
+        timer.record = {
+            "stage": name,
+            "ok": ok and timer.ok,
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu - cpu_start, 3),
+            "items": timer.items,
+            "items_per_sec": round(timer.items / wall, 2) if timer.items and wall > 0 else None,
+            "bytes": timer.bytes,
+            "peak_rss": timer.peak_rss,
+            "max_rss": max_rss,
+            "children_max_rss": children_max_rss,
+            "slowest": [{"item": item, "seconds": round(seconds, 3)}
+                        for seconds, item in sorted(timer.slowest, reverse=True)],
+        }
+        current = _current_run
+        if current is not None:
+            with _lock:
+                current.stages.append(timer.record)
+
+
+def append_record(record, path=TELEMETRY_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_history(path=TELEMETRY_PATH):
+    """Every run recorded in `path`, oldest first; malformed lines are skipped."""
+    runs = []
+    if not os.path.exists(path):
+        return runs
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+
+def compare(latest, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    Rows comparing each stage of `latest` with the median over `previous`
+    runs: wall time, items/sec and peak RSS, with the metrics that are worse
+    by more than `threshold` listed under "regressions". Runs recorded before
+    the peak RSS was sampled per stage only have the process's lifetime peak,
+    which is not compared.
+    """
+    rows = []
+    for record in latest["stages"]:
+        history = [s for r in previous for s in r["stages"] if s["stage"] == record["stage"] and s["ok"]]
+        row = {"stage": record["stage"], "latest": record, "runs": len(history), "regressions": []}
+        for metric, higher_is_worse in (("wall_seconds", True), ("items_per_sec", False), ("peak_rss", True)):
+            values = [s[metric] for s in history if s.get(metric) and (metric != "peak_rss" or "max_rss" in s)]
+            if not values or not record.get(metric):
+                continue
+            baseline = statistics.median(values)
+            row[metric] = baseline
+            change = (record[metric] - baseline) / baseline
+            if (change if higher_is_worse else -change) > threshold:
+                row["regressions"].append(metric)
+        rows.append(row)
+    return rows
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def print_report(latest, rows, slowest=3):
+    print(f"\n{latest['command']} run of {latest['started']} "
+          f"({latest['wall_seconds']:.1f}s, {'ok' if latest['ok'] else 'FAILED'}, "
+          f"peak RSS {format_bytes(latest['peak_rss'])})")
+    print(f"{'stage':<24} {'wall s':>8} {'median':>8} {'cpu s':>8} {'items':>8} {'items/s':>9} "
+          f"{'median':>9} {'bytes':>10} {'peak RSS':>10} {'runs':>5}")
+
+    def number(value, digits):
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    for row in rows:
+        s = row["latest"]
+        print(f"{s['stage']:<24} {s['wall_seconds']:>8.2f} {number(row.get('wall_seconds'), 2):>8} "
+              f"{s['cpu_seconds']:>8.2f} {s['items']:>8} {number(s['items_per_sec'], 1):>9} "
+              f"{number(row.get('items_per_sec'), 1):>9} {format_bytes(s['bytes']):>10} "
+              f"{format_bytes(s['peak_rss']) if s.get('peak_rss') else '-':>10} {row['runs']:>5}"
+              + ("" if s["ok"] else "  FAILED"))
+        for item in s["slowest"][:slowest]:
+            print(f"{'':<26}{item['seconds']:>8.2f}s  {item['item']}")
+
+    regressions = [(row["stage"], metric) for row in rows for metric in row["regressions"]]
+    if regressions:
+        print("\nRegressions against the median of earlier runs:")
+        for name, metric in regressions:
+            print(f"  {name}: {metric}")
+    else:
+        print("\nNo regressions against earlier runs")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the latest pipeline run with earlier ones")
+    parser.add_argument("--path", default=TELEMETRY_PATH, help=f"Run history (default: {TELEMETRY_PATH})")
+    parser.add_argument("--command", help="Only consider runs of this command (default: that of the latest run)")
+    parser.add_argument("--history", type=int, default=10, help="Earlier runs to compare with (default: 10)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help=f"Relative change reported as a regression (default: {REGRESSION_THRESHOLD})"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    runs = load_history(args.path)
+    if args.command:
+        runs = [r for r in runs if r["command"] == args.command]
+    if not runs:
+        print(f"No runs recorded in {args.path}")
+        return 1
+
+    latest = runs[-1]
+    previous = [r for r in runs[:-1] if r["command"] == latest["command"] and r["ok"]][-args.history:]
+    rows = compare(latest, previous, args.threshold)
+    if args.json:
+        print(json.dumps({"latest": latest, "stages": rows}, indent=2))
+    else:
+        print_report(latest, rows)
+    return 2 if any(row["regressions"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
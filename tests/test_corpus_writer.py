@@ -0,0 +1,51 @@
+"""CorpusWriter only replacing its outputs when it finishes cleanly."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus_writer import CorpusWriter  # noqa: E402
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write(directory, count, fail=False):
+    with CorpusWriter(str(directory / "texts.parquet"), str(directory / "texts.csv"), str(directory / "texts.jsonl"),
+                      row_group_size=10, partitioned_path=str(directory / "partitioned"),
+                      arrow_path=str(directory / "texts.arrow")) as writer:
+        for i in range(count):
+            writer.write(f"{i:04d}.pdf", f"Yazı {i}", {"year": 2020 + i % 3, "course": "Turkish 101"})
+        if fail:
+            raise Interrupted()
+
+
+def contents(directory):
+    return {os.path.relpath(os.path.join(root, name), directory): open(os.path.join(root, name), 'rb').read()
+            for root, _, names in os.walk(directory) for name in names}
+
+
+def test_outputs_are_complete(tmp_path):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    write(tmp_path, 50)
+
+    assert pq.read_table(tmp_path / "texts.parquet").num_rows == 50
+    assert ds.dataset(str(tmp_path / "partitioned"), partitioning="hive").count_rows() == 50
+    assert len((tmp_path / "texts.csv").read_text(encoding="utf-8").splitlines()) == 51
+    assert sorted(os.listdir(tmp_path)) == ["partitioned", "texts.arrow", "texts.csv", "texts.jsonl",
+                                            "texts.parquet"]
+
+
+def test_a_failed_write_leaves_the_previous_outputs(tmp_path):
+    write(tmp_path, 50)
+    before = contents(tmp_path)
+
+    with pytest.raises(Interrupted):
+        write(tmp_path, 25, fail=True)
+
+    assert contents(tmp_path) == before
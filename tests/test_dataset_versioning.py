@@ -0,0 +1,37 @@
+"""dataset_versioning.store_version leaving no partial version behind."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_versioning import store_version, list_versions, get_latest_version  # noqa: E402
+
+
+def failing_rows():
+    yield {"text": "Bir gün okula gittim.", "source": "0001.pdf"}
+    raise OSError("No space left on device")
+
+
+def test_a_failed_version_leaves_no_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store_version("v1", [{"text": "İlk yazı.", "source": "0000.pdf"}])
+
+    with pytest.raises(OSError):
+        store_version("v2", failing_rows())
+
+    assert list_versions() == ["v1"]
+    assert get_latest_version()["version"] == "v1"
+
+
+def test_a_failed_rewrite_keeps_the_existing_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store_version("v1", [{"text": "İlk yazı.", "source": "0000.pdf"}])
+    manifest = (tmp_path / "versions" / "v1" / "rows.jsonl").read_bytes()
+
+    with pytest.raises(OSError):
+        store_version("v1", failing_rows())
+
+    assert os.listdir(tmp_path / "versions" / "v1") == ["rows.jsonl"]
+    assert (tmp_path / "versions" / "v1" / "rows.jsonl").read_bytes() == manifest
@@ -0,0 +1,125 @@
+"""
+Incremental crawls against scraper/mock_site.py.
+
+Twisted's reactor can only be started once per process, so every crawl runs
+in its own Python process, while the mock site is served from this one.
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+SCRAPER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scraper')
+sys.path.insert(0, SCRAPER_DIR)
+
+import mock_site  # noqa: E402
+
+
+CRAWL = """
+import sys
+sys.path.append({scraper_dir!r})
+import crawl
+settings = {{"FILES_STORE": {files_store!r}, "DOWNLOAD_DELAY": 0, "ROBOTSTXT_OBEY": False,
+             "EXTRACTION_ENABLED": False, "TELEMETRY_ENABLED": False}}
+finished = crawl.crawl(state_path={state_path!r}, settings_overrides=settings,
+                       start_urls={url!r}, allowed_domains="127.0.0.1")
+sys.exit(0 if finished else 1)
+"""
+
+
+class RecordingSite(object):
+    """mock_site served from a background thread, recording every request and response status."""
+
+    def __init__(self, site):
+        self.site = site
+        self.requests = []
+        self.server = mock_site.serve(site)
+        recorder = self
+        handler = self.server.RequestHandlerClass
+
+        class RecordingHandler(handler):
+            def do_GET(self):
+                self.recorded = {"path": self.path, "if_none_match": self.headers.get('If-None-Match')}
+                recorder.requests.append(self.recorded)
+                handler.do_GET(self)
+
+            def send_response(self, code, message=None):
+                self.recorded["status"] = code
+                handler.send_response(self, code, message)
+
+        self.server.RequestHandlerClass = RecordingHandler
+
+    @property
+    def url(self):
+        return self.server.url
+
+    def reset(self):
+        self.requests = []
+
+
+@pytest.fixture
+def site():
+    served = RecordingSite(mock_site.MockSite(writings=24, per_page=4, pdf_size=0))
+    yield served
+    served.server.shutdown()
+    served.server.server_close()
+
+
+def crawl(site, work_dir):
+    script = CRAWL.format(scraper_dir=SCRAPER_DIR, files_store=str(work_dir / 'data'),
+                          state_path=str(work_dir / 'crawl_state.json'), url=site.url)
+    result = subprocess.run([sys.executable, '-c', script], cwd=str(work_dir),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=120)
+    assert result.returncode == 0, result.stdout.decode('utf-8', 'replace')
+
+
+def downloaded_numbers(work_dir):
+    """The ogrenciNo of every writing recorded by WritingMetadataPipeline, in crawl order."""
+    with open(work_dir / 'data' / 'metadata.jsonl', 'r', encoding='utf-8') as f:
+        return [int(json.loads(line)["source_url"].rsplit('=', 1)[1]) for line in f]
+
+
+def all_numbers(site):
+    return sorted(number for numbers in site.site.listings.values() for number in numbers)
+
+
+def test_first_crawl_downloads_everything_unconditionally(site, tmp_path):
+    crawl(site, tmp_path)
+
+    assert sorted(downloaded_numbers(tmp_path)) == all_numbers(site)
+    assert all(request["if_none_match"] is None for request in site.requests)
+    assert all(request["status"] == 200 for request in site.requests)
+
+
+def test_second_crawl_revalidates_and_downloads_only_new_writings(site, tmp_path):
+    crawl(site, tmp_path)
+    first = downloaded_numbers(tmp_path)
+
+    # Two new writings on an existing term listing: the root listing itself does not change
+    section = site.site.sections[0]
+    site.site.listings[section] += [20000100, 20000101]
+    site.reset()
+    crawl(site, tmp_path)
+
+    assert sorted(downloaded_numbers(tmp_path)[len(first):]) == [20000100, 20000101]
+
+    listings = [request for request in site.requests if 'ogrenciNo' not in request["path"]]
+    root = [request for request in listings if request["path"] == '/turkce/']
+    assert root and root[0]["if_none_match"] and root[0]["status"] == 304
+    assert sum(request["status"] == 304 for request in listings) >= len(site.site.sections) - 1
+
+    writings = [request["path"] for request in site.requests if 'ogrenciNo' in request["path"]]
+    assert sorted(writings) == ['/turkce/yazi?ogrenciNo=20000100', '/turkce/yazi?ogrenciNo=20000101']
+
+
+def test_recrawl_of_unchanged_site_downloads_nothing(site, tmp_path):
+    crawl(site, tmp_path)
+    first = downloaded_numbers(tmp_path)
+    site.reset()
+    crawl(site, tmp_path)
+
+    assert downloaded_numbers(tmp_path) == first
+    assert all(request["status"] == 304 for request in site.requests)
+    assert all(request["if_none_match"] for request in site.requests)
@@ -0,0 +1,209 @@
+"""upload_to_hf.sync_to_hub against an in-memory stand-in for HfApi, and the releases it uploads."""
+import os
+import sys
+import json
+import hashlib
+import pathlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upload_to_hf  # noqa: E402
+from upload_to_hf import sync_to_hub, release_files  # noqa: E402
+
+
+REPO_ID = "user/dataset"
+
+
+class UploadInterrupted(Exception):
+    pass
+
+
+class FakeHfApi(object):
+    """
+    A dataset repo held in memory. Parquet files are stored as LFS files and
+    must be preuploaded before a commit may add them, as on the Hub.
+    `fail_after` makes preupload_lfs_files raise after that many uploads.
+    """
+
+    def __init__(self, files=None, fail_after=None):
+        self.files = dict(files or {})
+        self.preuploaded = set()
+        self.preuploads = []
+        self.commits = []
+        self.fail_after = fail_after
+
+    def list_repo_tree(self, repo_id, recursive=False, repo_type=None, token=None):
+        from huggingface_hub.hf_api import RepoFile
+
+        assert repo_id == REPO_ID and recursive and repo_type == "dataset"
+        for path, data in sorted(self.files.items()):
+            git_oid = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+            lfs = None
+            if path.endswith(".parquet"):
+                lfs = {"size": len(data), "oid": hashlib.sha256(data).hexdigest(), "pointerSize": 134}
+            yield RepoFile(path=path, size=len(data), oid=git_oid, lfs=lfs)
+
+    def preupload_lfs_files(self, repo_id, additions, token=None, repo_type=None):
+        if self.fail_after is not None and len(self.preuploads) >= self.fail_after:
+            raise UploadInterrupted("connection reset")
+        for operation in additions:
+            self.preuploads.append(operation.path_in_repo)
+            self.preuploaded.add(hashlib.sha256(content(operation)).hexdigest())
+
+    def create_commit(self, repo_id, operations, commit_message=None, token=None, repo_type=None):
+        from huggingface_hub import CommitOperationAdd
+
+        for operation in operations:
+            if isinstance(operation, CommitOperationAdd) and operation.path_in_repo.endswith(".parquet"):
+                assert hashlib.sha256(content(operation)).hexdigest() in self.preuploaded, operation.path_in_repo
+        for operation in operations:
+            if isinstance(operation, CommitOperationAdd):
+                self.files[operation.path_in_repo] = content(operation)
+            else:
+                del self.files[operation.path_in_repo]
+        self.commits.append(commit_message)
+
+
+def content(operation):
+    return read(operation.path_or_fileobj)
+
+
+def read(source):
+    return source if isinstance(source, bytes) else pathlib.Path(source).read_bytes()
+
+
+@pytest.fixture
+def release(tmp_path):
+    """{path in repo: local path or bytes} of a small release with two versions."""
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    files = {"README.md": b"# Dataset\n"}
+    for version in ("v1", "v2"):
+        for shard in range(2):
+            path = shards / f"{version}-{shard}.parquet"
+            path.write_bytes(f"{version} shard {shard}".encode() * 100)
+            files[f"{version}/train-{shard:05d}.parquet"] = str(path)
+    return files
+
+
+def sync(api, files, tmp_path, **kwargs):
+    return sync_to_hub(api, REPO_ID, files, token="token",
+                       checkpoint_path=str(tmp_path / "checkpoint.json"), **kwargs)
+
+
+def local_contents(files):
+    return {path: read(source) for path, source in files.items()}
+
+
+def test_first_upload_sends_everything_in_one_commit(release, tmp_path):
+    api = FakeHfApi()
+
+    assert sync(api, release, tmp_path) == (5, 0)
+    assert api.files == local_contents(release)
+    assert sorted(api.preuploads) == sorted(path for path in release if path.endswith(".parquet"))
+    assert len(api.commits) == 1
+
+
+def test_rerun_without_changes_commits_nothing(release, tmp_path):
+    api = FakeHfApi()
+    sync(api, release, tmp_path)
+    api.preuploads = []
+
+    assert sync(api, release, tmp_path) == (0, 0)
+    assert api.preuploads == []
+    assert len(api.commits) == 1
+
+
+def test_only_the_changed_shard_is_uploaded(release, tmp_path):
+    api = FakeHfApi()
+    sync(api, release, tmp_path)
+    api.preuploads = []
+
+    with open(release["v2/train-00001.parquet"], 'wb') as f:
+        f.write(b"v2 shard 1, rebuilt" * 100)
+
+    assert sync(api, release, tmp_path) == (1, 0)
+    assert api.preuploads == ["v2/train-00001.parquet"]
+    assert api.files == local_contents(release)
+    assert len(api.commits) == 2
+
+
+def test_stale_parquet_files_are_deleted(release, tmp_path):
+    api = FakeHfApi({"v1/train-00009.parquet": b"old shard", "data/train-00000.parquet": b"old default",
+                     "notes/extra.parquet": b"not managed", ".gitattributes": b"*.parquet filter=lfs\n"})
+
+    added, deleted = sync(api, release, tmp_path, managed={"data/", "v1/", "v2/"})
+
+    assert (added, deleted) == (5, 2)
+    assert "v1/train-00009.parquet" not in api.files
+    assert "data/train-00000.parquet" not in api.files
+    assert api.files["notes/extra.parquet"] == b"not managed"
+    assert api.files[".gitattributes"] == b"*.parquet filter=lfs\n"
+
+
+def test_interrupted_upload_resumes_from_the_checkpoint(release, tmp_path):
+    api = FakeHfApi(fail_after=2)
+
+    with pytest.raises(UploadInterrupted):
+        sync(api, release, tmp_path)
+    assert api.files == {} and api.commits == []
+    uploaded = list(api.preuploads)
+    assert len(uploaded) == 2
+
+    api.fail_after = None
+    assert sync(api, release, tmp_path) == (5, 0)
+    # The shards preuploaded before the failure are not sent again
+    assert sorted(api.preuploads[2:]) == sorted(path for path in release
+                                                if path.endswith(".parquet") and path not in uploaded)
+    assert api.files == local_contents(release)
+    assert len(api.commits) == 1
+
+
+@pytest.fixture
+def versions(tmp_path, monkeypatch):
+    """A tree whose v1 and v2 only have their metadata.json, and whose v3 has its texts."""
+    from dataset_versioning import store_version, write_metadata
+
+    monkeypatch.chdir(tmp_path)
+    for version in ("v1", "v2"):
+        os.makedirs(f"versions/{version}")
+        with open(f"versions/{version}/metadata.json", 'w', encoding='utf-8') as f:
+            json.dump({"version": version, "num_entries": 1000, "years": "2014-2024"}, f)
+    rows = [{"text": f"Yazı {number} kısa bir metin.", "source": f"{number}.pdf", "writing_id": str(20000000 + number),
+             "course": "Turkish 101", "term": "2016-2017 Fall", "year": 2016} for number in range(5)]
+    stats, _ = store_version("v3", rows)
+    write_metadata("v3", {"version": "v3", "num_entries": stats["num_entries"], "stats": stats})
+
+
+def test_release_skips_versions_without_texts(versions):
+    files, built = release_files("v3")
+
+    assert built == ["v3"]
+    assert not any(path.startswith(("v1/", "v2/")) for path in files)
+    assert any(path.startswith("v3/") and path.endswith(".parquet") for path in files)
+    # The shards carry the writings' metadata, not just their texts
+    import pyarrow.parquet as pq
+    table = pq.read_table(next(source for path, source in files.items() if path.startswith("v3/")))
+    assert table.column("writing_id").to_pylist()[0] == "20000000"
+    assert set(table.column("course").to_pylist()) == {"Turkish 101"}
+    assert table.column("year").to_pylist()[0] == 2016
+
+    # Their configurations stay in the card, pointing at the shards already on the Hub
+    card = files["README.md"].decode("utf-8")
+    assert "config_name: v1" in card and "config_name: v2" in card
+
+
+def test_release_keeps_shards_of_versions_it_cannot_build(versions, tmp_path):
+    api = FakeHfApi({"v1/train-00000-of-00001.parquet": b"v1 shard", "v2/train-00000-of-00001.parquet": b"v2 shard",
+                     "v3/train-00000-of-00002.parquet": b"stale v3 shard", "data/train-00000.parquet": b"old default"})
+
+    added, deleted = upload_to_hf.release(api, REPO_ID, "v3", "token", checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+    assert deleted == 2
+    assert api.files["v1/train-00000-of-00001.parquet"] == b"v1 shard"
+    assert api.files["v2/train-00000-of-00001.parquet"] == b"v2 shard"
+    assert "v3/train-00000-of-00002.parquet" not in api.files
+    assert "data/train-00000.parquet" not in api.files
+    assert any(path.startswith("v3/") for path in api.files)
@@ -0,0 +1,69 @@
+"""text_index.build_index reusing the previous version's segments."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_versioning import store_version  # noqa: E402
+from text_index import build_index, TextIndex  # noqa: E402
+
+
+QUERIES = ["istanbul", "okul*", '"bir gün"', "IŞIK", "yazı 7", "kitap okul*"]
+
+WORDS = ["istanbul", "okul", "okula", "okulda", "ışık", "kitap", "bir", "gün", "deniz", "yazı", "ev"]
+
+
+def text(number):
+    """A short text whose words depend on `number`, so that queries match different rows."""
+    words = [WORDS[(number * k + k) % len(WORDS)] for k in range(1, 12)]
+    return f"Yazı {number}: " + " ".join(words) + (" Bir gün İstanbul'da" if number % 3 == 0 else "") + "."
+
+
+def rows(numbers):
+    return [{"text": text(number), "source": f"{number:04x}.pdf"} for number in numbers]
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def results(version):
+    with TextIndex(version) as index:
+        return {query: (index.count(query), index.search(query, k=50)) for query in QUERIES}
+
+
+def test_new_texts_between_old_ones_reuse_the_previous_index(tree):
+    store_version("v1", rows(range(0, 40, 2)))
+    build_index("v1", segment_tokens=50)
+
+    # Sorted by source, the new texts land between the old ones; two old texts are gone
+    numbers = sorted(set(range(0, 40, 2)) - {4, 10} | {7, 13, 21, 40})
+    store_version("v2", rows(sorted(numbers, key=lambda number: f"{number:04x}")))
+    info = build_index("v2", segment_tokens=50)
+
+    assert info["reused_rows"] == 18
+    incremental = results("v2")
+    assert build_index("v2", rebuild=True)["reused_rows"] == 0
+    assert results("v2") == incremental
+    assert incremental["yazı 7"][0] == 1
+
+
+def test_duplicate_texts_are_each_matched_once(tree):
+    store_version("v1", rows([1, 2, 1]))
+    build_index("v1")
+    store_version("v2", rows([1, 3, 1, 1]))
+
+    assert build_index("v2")["reused_rows"] == 2
+    with TextIndex("v2") as index:
+        assert index.count("yazı 1") == 3
+
+
+def test_an_up_to_date_index_is_kept(tree):
+    store_version("v1", rows(range(5)))
+    first = build_index("v1")
+
+    assert build_index("v1") == first
@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+"""
+Full-text search over a version of the Bilkent Turkish Writings Dataset.
+
+    python text_index.py --build                    # index the latest version
+    python text_index.py 'istanbul'                 # writings containing a word
+    python text_index.py '"bir gün" okul*' -k 20    # a phrase and a prefix
+
+    from text_index import TextIndex
+    with TextIndex("v2") as index:
+        index.search('"bir gün" okul*', k=10)       # [{"row": ..., "score": ..., "source": ...}]
+
+Texts are folded the Turkish way before they are split into words: I/ı and
+İ/i are case pairs, so "IŞIK" matches "ışık" and "İstanbul" matches
+"istanbul". Queries go through the same folding. A query is a list of
+clauses that must all match: a word, a "quoted phrase" or a prefix ending in
+`*`; prefixes cover suffixed forms, e.g. okul* finds okula, okulda and
+okulların. Results are ranked by BM25 and refer to the rows of the version,
+the same row numbers BilkentCorpus and the split files use.
+
+The index of versions/vN/ is written to versions/vN/index/ as segments of
+positional postings: per segment a sorted term list (searched by bisection,
+which also serves prefixes), a lexicon of postings offsets and one uint32
+postings file of document ids, term frequencies and positions, read through
+a memory map. Document ids are local to their segment; a row map per
+segment gives the row of the version each document is, or -1 for documents
+that are not in the version. Segments are matched to rows by text hash, so
+a new version reuses the previous version's segments wherever its rows
+are, with only a new row map, and only the texts the previous version did
+not have are indexed.
+"""
+import os
+import re
+import sys
+import json
+import array
+import bisect
+import shutil
+import hashlib
+import argparse
+import unicodedata
+from itertools import islice
+
+from dataset_versioning import (get_latest_version, list_versions, previous_version, version_dir, manifest_path,
+                                version_index, iter_version_rows, STORE_DIR)
+from text_store import ShardStore
+import telemetry
+
+
+INDEX_NAME = "index"
+INDEX_FORMAT = 2
+# Rows are indexed into a new segment once this many tokens are buffered
+SEGMENT_TOKENS = 2_000_000
+# Terms a prefix expands to at most, the most frequent first
+MAX_EXPANSIONS = 1000
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r'\w+')
+_QUERY_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def fold(text):
+    """Turkish case folding: I -> ı and İ -> i, then lowercase."""
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def tokenize(text):
+    """The folded words of `text`, in order."""
+    return _WORD.findall(fold(text))
+
+
+def index_dir(version):
+    return f"{version_dir(version)}/{INDEX_NAME}"
+
+
+def rows_hash(hashes):
+    """Hash of an ordered list of text hashes; equal to a version's content hash for all of its rows."""
+    digest = hashlib.sha256()
+    for text_digest in hashes:
+        digest.update(text_digest.encode("ascii"))
+    return digest.hexdigest()
+
+
+def read_index_info(version):
+    """The index.json of `version`'s index, or None if it has none."""
+    path = f"{index_dir(version)}/index.json"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    return info if info.get("format") == INDEX_FORMAT else None
+
+
+class SegmentWriter(object):
+    """Accumulates the postings of rows and writes them as one segment."""
+
+    def __init__(self):
+        self.num_tokens = 0
+        self.postings = {}  # term -> [(document, [positions])]
+        self.lengths = array.array('I')
+        self.rows = []
+
+    def add(self, row, text):
+        document = len(self.rows)
+        positions = {}
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            positions.setdefault(token, []).append(position)
+        for token, found in positions.items():
+            self.postings.setdefault(token, []).append((document, found))
+        self.lengths.append(len(tokens))
+        self.rows.append(row)
+        self.num_tokens += len(tokens)
+
+    def write(self, directory, name):
+        """Write the segment files as `<name>.*` under `directory` and return its index.json entry."""
+        import numpy as np
+
+        terms = sorted(self.postings)
+        lexicon = np.empty((len(terms), 3), dtype=np.int64)
+        data = array.array('I')
+        for i, term in enumerate(terms):
+            entries = self.postings[term]
+            lexicon[i] = (len(data), len(entries), sum(len(found) for _, found in entries))
+            data.extend(row for row, _ in entries)
+            data.extend(len(found) for _, found in entries)
+            for _, found in entries:
+                data.extend(found)
+
+        with open(f"{directory}/{name}.terms", 'w', encoding='utf-8') as f:
+            f.write("\n".join(terms))
+        np.save(f"{directory}/{name}.lexicon.npy", lexicon)
+        np.save(f"{directory}/{name}.lengths.npy", np.frombuffer(self.lengths, dtype=np.uint32))
+        with open(f"{directory}/{name}.postings", 'wb') as f:
+            data.tofile(f)
+        np.save(f"{directory}/{name}.rows.npy", np.array(self.rows, dtype=np.int64))
+        return {"name": name, "num_docs": len(self.rows), "num_terms": len(terms), "num_tokens": self.num_tokens}
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _reusable(version, hashes):
+    """
+    (index info, directory, row maps) of the previous version's index, with
+    the row in `hashes` of each document of each of its segments (-1 for
+    texts `hashes` does not have), or (None, None, None) if there is none.
+    """
+    import numpy as np
+
+    previous = previous_version(version)
+    info = read_index_info(previous) if previous else None
+    if info is None:
+        return None, None, None
+    previous_hashes = [digest for digest, _ in version_index(previous)]
+    if rows_hash(previous_hashes) != info["content_hash"]:
+        # The previous version changed after it was indexed
+        return None, None, None
+
+    # The rows of each text, last first, so that equal texts are matched in order
+    free = {}
+    for row in range(len(hashes) - 1, -1, -1):
+        free.setdefault(hashes[row], []).append(row)
+    directory = index_dir(previous)
+    row_maps = []
+    for segment in info["segments"]:
+        rows = np.load(f"{directory}/{segment['name']}.rows.npy")
+        for document, row in enumerate(rows.tolist()):
+            candidates = free.get(previous_hashes[row]) if row >= 0 else None
+            rows[document] = candidates.pop() if candidates else -1
+        row_maps.append(rows)
+    return info, directory, row_maps
+
+
+def build_index(version=None, rebuild=False, segment_tokens=SEGMENT_TOKENS, store_path=STORE_DIR):
+    """
+    Index `version` (default: the latest) and return its index info.
+
+    Reuses the segments of the previous version's index for the rows whose
+    texts it has, wherever they are in `version`, so only the other rows
+    are indexed; with `rebuild`, every row is.
+    """
+    import numpy as np
+
+    if version is None:
+        version = get_latest_version()["version"]
+    hashes = [digest for digest, _ in version_index(version)]
+
+    current = read_index_info(version)
+    if not rebuild and current is not None and current["content_hash"] == rows_hash(hashes):
+        print(f"The index of {version} is up to date ({len(hashes)} rows)")
+        return current
+    base, base_dir, row_maps = (None, None, None) if rebuild else _reusable(version, hashes)
+
+    directory = index_dir(version)
+    tmp_dir = f"{version_dir(version)}/.{INDEX_NAME}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    segments = []
+    covered = np.zeros(len(hashes), dtype=bool)
+    num_tokens = 0
+    if base is not None:
+        for segment, rows in zip(base["segments"], row_maps):
+            live = rows >= 0
+            if not live.any():
+                continue
+            for suffix in (".terms", ".lexicon.npy", ".lengths.npy", ".postings"):
+                _link(f"{base_dir}/{segment['name']}{suffix}", f"{tmp_dir}/{segment['name']}{suffix}")
+            np.save(f"{tmp_dir}/{segment['name']}.rows.npy", rows)
+            covered[rows[live]] = True
+            num_tokens += int(np.load(f"{base_dir}/{segment['name']}.lengths.npy")[live].sum())
+            segments.append(segment)
+    reused = int(covered.sum())
+    # New segments are numbered after the reused ones, some of which may have been dropped
+    number = 1 + max((int(segment["name"][3:]) for segment in segments), default=-1)
+
+    with telemetry.stage("index.build") as timer:
+        writer = SegmentWriter()
+        missing = np.flatnonzero(~covered)
+        last = int(missing[-1]) + 1 if len(missing) else 0
+        for row, record in enumerate(islice(iter_version_rows(version, store_path), last)):
+            if covered[row]:
+                continue
+            writer.add(row, record["text"])
+            timer.add(1, len(record["text"]))
+            if writer.num_tokens >= segment_tokens:
+                segments.append(writer.write(tmp_dir, f"seg{number:04d}"))
+                num_tokens += writer.num_tokens
+                number += 1
+                writer = SegmentWriter()
+        if writer.rows:
+            segments.append(writer.write(tmp_dir, f"seg{number:04d}"))
+            num_tokens += writer.num_tokens
+
+    info = {
+        "format": INDEX_FORMAT,
+        "version": version,
+        "num_rows": len(hashes),
+        "num_tokens": num_tokens,
+        "content_hash": rows_hash(hashes),
+        "reused_rows": reused,
+        "segments": segments,
+    }
+    with open(f"{tmp_dir}/index.json", 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+    print(f"Indexed {version}: {len(hashes) - reused} rows indexed, {reused} reused "
+          f"from {os.path.basename(os.path.dirname(base_dir)) if base_dir else 'no earlier index'} "
+          f"({len(segments)} segments, {info['num_tokens']} tokens)")
+    return info
+
+
+class Segment(object):
+    def __init__(self, directory, entry):
+        import numpy as np
+
+        name = f"{directory}/{entry['name']}"
+        with open(f"{name}.terms", 'r', encoding='utf-8') as f:
+            self.terms = f.read().split("\n") if entry["num_terms"] else []
+        self.lexicon = np.load(f"{name}.lexicon.npy")
+        self.lengths = np.load(f"{name}.lengths.npy")
+        # The row of each document in this version, -1 for documents it does not have
+        self.rows = np.load(f"{name}.rows.npy")
+        size = os.path.getsize(f"{name}.postings")
+        self.postings = np.memmap(f"{name}.postings", dtype=np.uint32, mode='r') if size else np.empty(0, np.uint32)
+
+    def find(self, term):
+        """Position of `term` in the term list, or None."""
+        i = bisect.bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else None
+
+    def expand(self, prefix):
+        """Positions of the terms starting with `prefix`."""
+        return range(bisect.bisect_left(self.terms, prefix), bisect.bisect_left(self.terms, prefix + "\U0010ffff"))
+
+    def docs(self, i):
+        """(rows, term frequencies) of term `i`, in the rows of this version only."""
+        offset, num_docs, _ = self.lexicon[i]
+        rows = self.rows[self.postings[offset:offset + num_docs]]
+        frequencies = self.postings[offset + num_docs:offset + 2 * num_docs]
+        live = rows >= 0
+        return rows[live], frequencies[live]
+
+    def occurrences(self, i):
+        """(row, position) of every occurrence of term `i` in the rows of this version, as two int64 arrays."""
+        import numpy as np
+
+        offset, num_docs, num_positions = self.lexicon[i]
+        rows = np.repeat(self.rows[self.postings[offset:offset + num_docs]],
+                         self.postings[offset + num_docs:offset + 2 * num_docs])
+        positions = self.postings[offset + 2 * num_docs:offset + 2 * num_docs + num_positions].astype(np.int64)
+        live = rows >= 0
+        return rows[live], positions[live]
+
+
+def parse_query(query):
+    """The clauses of `query` as ("term" | "prefix" | "phrase", [folded words])."""
+    clauses = []
+    for phrase, word in _QUERY_CLAUSE.findall(query):
+        if phrase:
+            words = tokenize(phrase)
+            if len(words) == 1:
+                clauses.append(("term", words))
+            elif words:
+                clauses.append(("phrase", words))
+        elif word.endswith("*") and tokenize(word):
+            # Only the last word of e.g. "kitap'ta*" is a prefix
+            words = tokenize(word)
+            clauses += [("term", [w]) for w in words[:-1]] + [("prefix", words[-1:])]
+        else:
+            clauses += [("term", [w]) for w in tokenize(word)]
+    return clauses
+
+
+class TextIndex(object):
+    """The index of one version; see the module docstring for the query syntax."""
+
+    def __init__(self, version=None):
+        import numpy as np
+
+        if version is None:
+            version = get_latest_version()["version"]
+        self.version = version
+        self.info = read_index_info(version)
+        if self.info is None:
+            raise FileNotFoundError(f"{version} has no index; build it with: python text_index.py --build "
+                                    f"--version {version}")
+        directory = index_dir(version)
+        self.segments = [Segment(directory, entry) for entry in self.info["segments"]]
+        self.num_rows = self.info["num_rows"]
+        self.lengths = np.zeros(self.num_rows, np.uint32)
+        for segment in self.segments:
+            live = segment.rows >= 0
+            self.lengths[segment.rows[live]] = segment.lengths[live]
+        self.average_length = max(self.info["num_tokens"] / max(self.num_rows, 1), 1.0)
+        self._rows = None
+
+    def _bm25(self, rows, frequencies, document_frequency):
+        import numpy as np
+
+        idf = np.log(1 + (self.num_rows - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = K1 * (1 - B + B * self.lengths[rows] / self.average_length)
+        frequencies = frequencies.astype(np.float64)
+        return idf * frequencies * (K1 + 1) / (frequencies + norm)
+
+    def _term(self, term):
+        """(rows, scores) of the rows containing `term`."""
+        import numpy as np
+
+        found = [(segment, segment.find(term)) for segment in self.segments]
+        found = [(segment, i) for segment, i in found if i is not None]
+        if not found:
+            return np.empty(0, np.int64), np.empty(0)
+        postings = [segment.docs(i) for segment, i in found]
+        rows = np.concatenate([rows for rows, _ in postings])
+        frequencies = np.concatenate([frequencies for _, frequencies in postings])
+        # Segments' rows interleave; keep them in row order
+        order = np.argsort(rows, kind="stable")
+        rows, frequencies = rows[order], frequencies[order]
+        return rows, self._bm25(rows, frequencies, len(rows))
+
+    def _prefix(self, prefix):
+        """(rows, scores) of the rows containing a term starting with `prefix`; scores add up per term."""
+        import numpy as np
+
+        terms = {}
+        for segment in self.segments:
+            for i in segment.expand(prefix):
+                terms[segment.terms[i]] = terms.get(segment.terms[i], 0) + int(segment.lexicon[i][1])
+        if len(terms) > MAX_EXPANSIONS:
+            terms = dict(sorted(terms.items(), key=lambda item: -item[1])[:MAX_EXPANSIONS])
+        scores = np.zeros(self.num_rows)
+        matched = np.zeros(self.num_rows, dtype=bool)
+        for term in terms:
+            rows, term_scores = self._term(term)
+            np.add.at(scores, rows, term_scores)
+            matched[rows] = True
+        rows = np.flatnonzero(matched)
+        return rows, scores[rows]
+
+    def _phrase(self, words):
+        """(rows, scores) of the rows containing `words` next to each other, scored by phrase frequency."""
+        import numpy as np
+
+        all_rows, all_counts = [], []
+        for segment in self.segments:
+            found = [segment.find(word) for word in words]
+            if any(i is None for i in found):
+                continue
+            # Occurrences as row << 32 | position of the phrase start, intersected rarest word first
+            starts = None
+            for k in sorted(range(len(words)), key=lambda k: segment.lexicon[found[k]][2]):
+                rows, positions = segment.occurrences(found[k])
+                keep = positions >= k
+                keys = (rows[keep] << 32) | (positions[keep] - k)
+                starts = keys if starts is None else np.intersect1d(starts, keys, assume_unique=True)
+                if not len(starts):
+                    break
+            if len(starts):
+                rows, counts = np.unique(starts >> 32, return_counts=True)
+                all_rows.append(rows)
+                all_counts.append(counts)
+        if not all_rows:
+            return np.empty(0, np.int64), np.empty(0)
+        rows = np.concatenate(all_rows)
+        counts = np.concatenate(all_counts)
+        order = np.argsort(rows, kind="stable")
+        return rows[order], self._bm25(rows[order], counts[order], len(rows))
+
+    def matches(self, query):
+        """(rows, scores) of every row matching all clauses of `query`, in row order."""
+        import numpy as np
+
+        rows, scores = None, None
+        for kind, words in parse_query(query):
+            if kind == "term":
+                clause_rows, clause_scores = self._term(words[0])
+            elif kind == "prefix":
+                clause_rows, clause_scores = self._prefix(words[0])
+            else:
+                clause_rows, clause_scores = self._phrase(words)
+            if rows is None:
+                rows, scores = clause_rows, clause_scores
+            else:
+                rows, left, right = np.intersect1d(rows, clause_rows, assume_unique=True, return_indices=True)
+                scores = scores[left] + clause_scores[right]
+            if not len(rows):
+                break
+        if rows is None:
+            return np.empty(0, np.int64), np.empty(0)
+        return rows, scores
+
+    def row_info(self, row):
+        """The manifest entry (hash, source, writing_id, ...) of `row`."""
+        if self._rows is None:
+            path = manifest_path(self.version)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as manifest:
+                    self._rows = manifest.readlines()
+            else:
+                self._rows = [json.dumps({"hash": digest}) for digest, _ in version_index(self.version)]
+        return json.loads(self._rows[row])
+
+    def search(self, query, k=10):
+        """The `k` best rows for `query` as dicts with "row", "score" and the row's manifest entry."""
+        import numpy as np
+
+        with telemetry.stage("index.search") as timer:
+            rows, scores = self.matches(query)
+            timer.add(len(rows))
+            # Highest score first, ties in row order
+            best = np.lexsort((rows, -scores))[:k]
+            return [{"row": int(rows[i]), "score": round(float(scores[i]), 4), **self.row_info(int(rows[i]))}
+                    for i in best]
+
+    def count(self, query):
+        """Number of rows matching `query`."""
+        return len(self.matches(query)[0])
+
+    def close(self):
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def snippet(text, query, width=80):
+    """The part of `text` around the first word matching a clause of `query`."""
+    clauses = parse_query(query)
+    text = unicodedata.normalize("NFC", text)
+    for match in _WORD.finditer(text):
+        word = fold(match.group())
+        if any(word == words[0] if kind != "prefix" else word.startswith(words[0]) for kind, words in clauses):
+            start = max(0, match.start() - width // 2)
+            end = min(len(text), match.end() + width // 2)
+            return ("..." if start else "") + " ".join(text[start:end].split()) + ("..." if end < len(text) else "")
+    return " ".join(text[:width].split())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the full-text index of a dataset version")
+    parser.add_argument("query", nargs="?", help='Words, "quoted phrases" and prefix* clauses, all of which must match')
+    parser.add_argument("--version", help="Version to index or search (default: the latest)")
+    parser.add_argument("--build", action="store_true", help="Build or update the index of the version")
+    parser.add_argument("--all", action="store_true", help="With --build, index every version, oldest first")
+    parser.add_argument("--rebuild", action="store_true", help="With --build, index every row afresh")
+    parser.add_argument("-k", type=int, default=10, help="Number of results (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        with telemetry.run("text_index"):
+            for version in (list_versions() if args.all else [args.version]):
+                build_index(version, args.rebuild)
+        return 0
+    if not args.query:
+        parser.error("Give a query, or --build to build the index")
+
+    with TextIndex(args.version) as index, ShardStore(STORE_DIR) as store:
+        results = index.search(args.query, args.k)
+        if args.json:
+            for result in results:
+                print(json.dumps(result, ensure_ascii=False))
+            return 0
+        print(f"{index.count(args.query)} rows of {index.version} match {args.query!r}")
+        for result in results:
+            text = store.get_text(result["hash"]) or ""
+            print(f"\n#{result['row']} score {result['score']:.2f}  {result.get('source') or ''}")
+            print(f"    {snippet(text, args.query)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Packed, append-only text store for the Bilkent Turkish Writings Dataset.
+
+Texts are concatenated as UTF-8 into a few large shard files and located
+through an index of (id, shard, offset, length, checksum). Shards are read
+through read-only memory maps, so fetching a text does not copy it until it
+is decoded.
+"""
+import os
+import mmap
+import sqlite3
+import hashlib
+
+
+SHARDS_DIR = "./data/shards/"
+
+# Start a new shard file once the current one grows past this many bytes
+DEFAULT_SHARD_SIZE = 32 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (
+    id TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    checksum TEXT NOT NULL
+)
+"""
+
+
+class ShardStore:
+    """
+    An id -> text store backed by append-only shard files.
+
+    Writing an id that already exists appends the new bytes and repoints the
+    index; the old bytes stay in the shard as dead space. An entry becomes
+    visible to readers only once commit() has stored its index row, so bytes
+    appended by a run that was killed mid-way are simply never referenced.
+    """
+
+    def __init__(self, path=SHARDS_DIR, shard_size=DEFAULT_SHARD_SIZE):
+        self.path = path
+        self.shard_size = shard_size
+        os.makedirs(path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(path, "index.sqlite"))
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+        self._maps = {}
+        self._writer = None
+        self._writer_shard = None
+
+    def _shard_path(self, shard):
+        return os.path.join(self.path, f"shard-{shard:05d}.bin")
+
+    def _open_writer(self):
+        """Open the last shard for appending, dropping any unreferenced tail."""
+        row = self.conn.execute("SELECT MAX(shard) FROM texts").fetchone()
+        shard = row[0] if row[0] is not None else 0
+        end = self.conn.execute(
+            "SELECT COALESCE(MAX(offset + length), 0) FROM texts WHERE shard = ?", (shard,)
+        ).fetchone()[0]
+
+        shard_path = self._shard_path(shard)
+        if os.path.exists(shard_path) and os.path.getsize(shard_path) > end:
+            with open(shard_path, 'r+b') as f:
+                f.truncate(end)
+
+        self._writer = open(shard_path, 'ab')
+        self._writer_shard = shard
+
+    def put(self, id, data):
+        """Append `data` (bytes) under `id` and return its checksum; call commit() to publish it."""
+        if self._writer is None:
+            self._open_writer()
+
+        if self._writer.tell() > 0 and self._writer.tell() + len(data) > self.shard_size:
+            self._writer.close()
+            self._writer = open(self._shard_path(self._writer_shard + 1), 'ab')
+            self._writer_shard += 1
+
+        offset = self._writer.tell()
+        self._writer.write(data)
+        checksum = hashlib.sha256(data).hexdigest()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO texts (id, shard, offset, length, checksum) VALUES (?, ?, ?, ?, ?)",
+            (id, self._writer_shard, offset, len(data), checksum)
+        )
+        return checksum
+
+    def put_text(self, id, text):
+        return self.put(id, text.encode("utf-8", "ignore"))
+
+    def commit(self):
+        """Flush appended bytes to disk, then publish their index entries."""
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        self.conn.commit()
+
+    def entry(self, id):
+        """Return the (shard, offset, length, checksum) index entry of `id`, or None."""
+        return self.conn.execute(
+            "SELECT shard, offset, length, checksum FROM texts WHERE id = ?", (id,)
+        ).fetchone()
+
+    def entries(self):
+        """Return the whole index as {id: (shard, offset, length, checksum)}."""
+        return {row[0]: row[1:] for row in
+                self.conn.execute("SELECT id, shard, offset, length, checksum FROM texts")}
+
+    def _view(self, shard, offset, length):
+        if length == 0:
+            return memoryview(b'')
+        mapped = self._maps.get(shard)
+        if mapped is None or len(mapped) < offset + length:
+            # (Re)map: the shard may have grown since it was last mapped
+            if self._writer is not None and shard == self._writer_shard:
+                self._writer.flush()
+            with open(self._shard_path(shard), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[shard] = mapped
+        return memoryview(mapped)[offset:offset + length]
+
+    def get(self, id):
+        """Return the bytes of `id` as a zero-copy memoryview into its shard, or None."""
+        entry = self.entry(id)
+        if entry is None:
+            return None
+        shard, offset, length, _ = entry
+        return self._view(shard, offset, length)
+
+    def get_text(self, id):
+        view = self.get(id)
+        return None if view is None else str(view, "utf-8")
+
+    def ids(self):
+        return [row[0] for row in self.conn.execute("SELECT id FROM texts ORDER BY id")]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM texts").fetchone()[0]
+
+    def __contains__(self, id):
+        return self.entry(id) is not None
+
+    def __iter__(self):
+        """Yield (id, memoryview) pairs in id order."""
+        rows = self.conn.execute("SELECT id, shard, offset, length FROM texts ORDER BY id").fetchall()
+        for id, shard, offset, length in rows:
+            yield id, self._view(shard, offset, length)
+
+    def verify(self):
+        """Return the ids whose stored bytes no longer match their checksum."""
+        rows = self.conn.execute("SELECT id, shard, offset, length, checksum FROM texts ORDER BY id").fetchall()
+        return [id for id, shard, offset, length, checksum in rows
+                if hashlib.sha256(self._view(shard, offset, length)).hexdigest() != checksum]
+
+    def export(self, texts_path, suffix=".txt"):
+        """Write every text back out as a loose `<id><suffix>` file under `texts_path`."""
+        os.makedirs(texts_path, exist_ok=True)
+        count = 0
+        for id, view in self:
+            with open(os.path.join(texts_path, id + suffix), 'wb') as f:
+                f.write(view)
+            count += 1
+        return count
+
+    def close(self):
+        self.commit()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a caller still holds a view; the map is released with it
+        self._maps = {}
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,111 +1,213 @@
 #!/usr/bin/env python
 """
 Update the Bilkent Turkish Writings Dataset and release a new version.
+
+The update is a graph of stages (see build_graph.py):
+
+    scrape -> convert -> dedup -> version -> hf -> push
+                                          -> materialize
+                                          -> splits
+                                          -> index
+                                          -> tokens
+
+Stages whose inputs and outputs have not changed since they last ran are
+skipped, `hf`, `materialize`, `splits`, `index` and `tokens` run
+concurrently, and `--from`/`--until` restrict a run to a slice of the graph.
+
+Every stage runs in this process. Scrapy, pdfplumber and datasets are
+imported only when a stage uses them, so `--help` and runs that skip
+those stages start quickly.
 """
 import os
+import sys
 import argparse
-import subprocess
-from dataset_versioning import initialize_version_control, get_latest_version, create_new_version
-from prepare_hf_dataset import convert_to_hf_dataset, push_to_hub
+import telemetry
+from build_graph import Stage, run_stages
+from dataset_versioning import (initialize_version_control, get_latest_version, create_new_version,
+                                manifest_path, materialize_version, version_dir)
+from prepare_hf_dataset import ensure_parquet_shards, parquet_shard_dir, push_to_hub
+from create_splits import create_splits, splits_dir
+from text_index import build_index, index_dir
+from corpus_stats import corpus_stats
+from export_tokens import export_tokens, tokens_dir
+from dataset_versioning import PARQUET_PATH, CSV_PATH
+from dedup import deduplicate, REPORT_PATH, DEDUP_PARQUET_PATH, DEDUP_CSV_PATH
+
+
+STAGE_NAMES = ("scrape", "convert", "dedup", "version", "hf", "materialize", "splits", "index", "tokens", "push")
 
 
 def run_scraper():
     """Run the scraper to get the latest data."""
     print("Running the scraper to collect the latest data...")
     os.makedirs("./data", exist_ok=True)
-    
-    # Change directory to the scraper folder
-    os.chdir("./scraper")
-    
-    # Run the scrapy crawler
-    try:
-        subprocess.run(["scrapy", "crawl", "bilkent_turkish_writings"], check=True)
-        print("Scraper completed successfully")
-        os.chdir("../")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running scraper: {e}")
-        os.chdir("../")
+
+    # The Scrapy project lives in ./scraper; crawl() makes it importable and runs it in this process
+    scraper_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper")
+    if scraper_dir not in sys.path:
+        sys.path.append(scraper_dir)
+    from crawl import crawl
+
+    if not crawl():
+        print("Error running scraper: the crawl did not finish")
         return False
+    print("Scraper completed successfully")
+    return True
 
 
 def convert_to_text():
     """Run the conversion script to convert PDFs to text."""
     print("Converting PDFs to text...")
-    try:
-        subprocess.run(["python", "convert_to_text.py"], check=True)
-        print("Conversion completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error converting PDFs to text: {e}")
+    import convert_to_text as converter
+
+    # main() only fails when there is nothing to convert
+    if converter.main([]) != 0:
+        print(f"Error converting PDFs to text: no PDFs found in {converter.PDF_DIR}")
         return False
+    print("Conversion completed successfully")
+    return True
 
 
-def update_dataset(version_num=None, push=False, skip_scraper=True):
-    """Update the dataset with the latest data and create a new version."""
-    # Initialize version control to ensure v1 exists
-    latest = initialize_version_control()
-    print(f"Current version: {latest['version']}")
-    
-    # Determine the next version number
-    if version_num is None:
-        if latest:
-            current_num = int(latest["version"][1:])  # Extract number from "v1", "v2", etc.
-            version_num = current_num + 1
-        else:
-            version_num = 1
-    
-    print(f"Preparing to create version v{version_num}")
-    
-    # Skip scraper and PDF conversion if flag is set (useful for testing)
-    if not skip_scraper:
-        # Run the scraper to get the latest data
-        if not run_scraper():
-            print("Failed to run scraper. Update aborted.")
-            return False
-        
-        # Convert PDFs to text
-        if not convert_to_text():
-            print("Failed to convert PDFs to text. Update aborted.")
+def latest_version_name():
+    latest = get_latest_version()
+    return latest["version"] if latest else None
+
+
+def build_stages(version_num=None, push=False, skip_scraper=True, drop_duplicates=False):
+    """
+    The stages of an update; `scrape`/`convert` and `push` are only included
+    when enabled. With `drop_duplicates`, the new version is created from the
+    build without the near-duplicates found by `dedup`; otherwise `dedup`
+    only reports them.
+    """
+    # What the version is created from
+    sources = (DEDUP_PARQUET_PATH, DEDUP_CSV_PATH) if drop_duplicates else (PARQUET_PATH, CSV_PATH)
+
+    def find_duplicates():
+        outputs = {"parquet_path": DEDUP_PARQUET_PATH, "csv_path": DEDUP_CSV_PATH} if drop_duplicates else {}
+        deduplicate(workers=os.cpu_count() or 1, **outputs)
+        return True
+
+    def create_version():
+        # Called when the build outputs changed since the last version was created, or for an explicit --version
+        latest = get_latest_version()
+        number = version_num if version_num is not None else int(latest["version"][1:]) + 1 if latest else 1
+        # Whether the texts changed is found out while storing them, not in a pass of its own
+        new_version = create_new_version(number, *sources, unless_same_as=latest if version_num is None else None)
+        if new_version is None:
+            print(f"The texts are the same as in {latest['version']}; not creating a new version")
+            return True
+        print(f"Created new version: {new_version['version']}")
+        # Cached in metadata.json for the dataset card; computed here, before the stages reading it run
+        corpus_stats(new_version["version"])
+        return True
+
+    def build_hf():
+        version = latest_version_name()
+        shards = ensure_parquet_shards(version)
+        print(f"Successfully converted {version} to Hugging Face format ({len(shards)} Parquet shards)")
+        return True
+
+    def push_hf():
+        version = latest_version_name()
+        if not push_to_hub(version):
+            print("Failed to push to Hugging Face Hub. Check if HF_TOKEN is set.")
             return False
-    
-    # Create a new version
-    new_version = create_new_version(version_num)
-    print(f"Created new version: {new_version['version']}")
-    
-    # Convert to Hugging Face dataset format
-    try:
-        convert_to_hf_dataset(new_version['version'])
-        print(f"Successfully converted {new_version['version']} to Hugging Face format")
-    except Exception as e:
-        print(f"Error converting to Hugging Face format: {e}")
-        return False
-    
-    # Push to Hugging Face Hub if requested
+        print(f"Successfully pushed {version} to Hugging Face Hub")
+        return True
+
+    def materialize():
+        # The CSV offered for direct download in the README
+        materialize_version(latest_version_name(), "csv")
+        return True
+
+    def split():
+        create_splits(latest_version_name())
+        return True
+
+    def index():
+        # Reuses the previous version's index when the new version only adds rows
+        build_index(latest_version_name())
+        return True
+
+    def tokenize():
+        # Byte-level token ids for training, so jobs mmap them instead of tokenizing the CSV
+        export_tokens(latest_version_name(), workers=os.cpu_count() or 1)
+        return True
+
+    def latest_manifest():
+        version = latest_version_name()
+        return [manifest_path(version)] if version else []
+
+    stages = []
+    if not skip_scraper:
+        stages += [
+            # Both install signal handlers (the reactor's, the conversion's SIGALRM timeouts)
+            Stage("scrape", run_scraper, always=True, main_thread=True,
+                  outputs=["./data/full", "./data/metadata.jsonl"]),
+            Stage("convert", convert_to_text, deps=["scrape"], main_thread=True,
+                  inputs=["./data/full", "./data/metadata.jsonl", "convert_to_text.py", "corpus_writer.py"],
+                  outputs=["./data/texts.parquet", "./data/texts.csv"]),
+        ]
+    stages += [
+        Stage("dedup", find_duplicates, deps=["convert"],
+              inputs=[PARQUET_PATH, CSV_PATH],
+              outputs=[REPORT_PATH] + (list(sources) if drop_duplicates else [])),
+        # An explicit version number is always created, even from a build that has not changed
+        Stage("version", create_version, deps=["dedup"], always=version_num is not None,
+              inputs=list(sources),
+              outputs=latest_manifest),
+        Stage("hf", build_hf, deps=["version"],
+              inputs=latest_manifest,
+              outputs=lambda: [parquet_shard_dir(latest_version_name())]),
+        Stage("materialize", materialize, deps=["version"],
+              inputs=latest_manifest,
+              outputs=lambda: [f"{version_dir(latest_version_name())}/texts.csv"]),
+        Stage("splits", split, deps=["version"],
+              inputs=latest_manifest,
+              outputs=lambda: [splits_dir(latest_version_name())]),
+        Stage("index", index, deps=["version"],
+              inputs=latest_manifest,
+              outputs=lambda: [index_dir(latest_version_name())]),
+        Stage("tokens", tokenize, deps=["version"],
+              inputs=latest_manifest,
+              outputs=lambda: [tokens_dir(latest_version_name())]),
+    ]
     if push:
-        try:
-            push_result = push_to_hub(new_version['version'])
-            if push_result:
-                print(f"Successfully pushed {new_version['version']} to Hugging Face Hub")
-            else:
-                print("Failed to push to Hugging Face Hub. Check if HF_TOKEN is set.")
-        except Exception as e:
-            print(f"Error pushing to Hugging Face Hub: {e}")
-    
-    print(f"Dataset update to {new_version['version']} completed successfully!")
+        stages.append(Stage("push", push_hf, deps=["hf"],
+                            inputs=lambda: [parquet_shard_dir(latest_version_name())]))
+    return stages
+
+
+def update_dataset(version_num=None, push=False, skip_scraper=True, start=None, until=None, force=False, jobs=2,
+                   drop_duplicates=False):
+    """Update the dataset with the latest data, creating a new version if the data changed."""
+    # Timings of every stage are appended to data/telemetry.jsonl; compare runs with telemetry.py
+    with telemetry.run("update_dataset") as run:
+        # Initialize version control to ensure v1 exists
+        latest = initialize_version_control()
+        print(f"Current version: {latest['version']}")
+
+        stages = build_stages(version_num, push, skip_scraper, drop_duplicates)
+        run.ok = run_stages(stages, start, until, force, jobs)
+    if not run.ok:
+        print("Update failed. Stages that completed are not rerun next time.")
+        return False
+
+    print(f"Dataset update to {latest_version_name()} completed successfully!")
     return True
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Update the Bilkent Turkish Writings Dataset")
     parser.add_argument(
-        "--version", 
-        type=int, 
+        "--version",
+        type=int,
         help="Version number for the new dataset (default: increment the latest version)"
     )
     parser.add_argument(
-        "--push", 
-        action="store_true", 
+        "--push",
+        action="store_true",
         help="Push the dataset to Hugging Face Hub after updating"
     )
     parser.add_argument(
@@ -113,6 +215,34 @@ if __name__ == "__main__":
         action="store_true",
         help="Run the scraper to collect new data (not needed for testing)"
     )
+    parser.add_argument(
+        "--from",
+        dest="start",
+        choices=STAGE_NAMES,
+        help="Start at this stage, skipping the stages it depends on"
+    )
+    parser.add_argument(
+        "--until",
+        choices=STAGE_NAMES,
+        help="Stop after this stage"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun the selected stages even if they are up to date"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=2,
+        help="Number of stages that may run at once (default: 2)"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Leave near-duplicate writings out of the new version (by default they are only reported)"
+    )
     args = parser.parse_args()
-    
-    update_dataset(args.version, args.push, not args.run_scraper)
+
+    update_dataset(args.version, args.push, not args.run_scraper, args.start, args.until, args.force, args.jobs,
+                   args.dedup)
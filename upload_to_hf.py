@@ -3,15 +3,95 @@
 Clean upload script that avoids schema conflicts by uploading datasets directly.
 """
 import os
+import sys
 import json
-import pandas as pd
-from datasets import Dataset, Features, Value
-from huggingface_hub import HfApi
-from dataset_versioning import initialize_version_control
+import hashlib
+import argparse
+import time
+import telemetry
+from dataset_versioning import initialize_version_control, list_versions, read_metadata, has_texts
+from prepare_hf_dataset import ensure_parquet_shards, parquet_shard_dir
+from corpus_stats import corpus_stats, version_summary
+
+
+def card_configs(versions, default_version):
+    """
+    The `configs:` section of the dataset card: one configuration per version,
+    reading the shards under <version>/, and a default configuration that
+    points at the same files as `default_version` rather than at a copy.
+    """
+    lines = ["configs:", "- config_name: default", "  data_files:", "  - split: train",
+             f"    path: {default_version}/train-*"]
+    for version in versions:
+        lines += [f"- config_name: {version}", "  data_files:", "  - split: train", f"    path: {version}/train-*"]
+    return "\n".join(lines)
+
+
+def size_category(num_entries):
+    """The Hub's size category of a dataset with `num_entries` rows, e.g. "1K<n<10K"."""
+    if not isinstance(num_entries, int):
+        return "unknown"
+    for bound, category in ((1_000, "n<1K"), (10_000, "1K<n<10K"), (100_000, "10K<n<100K"),
+                            (1_000_000, "100K<n<1M"), (10_000_000, "1M<n<10M")):
+        if num_entries < bound:
+            return category
+    return "n>10M"
+
+
+def format_count(n):
+    return f"{n:,}" if isinstance(n, int) else "N/A"
+
+
+def card_versions(versions, default_version):
+    """The version list of the dataset card, with each version's size and years (see version_summary())."""
+    def describe(version):
+        num_entries, span = version_summary(version)
+        return f"{format_count(num_entries)} entries" + (f" ({span})" if span else "")
+
+    lines = [f"- **Default ({default_version})**: Latest dataset with {describe(default_version)} - **Recommended**"]
+    for version in versions:
+        lines.append(f"- **{version}**: " + ("Same as default, explicitly named configuration"
+                                             if version == default_version else describe(version)))
+    return "\n".join(lines)
+
+
+def card_statistics(stats):
+    """The statistics section of the dataset card, from corpus_stats()."""
+    if stats is None:
+        return "Detailed statistics are not available for this version."
+
+    def row(name, d):
+        return (f"| {name} | {d['mean']:,.1f} | {d['min']:,.0f} | {d['median']:,.0f} | "
+                f"{d['p95']:,.0f} | {d['max']:,.0f} |")
+
+    lines = [
+        f"- **Words**: {stats['total_words']:,} in {stats['total_sentences']:,} sentences",
+        f"- **Vocabulary**: {stats['vocabulary_size']:,} distinct words "
+        f"(type-token ratio {stats['type_token_ratio']}, {stats['hapax_legomena']:,} occurring once)",
+        f"- **Empty writings**: {stats['empty_texts']:,}; near-empty (fewer than "
+        f"{stats['near_empty_words']} words): {stats['near_empty_texts']:,}",
+        "",
+        "| Per writing | Mean | Min | Median | 95th percentile | Max |",
+        "|---|---|---|---|---|---|",
+    ]
+    for name, key in (("Characters", "chars"), ("Words", "words"), ("Sentences", "sentences"),
+                      ("Words per sentence", "words_per_sentence")):
+        if stats[key]:
+            lines.append(row(name, stats[key]))
+    years = {year: counts for year, counts in stats["years"].items() if year != "unknown"}
+    if years:
+        lines += ["", "| Year | Writings | Words | Mean words |", "|---|---|---|---|"]
+        lines += [f"| {year} | {counts['num_entries']:,} | {counts['total_words']:,} | {counts['mean_words']:,.1f} |"
+                  for year, counts in years.items()]
+    return "\n".join(lines)
 
 
 def create_dataset_card(version, metadata):
     """Create a README.md file (dataset card) for the HF dataset."""
+    # Sizes and statistics come from corpus_stats.py, computed once per version and cached in metadata.json;
+    # versions without texts fall back to the num_entries and years of their metadata.json
+    stats = corpus_stats(version)
+    num_entries, span = version_summary(version)
     card_content = f"""---
 license: other
 license_name: "academic-use-only"
@@ -19,7 +99,7 @@ license_link: "https://github.com/selimfirat/bilkent-turkish-writings-dataset/bl
 language:
 - tr
 size_categories:
-- 1K<n<10K
+- {size_category(num_entries)}
 task_categories:
 - text-generation
 - text-classification
@@ -32,13 +112,14 @@ tags:
 - nlp
 - corpus
 - bilkent-university
+{card_configs(list_versions(), version)}
 ---
 
 # Compilation of Bilkent Turkish Writings Dataset
 
 ## Dataset Description
 
-This is a comprehensive compilation of Turkish creative writings from Bilkent University's Turkish 101 and Turkish 102 courses (2014-2025). The dataset contains **{metadata.get('num_entries', 'N/A')} student writings** originally created by students and instructors, focusing on creativity, content, composition, grammar, spelling, and punctuation development.
+This is a comprehensive compilation of Turkish creative writings from Bilkent University's Turkish 101 and Turkish 102 courses{f" ({span})" if span else ""}. The dataset contains **{format_count(num_entries)} student writings** originally created by students and instructors, focusing on creativity, content, composition, grammar, spelling, and punctuation development.
 
 **Note**: This dataset is a compilation and digitization of publicly available writings from Bilkent University. The original content was created by students and instructors of the Turkish Department. The dataset compilation, processing, and distribution tools were developed by Selim F. Yilmaz.
 
@@ -46,7 +127,7 @@ This is a comprehensive compilation of Turkish creative writings from Bilkent Un
 
 - **Version**: {version}
 - **Date Created**: {metadata.get('date_created', 'N/A')}
-- **Number of Entries**: {metadata.get('num_entries', 'N/A')}
+- **Number of Entries**: {format_count(num_entries)}
 - **Language**: Turkish
 - **License**: Academic Use Only
 - **Original Source**: [Bilkent University Turkish Department](https://stars.bilkent.edu.tr/turkce/)
@@ -56,6 +137,17 @@ This is a comprehensive compilation of Turkish creative writings from Bilkent Un
 ### Data Fields
 
 - **text**: The full text content of the writing
+- **writing_id**: The ogrenciNo that identifies the writing on the department's website
+- **course**: The course it was written for, e.g. Turkish 101
+- **term**: The semester it was written in, e.g. 2016-2017 Fall
+- **year**: The calendar year of that semester
+- **source_url**: The URL of the original PDF
+
+The metadata fields are null for writings whose listing page did not give them.
+
+### Statistics
+
+{card_statistics(stats)}
 
 ### Data Splits
 
@@ -73,7 +165,7 @@ test_data = dataset["test"]
 ```python
 from datasets import load_dataset
 
-# Load the latest version (v2) - default configuration
+# Load the latest version ({version}) - default configuration
 dataset = load_dataset("selimfirat/bilkent-turkish-writings-dataset")
 
 # Access the data
@@ -91,16 +183,14 @@ test_data = split_dataset["test"]
 
 This dataset provides multiple configurations:
 
-- **Default (v2)**: Latest dataset with 9,119 entries (2014-2025) - **Recommended**
-- **v1**: Original dataset with 6,844 entries (2014-2018)
-- **v2**: Same as default, explicitly named configuration
+{card_versions(list_versions(), version)}
 
 ### Accessing Different Versions
 
 ```python
 from datasets import load_dataset
 
-# Method 1: Load default version (v2 - recommended)
+# Method 1: Load default version ({version} - recommended)
 dataset = load_dataset("selimfirat/bilkent-turkish-writings-dataset")
 
 # Method 2: Explicitly load v2 configuration
@@ -149,35 +239,22 @@ For questions or issues, please visit the [GitHub repository](https://github.com
 
 
 def load_and_upload_dataset(version, repo_id="selimfirat/bilkent-turkish-writings-dataset", config_name=None, as_default=False):
-    """Load CSV data and upload directly to Hugging Face Hub."""
+    """Upload the Parquet shards of a version to Hugging Face Hub, building them if needed."""
     # Check HF token
     token = os.environ.get("HF_TOKEN")
     if not token:
         print("Error: HF_TOKEN not found in environment variables.")
         return False
     
-    # Load CSV data
     version_dir = f"./versions/{version}"
-    csv_path = f"{version_dir}/texts.csv"
-    
-    if not os.path.exists(csv_path):
-        print(f"Error: CSV file not found at {csv_path}")
-        return False
-    
-    print(f"Loading {csv_path}...")
-    df = pd.read_csv(csv_path, encoding='utf-8')
-    print(f"Loaded {len(df)} entries from {version}")
     
-    # Clean data: only keep text column
-    if 'text' not in df.columns:
-        print(f"Error: 'text' column not found in {csv_path}")
+    if not os.path.exists(version_dir):
+        print(f"Error: version directory not found at {version_dir}")
         return False
     
-    text_df = pd.DataFrame({'text': df['text'].fillna('')})
-    
-    # Create HF dataset
-    features = Features({'text': Value('string')})
-    dataset = Dataset.from_pandas(text_df, features=features)
+    # Reuse the Parquet shards built by prepare_hf_dataset.py instead of re-reading the texts
+    shards = ensure_parquet_shards(version)
+    print(f"Using {len(shards)} Parquet shards of {version}")
     
     # Load metadata
     metadata_path = f"{version_dir}/metadata.json"
@@ -185,7 +262,7 @@ def load_and_upload_dataset(version, repo_id="selimfirat/bilkent-turkish-writing
         with open(metadata_path, 'r', encoding='utf-8') as f:
             metadata = json.load(f)
     else:
-        metadata = {"version": version, "date_created": "unknown", "num_entries": len(dataset)}
+        metadata = {"version": version, "date_created": "unknown", "num_entries": "N/A"}
     
     # Create dataset card only for default upload
     if as_default:
@@ -195,26 +272,25 @@ def load_and_upload_dataset(version, repo_id="selimfirat/bilkent-turkish-writing
     print(f"Uploading {version} {config_desc} to {repo_id}...")
     
     try:
-        # Upload dataset
-        if as_default:
-            # Upload as default configuration (no config_name)
-            dataset.push_to_hub(
-                repo_id=repo_id,
-                token=token,
-                commit_message=f"Upload {version} as default configuration"
-            )
-        else:
-            # Upload with specific config_name
-            dataset.push_to_hub(
-                repo_id=repo_id,
-                config_name=config_name,
-                token=token,
-                commit_message=f"Upload {version} configuration"
-            )
+        from huggingface_hub import HfApi
+        api = HfApi()
+        
+        # Upload the shards to <version>/, which both the default and the named configuration
+        # read from. Shards left over from an earlier upload of the version are deleted.
+        api.upload_folder(
+            folder_path=parquet_shard_dir(version),
+            path_in_repo=version,
+            repo_id=repo_id,
+            repo_type="dataset",
+            token=token,
+            allow_patterns="*.parquet",
+            delete_patterns="*.parquet",
+            commit_message=f"Upload {version} as default configuration" if as_default
+            else f"Upload {version} configuration"
+        )
         
         # Upload README only for default upload
         if as_default:
-            api = HfApi()
             api.upload_file(
                 path_or_fileobj=card_content.encode('utf-8'),
                 path_in_repo="README.md",
@@ -234,65 +310,229 @@ def load_and_upload_dataset(version, repo_id="selimfirat/bilkent-turkish-writing
         return False
 
 
-def main():
-    """Upload dataset versions: v2 as default and both v1, v2 as named configurations."""
+UPLOAD_CHECKPOINT_PATH = "./hf_datasets/upload_checkpoint.json"
+
+
+def load_checkpoint(path, repo_id):
+    """The checkpoint of earlier uploads to `repo_id`: cached local hashes and preuploaded files."""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("repo_id") == repo_id:
+            return checkpoint
+    return {"repo_id": repo_id, "hashes": {}, "preuploaded": {}}
+
+
+def save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def local_hashes(source, checkpoint):
+    """
+    (sha256, git blob id) of a local file or of bytes; the Hub reports the first
+    for LFS files and the second for regular ones. File hashes are cached in
+    the checkpoint by size and mtime.
+    """
+    if isinstance(source, bytes):
+        git_oid = hashlib.sha1(b"blob %d\0" % len(source) + source).hexdigest()
+        return hashlib.sha256(source).hexdigest(), git_oid
+
+    st = os.stat(source)
+    cached = checkpoint["hashes"].get(source)
+    if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+        return cached["sha256"], cached["git_oid"]
+
+    sha256 = hashlib.sha256()
+    git_oid = hashlib.sha1(b"blob %d\0" % st.st_size)
+    with open(source, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+            git_oid.update(block)
+    checkpoint["hashes"][source] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                    "sha256": sha256.hexdigest(), "git_oid": git_oid.hexdigest()}
+    return sha256.hexdigest(), git_oid.hexdigest()
+
+
+def remote_files(api, repo_id, token):
+    """{path: RepoFile} of every file currently in the dataset repo."""
+    from huggingface_hub.hf_api import RepoFile
+
+    return {entry.path: entry for entry in
+            api.list_repo_tree(repo_id, recursive=True, repo_type="dataset", token=token)
+            if isinstance(entry, RepoFile)}
+
+
+def release_files(default_version):
+    """
+    The files of a release and the versions it built: ({path in repo: local
+    path or bytes}, [version]). They are the Parquet shards of every version
+    under <version>/, built once each, and the dataset card. The default
+    configuration reuses the shards of `default_version`.
+
+    Versions whose texts are not available (only their metadata.json) are
+    skipped: their shards on the Hub cannot be rebuilt here and are kept,
+    as are their configurations in the card.
+    """
+    files = {}
+    built = []
+    for version in list_versions():
+        if not has_texts(version):
+            print(f"{version} has no texts to build shards from; keeping its files on the Hub")
+            continue
+        for shard in ensure_parquet_shards(version):
+            files[f"{version}/{os.path.basename(shard)}"] = shard
+        built.append(version)
+
+    metadata = read_metadata(default_version) or {"version": default_version}
+    files["README.md"] = create_dataset_card(default_version, metadata).encode('utf-8')
+    return files, built
+
+
+def release(api, repo_id, default_version, token, checkpoint_path=UPLOAD_CHECKPOINT_PATH, dry_run=False):
+    """
+    Sync the repo with a release of every version (see release_files()).
+
+    Stale shards are only deleted under the versions this release built,
+    and under data/, which held a copy of the default version in earlier
+    releases. Returns the number of files added/updated and deleted.
+    """
+    files, built = release_files(default_version)
+    managed = {"data/"} | {f"{version}/" for version in built}
+    return sync_to_hub(api, repo_id, files, token, checkpoint_path=checkpoint_path, dry_run=dry_run,
+                       commit_message=f"Release {default_version}", managed=managed)
+
+
+def sync_to_hub(api, repo_id, files, token, checkpoint_path=UPLOAD_CHECKPOINT_PATH, dry_run=False,
+                commit_message="Update dataset", managed=None):
+    """
+    Make the repo's files match `files` ({path in repo: local path or bytes}) in a single commit.
+
+    Local files are hashed and compared with the remote listing; only missing
+    or changed files are uploaded, and Parquet files the release no longer
+    contains are deleted from the `managed` directories (by default those
+    that `files` writes to). Large files are
+    uploaded one by one ahead of the commit and recorded in a local
+    checkpoint, so an interrupted run picks up where it stopped, and the
+    public dataset only changes once the commit succeeds.
+    Returns the number of files added/updated and deleted.
+    """
+    checkpoint = load_checkpoint(checkpoint_path, repo_id)
+    remote = remote_files(api, repo_id, token)
+
+    additions = []
+    for path_in_repo, source in sorted(files.items()):
+        sha256, git_oid = local_hashes(source, checkpoint)
+        entry = remote.get(path_in_repo)
+        remote_oid = entry and (entry.lfs.sha256 if entry.lfs is not None else entry.blob_id)
+        if remote_oid not in (sha256, git_oid):
+            additions.append((path_in_repo, source, sha256))
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    if managed is None:
+        managed = {path.split("/", 1)[0] + "/" for path in files if "/" in path}
+    deletions = [path for path in sorted(remote) if path not in files and path.endswith(".parquet")
+                 and any(path.startswith(prefix) for prefix in managed)]
+
+    for path_in_repo, _, _ in additions:
+        print(f"  + {path_in_repo}")
+    for path_in_repo in deletions:
+        print(f"  - {path_in_repo}")
+    if not additions and not deletions:
+        print("Hub is already up to date")
+        return 0, 0
+    if dry_run:
+        return len(additions), len(deletions)
+
+    from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+
+    operations = []
+    with telemetry.stage("hub.upload") as timer:
+        for path_in_repo, source, sha256 in additions:
+            operation = CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=source)
+            operations.append(operation)
+            if checkpoint["preuploaded"].get(path_in_repo) == sha256 or isinstance(source, bytes):
+                # Already uploaded by an interrupted run (the commit only re-checks it), or small enough to inline
+                continue
+            print(f"Uploading {path_in_repo}...")
+            start = time.perf_counter()
+            api.preupload_lfs_files(repo_id, additions=[operation], token=token, repo_type="dataset")
+            timer.add(1, os.path.getsize(source))
+            timer.item(path_in_repo, time.perf_counter() - start)
+            checkpoint["preuploaded"][path_in_repo] = sha256
+            save_checkpoint(checkpoint_path, checkpoint)
+
+        operations += [CommitOperationDelete(path_in_repo=path_in_repo) for path_in_repo in deletions]
+        api.create_commit(repo_id, operations, commit_message=commit_message, token=token, repo_type="dataset")
+
+    checkpoint["preuploaded"] = {}
+    save_checkpoint(checkpoint_path, checkpoint)
+    return len(additions), len(deletions)
+
+
+def main(argv=None):
+    """Upload all dataset versions, the default one also as the default configuration, changing only what differs."""
+    parser = argparse.ArgumentParser(description="Upload the dataset versions to Hugging Face Hub")
+    parser.add_argument(
+        "--repo-id",
+        default="selimfirat/bilkent-turkish-writings-dataset",
+        help="Dataset repository to upload to"
+    )
+    parser.add_argument(
+        "--default-version",
+        help="Version shown as the default configuration (default: the latest version)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only list the files that would be uploaded or deleted"
+    )
+    args = parser.parse_args(argv)
+
     print("🚀 Starting upload of Bilkent Turkish Writings Dataset...")
     
     # Initialize version control
-    initialize_version_control()
+    latest = initialize_version_control()
+    default_version = args.default_version or latest["version"]
     
-    # Create fresh repository
     token = os.environ.get("HF_TOKEN")
     if not token:
         print("Error: HF_TOKEN not found.")
-        return
+        return 1
     
-    repo_id = "selimfirat/bilkent-turkish-writings-dataset"
+    repo_id = args.repo_id
+    from huggingface_hub import HfApi
     api = HfApi()
     
-    try:
-        # Delete existing repo to start fresh
-        api.delete_repo(repo_id=repo_id, repo_type="dataset", token=token)
-        print("🗑️ Deleted existing repository")
-    except Exception:
-        pass
+    # The repository is updated in place, never deleted: a failed upload leaves the previous release online
+    api.create_repo(repo_id=repo_id, repo_type="dataset", token=token, exist_ok=True)
     
+    print(f"\n📦 Comparing local shards with {repo_id}...")
     try:
-        # Create new repo
-        api.create_repo(repo_id=repo_id, repo_type="dataset", token=token, exist_ok=True)
-        print("📁 Created new repository")
+        added, deleted = release(api, repo_id, default_version, token, dry_run=args.dry_run)
     except Exception as e:
-        print(f"Repository creation info: {e}")
-    
-    # Upload v2 as default configuration (shows in dataset viewer)
-    print("\n📦 Uploading v2 as default configuration...")
-    success_v2_default = load_and_upload_dataset("v2", repo_id, as_default=True)
-    
-    # Upload v1 as named configuration
-    print("\n📦 Uploading v1 as named configuration...")
-    success_v1 = load_and_upload_dataset("v1", repo_id, config_name="v1")
+        print(f"\n⚠️ Upload failed: {e}")
+        print("Run again to resume; files already uploaded are not sent again.")
+        return 1
     
-    # Upload v2 as named configuration
-    print("\n📦 Uploading v2 as named configuration...")
-    success_v2_named = load_and_upload_dataset("v2", repo_id, config_name="v2")
+    if args.dry_run:
+        print(f"\n📋 Dry run: {added} files to upload, {deleted} to delete")
+        return 0
     
-    # Summary
-    print("\n📊 Upload Summary:")
-    print(f"v2 (default): {'✅ Success' if success_v2_default else '❌ Failed'}")
-    print(f"v1 (config): {'✅ Success' if success_v1 else '❌ Failed'}")
-    print(f"v2 (config): {'✅ Success' if success_v2_named else '❌ Failed'}")
-    
-    if success_v2_default and success_v1 and success_v2_named:
-        print("\n🎉 All uploads completed successfully!")
-        print(f"🔗 Dataset available at: https://huggingface.co/datasets/{repo_id}")
-        print("📋 Access methods:")
-        print("   - Default (v2): load_dataset(repo_id)")
-        print("   - v1: load_dataset(repo_id, 'v1')")
-        print("   - v2: load_dataset(repo_id, 'v2')")
-        print("\n💡 Dataset viewer will show v2 by default")
-    else:
-        print("\n⚠️ Some uploads failed. Please check the errors above.")
+    print(f"\n🎉 Upload complete: {added} files uploaded, {deleted} deleted")
+    print(f"🔗 Dataset available at: https://huggingface.co/datasets/{repo_id}")
+    print("📋 Access methods:")
+    print(f"   - Default ({default_version}): load_dataset(repo_id)")
+    for version in list_versions():
+        print(f"   - {version}: load_dataset(repo_id, '{version}')")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    with telemetry.run("upload_to_hf") as run:
+        status = main()
+        run.ok = status == 0
+    sys.exit(status)